@@ -0,0 +1,212 @@
+import calendar
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Fields carried as epoch seconds (UTC) and integer cents in the compact profile.
+DATE_FIELDS = frozenset({"date", "timestamp", "start", "end"})
+MONEY_FIELDS = frozenset(
+    {
+        "amount",
+        "ceiling",
+        "remanent",
+        "fixed",
+        "extra",
+        "wage",
+        "maxInvest",
+        "totalExpense",
+        "totalCeiling",
+        "totalAmount",
+        "totalRemanent",
+        "transactionsTotalAmount",
+        "transactionsTotalCeiling",
+        "profits",
+        "taxBenefit",
+        "profitsDistribution",
+    }
+)
+
+
+def _media_type(value: str) -> tuple[str, dict[str, str]]:
+    media, *params = value.split(";")
+    parsed = {}
+    for param in params:
+        key, _, item = param.partition("=")
+        parsed[key.strip().lower()] = item.strip().strip('"').lower()
+    return media.strip().lower(), parsed
+
+
+def msgpack_profile(value: str) -> str | None:
+    """``"compact"`` or ``"plain"`` when ``value`` names a MessagePack media type, else ``None``."""
+    media, params = _media_type(value)
+    if media not in MSGPACK_TYPES:
+        return None
+    return "compact" if params.get("profile") == "compact" else "plain"
+
+
+def accepted_msgpack_profile(accept: str) -> str | None:
+    for item in accept.split(","):
+        profile = msgpack_profile(item)
+        if profile is not None and _media_type(item)[1].get("q", "1") not in ("0", "0.0", "0.00", "0.000"):
+            return profile
+    return None
+
+
+# Rows cluster on few calendar days, so the date part is converted once per day.
+@lru_cache(maxsize=65536)
+def _day_epoch(day: str) -> int:
+    return calendar.timegm((int(day[0:4]), int(day[5:7]), int(day[8:10]), 0, 0, 0))
+
+
+@lru_cache(maxsize=65536)
+def _day_prefix(day: int) -> str:
+    return datetime.fromtimestamp(day * 86400, timezone.utc).strftime("%Y-%m-%d ")
+
+
+# Exposed as cache hit/miss metrics.
+DATE_CACHES = {"day_epoch": _day_epoch, "day_prefix": _day_prefix}
+
+
+def _epoch(value: str) -> int:
+    if len(value) != 19 or value[4] + value[7] + value[10] + value[13] + value[16] != "-- ::":
+        # The schema also takes dates without zero padding, e.g. "2023-1-5 3:4:5".
+        return calendar.timegm(datetime.strptime(value, TIMESTAMP_FORMAT).timetuple())
+    return _day_epoch(value[:10]) + int(value[11:13]) * 3600 + int(value[14:16]) * 60 + int(value[17:19])
+
+
+def _timestamp(epoch: int) -> str:
+    day, seconds = divmod(epoch, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{_day_prefix(day)}{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, float | int) and not isinstance(value, bool)
+
+
+def _to_cents(value):
+    """Money value in integer cents; lists (sweep ``profits``) and dict values (``profitsDistribution``) too."""
+    if isinstance(value, list):
+        return [_to_cents(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_cents(item) for key, item in value.items()}
+    return round(value * 100) if _is_number(value) else value
+
+
+def _from_cents(value):
+    if isinstance(value, list):
+        return [_from_cents(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _from_cents(item) for key, item in value.items()}
+    return value / 100 if isinstance(value, int) and not isinstance(value, bool) else value
+
+
+def to_compact(value):
+    """Converts schema dates to epoch seconds and money to integer cents, recursively."""
+    if isinstance(value, list):
+        return [to_compact(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for key, item in value.items():
+        if key in DATE_FIELDS and isinstance(item, str):
+            out[key] = _epoch(item)
+        elif key in MONEY_FIELDS and (_is_number(item) or isinstance(item, list | dict)):
+            out[key] = _to_cents(item)
+        else:
+            out[key] = to_compact(item)
+    return out
+
+
+def from_compact(value):
+    """Inverse of ``to_compact``; values already in JSON form are left alone."""
+    if isinstance(value, list):
+        return [from_compact(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for key, item in value.items():
+        if key in DATE_FIELDS and isinstance(item, int) and not isinstance(item, bool):
+            out[key] = _timestamp(item)
+        elif key in MONEY_FIELDS and (isinstance(item, int | list | dict) and not isinstance(item, bool)):
+            out[key] = _from_cents(item)
+        else:
+            out[key] = from_compact(item)
+    return out
+
+
+def unpack(body: bytes, profile: str):
+    try:
+        value = msgpack.unpackb(body, raw=False, strict_map_key=False)
+    except Exception as exc:
+        raise RequestValidationError(
+            [{"type": "msgpack_invalid", "loc": ("body",), "msg": "MessagePack decode error", "input": {}}]
+        ) from exc
+    return from_compact(value) if profile == "compact" else value
+
+
+def pack(value, profile: str) -> bytes:
+    return msgpack.packb(to_compact(value) if profile == "compact" else value, use_bin_type=True)
+
+
+class MsgpackRequest(Request):
+    """A MessagePack request shown to FastAPI as JSON: ``json()`` returns the already decoded body."""
+
+    decoded = None
+
+    async def json(self):
+        return self.decoded
+
+
+class NegotiatedRoute(APIRoute):
+    """Route class that accepts ``application/msgpack`` bodies alongside JSON.
+
+    The body is decoded up front and handed to FastAPI as if it were JSON, so
+    schema errors are the same ``422`` responses the JSON path produces.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            # Route template for request metrics; scope["state"] is shared with the outer middleware.
+            request.state.route_path = self.path
+            profile = msgpack_profile(request.headers.get("content-type", ""))
+            if profile is not None:
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (key, b"application/json" if key.lower() == b"content-type" else value)
+                    for key, value in request.scope["headers"]
+                ]
+                request = MsgpackRequest(scope, request.receive)
+                # Decoded here, so a bad body is the same 422 as invalid JSON rather than FastAPI's 400.
+                request.decoded = unpack(await request.body(), profile)
+            return await handler(request)
+
+        return negotiated_handler
+
+
+def negotiate(request: Request, model: type[BaseModel], result: dict) -> BaseModel | Response:
+    """Validates ``result`` against ``model`` and encodes it as the client's ``Accept`` asks."""
+    validated = model.model_validate(result)
+    profile = accepted_msgpack_profile(request.headers.get("accept", ""))
+    if profile is None:
+        return validated
+    return msgpack_response(validated.model_dump(by_alias=True), profile)
+
+
+def msgpack_response(value, profile: str) -> Response:
+    media_type = MSGPACK_MEDIA_TYPE + ("; profile=compact" if profile == "compact" else "")
+    return Response(content=pack(value, profile), media_type=media_type)
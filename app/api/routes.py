@@ -1,44 +1,171 @@
+import gzip
+import os
 import time
-from typing import Callable
+from pathlib import Path
+from typing import Annotated, Callable
 
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
-from fastapi.concurrency import run_in_threadpool
+import anyio
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Path as PathParam, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.api.negotiation import NegotiatedRoute, negotiate
+from app.api.streaming import respond_rows
+from app.core.cancellation import CancellationToken, OperationCancelled
+from app.core.compression import accepts_encoding
+from app.core.metrics import OPENMETRICS_TYPE, PROMETHEUS_TYPE
+from app.core.profiling import current_timings, run_profiled
+from app.core.security import is_admin, is_peer
 from app.schemas.common import (
+    BatchJobRequest,
+    CustomerTransactionsResponse,
+    FilterJobRequest,
+    FilterShardRequest,
+    FilterShardResponse,
+    IngestFilterRequest,
+    IngestRequest,
+    IngestResponse,
+    JobStatusResponse,
     ParseRequest,
     ParseResponse,
     PerformanceResponse,
+    PipelineRequest,
+    PipelineResponse,
     ReturnsRequest,
     ReturnsResponse,
+    ScenarioSweepRequest,
+    ScenarioSweepResponse,
+    SimulatedReturnsResponse,
+    StoredReturnsRequest,
+    StoredTransactionsRequest,
+    StoredTransactionsResponse,
     TemporalFilterRequest,
     TemporalFilterResponse,
     TransactionValidationRequest,
     TransactionValidationResponse,
 )
+from app.services.customers import list_transactions, store_transactions, stored_returns
 from app.services.engine import SavingsEngine
+from app.services.ingest import ingest_filter, ingest_parse
+from app.services.jobs import JobQueueFull
+from app.services.pipeline import run_pipeline
+from app.services.results import apply_view
+from app.services.scatter import ScatterCoordinator, run_shard
+from app.services.simulation import simulate_returns
+from app.services.sweep import sweep_returns
 
 
-router = APIRouter(prefix="/blackrock/challenge/v1", tags=["challenge"])
+router = APIRouter(prefix="/blackrock/challenge/v1", tags=["challenge"], route_class=NegotiatedRoute)
+metrics_router = APIRouter(tags=["monitoring"], route_class=NegotiatedRoute)
 
 
-def get_engine() -> SavingsEngine:
-    return SavingsEngine()
+def get_engine(request: Request) -> SavingsEngine:
+    return request.app.state.engine
 
 
 def get_app(request: Request) -> FastAPI:
     return request.app
 
 
+def get_coordinator(request: Request) -> ScatterCoordinator:
+    return request.app.state.coordinator
+
+
+def require_peer(request: Request) -> None:
+    """Shards are only taken from peers holding ``SCATTER_SECRET``, whether or not API keys are required."""
+    if not is_peer(request.headers):
+        raise HTTPException(status_code=403, detail="Scatter secret required")
+
+
+def _profiling_requested(request: Request) -> bool:
+    if request.headers.get("x-profile", "").strip().lower() not in ("1", "true", "cpu"):
+        return False
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Admin key required for profiling")
+    return True
+
+
+def _request_timeout_ms(request: Request) -> float | None:
+    """Tightest of the ``X-Request-Timeout-Ms`` header and ``REQUEST_TIMEOUT_MS``; unset or 0 means none."""
+    limits = []
+    for raw in (request.headers.get("x-request-timeout-ms", ""), os.getenv("REQUEST_TIMEOUT_MS", "")):
+        try:
+            value = float(raw)
+        except ValueError:
+            continue
+        if value > 0:
+            limits.append(value)
+    return min(limits) if limits else None
+
+
+async def _watch_disconnect(request: Request, cancel: CancellationToken) -> None:
+    while not cancel.cancelled:
+        if await request.is_disconnected():
+            cancel.cancel("disconnected")
+            return
+        await anyio.sleep(0.05)
+
+
+async def _run_watched(request: Request, cancel: CancellationToken, run: Callable):
+    """Awaits ``run()`` while a sibling task cancels the token if the client goes away.
+
+    Exceptions are re-raised as-is rather than wrapped in an ``ExceptionGroup``.
+    """
+    outcome: dict = {}
+    async with anyio.create_task_group() as watchers:
+        watchers.start_soon(_watch_disconnect, request, cancel)
+        try:
+            outcome["result"] = await run()
+        except Exception as exc:
+            outcome["error"] = exc
+        finally:
+            watchers.cancel_scope.cancel()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+
 async def run_with_metrics(
-    app: FastAPI,
+    request: Request,
     endpoint: str,
     operation: Callable,
 ) -> dict:
+    app = request.app
+    timings = current_timings()
+    if timings is not None:
+        timings.mark_handler_start()
+    profiled = _profiling_requested(request)
+    profile = None
+    scheduler = app.state.scheduler
+    content_length = request.headers.get("content-length", "")
+    body_bytes = getattr(request.state, "body_bytes", None)
+    if body_bytes is None:
+        body_bytes = int(content_length) if content_length.isdigit() else 0
+    work_class = scheduler.classify(endpoint, body_bytes)
+    on_wait = (lambda wait_ms: timings.add("queue", wait_ms)) if timings is not None else None
+    cancel = CancellationToken.with_timeout(_request_timeout_ms(request))
+    # A streamed response keeps building rows on the same lane and deadline.
+    request.state.work = (work_class, cancel)
+    live = app.state.shared_state
+    live.incr("inFlight")
     start = time.perf_counter()
     try:
-        response = await run_in_threadpool(operation)
+        if profiled:
+            response, profile = await _run_watched(
+                request,
+                cancel,
+                lambda: scheduler.run(work_class, lambda: run_profiled(lambda: operation(cancel)), on_wait),
+            )
+        else:
+            response = await _run_watched(
+                request, cancel, lambda: scheduler.run(work_class, lambda: operation(cancel), on_wait)
+            )
         status = "success"
         return response
+    except OperationCancelled as exc:
+        status = "cancelled"
+        if exc.reason == "deadline":
+            raise HTTPException(status_code=504, detail="Request deadline exceeded") from exc
+        raise HTTPException(status_code=499, detail="Client disconnected") from exc
     except ValueError as exc:
         status = "error"
         raise HTTPException(status_code=422, detail=str(exc)) from exc
@@ -47,77 +174,318 @@ async def run_with_metrics(
         raise
     finally:
         duration_ms = (time.perf_counter() - start) * 1000
-        app.state.metrics_repo.save(endpoint=endpoint, duration_ms=duration_ms, status=status)
+        live.incr("inFlight", -1)
+        live.incr("served")
+        if status == "error":
+            live.incr("errors")
+        elif status == "cancelled":
+            live.incr("cancelled")
+        repo = app.state.metrics_repo
+        memory = getattr(request.state, "memory", None)
+        if profile is not None:
+            repo.save_profile(profile["id"], endpoint, profile["stats"], profile["summary"])
+        if timings is None:
+            repo.save(
+                endpoint=endpoint,
+                duration_ms=duration_ms,
+                status=status,
+                peak_memory_bytes=memory.rss_growth_bytes if memory else None,
+            )
+        else:
+            timings.mark_handler_end()
+            if profile is not None:
+                timings.headers["X-Profile-Id"] = profile["id"]
+            timings.on_complete = lambda stages: repo.save(
+                endpoint=endpoint,
+                duration_ms=duration_ms,
+                status=status,
+                stages=stages,
+                peak_memory_bytes=memory.rss_growth_bytes if memory else None,
+            )
 
 
 @router.post("/transactions:parse", response_model=ParseResponse)
 async def parse_transactions(
     payload: ParseRequest,
-    app: FastAPI = Depends(get_app),
+    request: Request,
     engine: SavingsEngine = Depends(get_engine),
 ) -> ParseResponse:
     result = await run_with_metrics(
-        app,
+        request,
         endpoint="transactions:parse",
-        operation=lambda: engine.parse_transactions(payload),
+        operation=lambda cancel: engine.parse_transactions(payload, cancel),
     )
-    return ParseResponse.model_validate(result)
+    return negotiate(request, ParseResponse, result)
+
+
+def _view(request: Request, options, result: dict) -> dict:
+    return apply_view(result, options, request.app.state.result_cursors)
 
 
 @router.post("/transactions:validator", response_model=TransactionValidationResponse)
 async def validate_transactions(
     payload: TransactionValidationRequest,
-    app: FastAPI = Depends(get_app),
+    request: Request,
     engine: SavingsEngine = Depends(get_engine),
 ) -> TransactionValidationResponse:
     result = await run_with_metrics(
-        app,
+        request,
         endpoint="transactions:validator",
-        operation=lambda: engine.validate_transactions(payload),
+        operation=lambda cancel: _view(request, payload, engine.validate_transaction_rows(payload, cancel)),
     )
-    return TransactionValidationResponse.model_validate(result)
+    return respond_rows(request, TransactionValidationResponse, result, validate=not payload.has_view())
 
 
 @router.post("/transactions:filter", response_model=TemporalFilterResponse)
 async def filter_transactions(
     payload: TemporalFilterRequest,
-    app: FastAPI = Depends(get_app),
+    request: Request,
     engine: SavingsEngine = Depends(get_engine),
+    coordinator: ScatterCoordinator = Depends(get_coordinator),
 ) -> TemporalFilterResponse:
     result = await run_with_metrics(
-        app,
+        request,
         endpoint="transactions:filter",
-        operation=lambda: engine.filter_temporal_constraints(payload),
+        operation=lambda cancel: _view(request, payload, coordinator.filter_rows(engine, payload, cancel)),
+    )
+    return respond_rows(request, TemporalFilterResponse, result, validate=not payload.has_view())
+
+
+@router.post(
+    "/shards:filter",
+    response_model=FilterShardResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(require_peer)],
+)
+async def filter_shard(payload: FilterShardRequest, request: Request) -> FilterShardResponse:
+    """One time range of a filter or returns request scattered by a peer's ``ScatterCoordinator``."""
+    result = await run_with_metrics(
+        request,
+        endpoint="shards:filter",
+        operation=lambda cancel: run_shard(payload, cancel),
+    )
+    return negotiate(request, FilterShardResponse, result)
+
+
+@router.get("/results/{cursor}")
+async def get_result_page(cursor: str, request: Request) -> Response:
+    page = request.app.state.result_cursors.page(cursor)
+    request.app.state.metrics.inc(
+        "app_cache_hits_total" if page is not None else "app_cache_misses_total", cache="result_cursors"
     )
-    return TemporalFilterResponse.model_validate(result)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Result cursor not found or expired")
+    return respond_rows(request, None, page, validate=False)
+
+
+def _returns(
+    coordinator: ScatterCoordinator,
+    engine: SavingsEngine,
+    payload: ReturnsRequest,
+    channel: str,
+    cancel: CancellationToken,
+) -> dict:
+    if payload.simulation is not None:
+        return simulate_returns(engine, payload, channel, cancel)
+    return coordinator.calculate_returns(engine, payload, channel, cancel)
+
+
+def _returns_response(request: Request, payload: ReturnsRequest, result: dict) -> ReturnsResponse | Response:
+    if payload.simulation is None:
+        return negotiate(request, ReturnsResponse, result)
+    response = negotiate(request, SimulatedReturnsResponse, result)
+    # The route's response_model would drop the simulated fields, so the model is encoded here.
+    if isinstance(response, Response):
+        return response
+    return JSONResponse(response.model_dump(mode="json", by_alias=True))
 
 
 @router.post("/returns:nps", response_model=ReturnsResponse)
 async def calculate_nps_returns(
     payload: ReturnsRequest,
-    app: FastAPI = Depends(get_app),
+    request: Request,
     engine: SavingsEngine = Depends(get_engine),
+    coordinator: ScatterCoordinator = Depends(get_coordinator),
 ) -> ReturnsResponse:
     result = await run_with_metrics(
-        app,
+        request,
         endpoint="returns:nps",
-        operation=lambda: engine.calculate_returns(payload, channel="nps"),
+        operation=lambda cancel: _returns(coordinator, engine, payload, "nps", cancel),
     )
-    return ReturnsResponse.model_validate(result)
+    return _returns_response(request, payload, result)
 
 
 @router.post("/returns:index", response_model=ReturnsResponse)
 async def calculate_index_returns(
     payload: ReturnsRequest,
-    app: FastAPI = Depends(get_app),
+    request: Request,
     engine: SavingsEngine = Depends(get_engine),
+    coordinator: ScatterCoordinator = Depends(get_coordinator),
 ) -> ReturnsResponse:
     result = await run_with_metrics(
-        app,
+        request,
         endpoint="returns:index",
-        operation=lambda: engine.calculate_returns(payload, channel="index"),
+        operation=lambda cancel: _returns(coordinator, engine, payload, "index", cancel),
+    )
+    return _returns_response(request, payload, result)
+
+
+@router.post("/returns:sweep", response_model=ScenarioSweepResponse)
+async def sweep_scenario_returns(
+    payload: ScenarioSweepRequest,
+    request: Request,
+    engine: SavingsEngine = Depends(get_engine),
+) -> ScenarioSweepResponse:
+    result = await run_with_metrics(
+        request,
+        endpoint="returns:sweep",
+        operation=lambda cancel: sweep_returns(engine, payload, cancel),
     )
-    return ReturnsResponse.model_validate(result)
+    return negotiate(request, ScenarioSweepResponse, result)
+
+
+@router.post("/pipeline", response_model=PipelineResponse)
+async def run_stage_pipeline(
+    payload: PipelineRequest,
+    request: Request,
+    engine: SavingsEngine = Depends(get_engine),
+) -> PipelineResponse:
+    result = await run_with_metrics(
+        request,
+        endpoint="pipeline",
+        operation=lambda cancel: run_pipeline(engine, payload, cancel),
+    )
+    return negotiate(request, PipelineResponse, result)
+
+
+CustomerId = Annotated[str, PathParam(min_length=1, max_length=128)]
+
+
+@router.put("/customers/{customer_id}/transactions", response_model=StoredTransactionsResponse)
+async def put_customer_transactions(
+    customer_id: CustomerId,
+    payload: StoredTransactionsRequest,
+    request: Request,
+) -> StoredTransactionsResponse:
+    store = request.app.state.transactions_repo
+    result = await run_with_metrics(
+        request,
+        endpoint="customers:transactions:put",
+        operation=lambda cancel: store_transactions(store, customer_id, payload),
+    )
+    return StoredTransactionsResponse.model_validate(result)
+
+
+@router.get("/customers/{customer_id}/transactions", response_model=CustomerTransactionsResponse)
+async def get_customer_transactions(
+    customer_id: CustomerId,
+    request: Request,
+    start: str | None = None,
+    end: str | None = None,
+    limit: int = Query(default=10000, ge=1, le=1_000_000),
+) -> CustomerTransactionsResponse:
+    store = request.app.state.transactions_repo
+    result = await run_with_metrics(
+        request,
+        endpoint="customers:transactions:get",
+        operation=lambda cancel: list_transactions(store, customer_id, start, end, limit),
+    )
+    return negotiate(request, CustomerTransactionsResponse, result)
+
+
+@router.delete("/customers/{customer_id}/transactions", status_code=204)
+def delete_customer_transactions(customer_id: CustomerId, request: Request) -> Response:
+    if not request.app.state.transactions_repo.delete_customer(customer_id):
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return Response(status_code=204)
+
+
+async def _stored_returns(
+    request: Request,
+    customer_id: str,
+    payload: StoredReturnsRequest,
+    channel: str,
+    engine: SavingsEngine,
+) -> ReturnsResponse:
+    store = request.app.state.transactions_repo
+    summary = await anyio.to_thread.run_sync(store.get_summary, customer_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    result = await run_with_metrics(
+        request,
+        endpoint=f"customers:returns:{channel}",
+        operation=lambda cancel: stored_returns(engine, store, customer_id, summary, payload, channel, cancel),
+    )
+    return negotiate(request, ReturnsResponse, result)
+
+
+@router.post("/customers/{customer_id}/returns:nps", response_model=ReturnsResponse)
+async def calculate_stored_nps_returns(
+    customer_id: CustomerId,
+    payload: StoredReturnsRequest,
+    request: Request,
+    engine: SavingsEngine = Depends(get_engine),
+) -> ReturnsResponse:
+    return await _stored_returns(request, customer_id, payload, "nps", engine)
+
+
+@router.post("/customers/{customer_id}/returns:index", response_model=ReturnsResponse)
+async def calculate_stored_index_returns(
+    customer_id: CustomerId,
+    payload: StoredReturnsRequest,
+    request: Request,
+    engine: SavingsEngine = Depends(get_engine),
+) -> ReturnsResponse:
+    return await _stored_returns(request, customer_id, payload, "index", engine)
+
+
+def _ingest_path(value: str) -> str:
+    """Resolves ``value`` under ``INGEST_ROOT``; ingest is disabled while that is unset."""
+    root = os.getenv("INGEST_ROOT", "")
+    if not root:
+        raise HTTPException(status_code=403, detail="File ingest is disabled; set INGEST_ROOT")
+    base = Path(root).resolve()
+    path = (base / value).resolve()
+    if path != base and base not in path.parents:
+        raise HTTPException(status_code=403, detail="Path is outside INGEST_ROOT")
+    return str(path)
+
+
+def _ingest_paths(payload: IngestRequest) -> tuple[str, str]:
+    source, target = _ingest_path(payload.input), _ingest_path(payload.output)
+    if not os.path.isfile(source):
+        raise HTTPException(status_code=404, detail="Input file not found")
+    return source, target
+
+
+@router.post("/ingest/transactions:parse", response_model=IngestResponse)
+async def ingest_parse_file(payload: IngestRequest, request: Request) -> IngestResponse:
+    source, target = _ingest_paths(payload)
+    result = await run_with_metrics(
+        request,
+        endpoint="ingest:transactions:parse",
+        operation=lambda cancel: ingest_parse(source, target, cancel),
+    )
+    return IngestResponse.model_validate({**result, "output": payload.output})
+
+
+@router.post("/ingest/transactions:filter", response_model=IngestResponse)
+async def ingest_filter_file(payload: IngestFilterRequest, request: Request) -> IngestResponse:
+    source, target = _ingest_paths(payload)
+    result = await run_with_metrics(
+        request,
+        endpoint="ingest:transactions:filter",
+        operation=lambda cancel: ingest_filter(source, target, payload, cancel),
+    )
+    return IngestResponse.model_validate({**result, "output": payload.output})
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request) -> Response:
+    # Rendered on the event loop: collectors write series that only the loop thread may touch.
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    body = request.app.state.metrics.render(openmetrics=openmetrics)
+    return Response(content=body, media_type=OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
 
 
 @router.get("/performance", response_model=PerformanceResponse)
@@ -126,6 +494,109 @@ async def get_performance(
 ) -> PerformanceResponse:
     try:
         data = app.state.metrics_repo.get_performance_snapshot()
+        data["live"] = await anyio.to_thread.run_sync(app.state.shared_state.counters)
+        data["admission"] = app.state.admission.snapshot()
+        data["scheduler"] = app.state.scheduler.snapshot()
+        data["jobs"] = app.state.jobs.snapshot()
+        data["startup"] = app.state.startup
+        data["scatter"] = app.state.coordinator.snapshot()
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     return PerformanceResponse.model_validate(data)
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    request: Request,
+    format: str = "text",
+) -> Response:
+    if not is_admin(request.headers):
+        raise HTTPException(status_code=403, detail="Admin key required")
+    profile = request.app.state.metrics_repo.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return Response(
+            content=profile["stats"],
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+        )
+    if format != "text":
+        raise HTTPException(status_code=422, detail="format must be 'text' or 'pstats'")
+    return PlainTextResponse(profile["summary"])
+
+
+def _submit_job(request: Request, response: Response, operation: str, payload) -> JobStatusResponse:
+    try:
+        job = request.app.state.jobs.submit(operation, payload)
+    except JobQueueFull as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=str(exc),
+            headers={"Retry-After": os.getenv("ADMISSION_RETRY_AFTER_S", "5")},
+        ) from exc
+    response.headers["Location"] = str(request.url_for("get_job", job_id=job["id"]))
+    return JobStatusResponse.model_validate(job)
+
+
+@router.post("/jobs/transactions:filter", response_model=JobStatusResponse, status_code=202)
+def submit_filter_job(payload: FilterJobRequest, request: Request, response: Response) -> JobStatusResponse:
+    return _submit_job(request, response, "transactions:filter", payload)
+
+
+@router.post("/jobs/returns:nps", response_model=JobStatusResponse, status_code=202)
+def submit_nps_job(payload: ReturnsRequest, request: Request, response: Response) -> JobStatusResponse:
+    return _submit_job(request, response, "returns:nps", payload)
+
+
+@router.post("/jobs/returns:index", response_model=JobStatusResponse, status_code=202)
+def submit_index_job(payload: ReturnsRequest, request: Request, response: Response) -> JobStatusResponse:
+    return _submit_job(request, response, "returns:index", payload)
+
+
+@router.post("/jobs/batch", response_model=JobStatusResponse, status_code=202)
+def submit_batch_job(payload: BatchJobRequest, request: Request, response: Response) -> JobStatusResponse:
+    return _submit_job(request, response, "batch", payload)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str, request: Request) -> JobStatusResponse:
+    job = request.app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse.model_validate(job)
+
+
+@router.delete("/jobs/{job_id}", response_model=JobStatusResponse)
+def cancel_job(job_id: str, request: Request) -> JobStatusResponse:
+    jobs = request.app.state.jobs
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in ("queued", "running"):
+        cancelled = jobs.cancel(job_id)
+        job = jobs.get(job_id)
+        if not cancelled and job["status"] in ("queued", "running"):
+            raise HTTPException(status_code=409, detail="Job is not running on this worker and cannot be cancelled")
+    return JobStatusResponse.model_validate(job)
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, request: Request) -> Response:
+    jobs = request.app.state.jobs
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "expired":
+        raise HTTPException(status_code=410, detail="Job result has expired")
+    if job["status"] in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job {job['status']}: {job['error']}")
+    compressed = jobs.result(job_id)
+    if compressed is None:
+        raise HTTPException(status_code=410, detail="Job result has expired")
+    if accepts_encoding(request.headers.get("accept-encoding", ""), "gzip"):
+        return Response(content=compressed, media_type="application/json", headers={"Content-Encoding": "gzip"})
+    return Response(content=gzip.decompress(compressed), media_type="application/json")
@@ -0,0 +1,90 @@
+import json
+import os
+from typing import AsyncIterator, Iterator
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from app.api.negotiation import accepted_msgpack_profile, msgpack_response, negotiate
+from app.core.cancellation import CancellationToken
+from app.services.rows import RowStream, materialize
+
+
+def _dumps(value) -> str:
+    # Same settings as Starlette's JSONResponse.
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+def stream_min_rows() -> int:
+    return int(os.getenv("STREAM_MIN_ROWS", "10000"))
+
+
+def stream_chunk_rows() -> int:
+    return int(os.getenv("STREAM_CHUNK_ROWS", "4096"))
+
+
+def iter_json(document: dict, chunk_rows: int) -> Iterator[bytes]:
+    """``document`` as JSON bytes; ``RowStream`` values are built and encoded ``chunk_rows`` at a time."""
+    yield b"{"
+    for position, (key, value) in enumerate(document.items()):
+        head = ("," if position else "") + _dumps(key) + ":"
+        if not isinstance(value, RowStream):
+            yield (head + _dumps(value)).encode("utf-8")
+            continue
+        yield (head + "[").encode("utf-8")
+        separator = ""
+        for chunk in value.chunks(chunk_rows):
+            yield (separator + _dumps(chunk)[1:-1]).encode("utf-8")
+            separator = ","
+        yield b"]"
+    yield b"}"
+
+
+async def stream_in_lane(parts: Iterator[bytes], request: Request) -> AsyncIterator[bytes]:
+    """``parts`` advanced on the request's scheduler lane, checking its cancellation token.
+
+    The lane and token are the ones ``run_with_metrics`` used for the request
+    (``request.state.work``); other requests stream on the small lane. The
+    lane slot is held until the body is sent. An error or cancellation after
+    the first part propagates, so the server aborts the connection instead
+    of ending the JSON document early.
+    """
+    scheduler = request.app.state.scheduler
+    work_class, cancel = getattr(request.state, "work", (scheduler.classes["small"], CancellationToken()))
+
+    def next_part() -> bytes | None:
+        cancel.check()
+        return next(parts, None)
+
+    async with scheduler.slot(work_class):
+        while (part := await scheduler.run_sync(next_part)) is not None:
+            yield part
+
+
+def respond_rows(
+    request: Request,
+    model: type[BaseModel] | None,
+    result: dict,
+    validate: bool = True,
+) -> BaseModel | Response:
+    """Like ``negotiate``, but streams large JSON results.
+
+    Results with at least ``STREAM_MIN_ROWS`` rows across their ``RowStream``
+    values go out as a chunked JSON body in the same document shape. Rows are
+    built and encoded ``STREAM_CHUNK_ROWS`` at a time while the body is sent,
+    so the response starts before the last row exists; see ``stream_in_lane``. MessagePack and smaller
+    results are materialized and validated against ``model`` as before.
+    ``validate=False`` skips the model for results that are not shaped like
+    it, such as projections and pages.
+    """
+    rows = sum(len(value) for value in result.values() if isinstance(value, RowStream))
+    profile = accepted_msgpack_profile(request.headers.get("accept", ""))
+    if rows >= stream_min_rows() and profile is None:
+        parts = iter_json(result, stream_chunk_rows())
+        return StreamingResponse(stream_in_lane(parts, request), media_type="application/json")
+    if validate:
+        return negotiate(request, model, materialize(result))
+    if profile is None:
+        return JSONResponse(materialize(result))
+    return msgpack_response(materialize(result), profile)
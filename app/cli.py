@@ -0,0 +1,47 @@
+"""Command-line entry points.
+
+    python -m app.cli ingest parse expenses.csv parsed.arrow
+    python -m app.cli ingest filter transactions.arrow filtered.csv --rules rules.json
+
+``rules.json`` holds the ``q``, ``p``, ``k`` and ``kMode`` fields of a filter
+request. The run summary is printed as JSON.
+"""
+
+import argparse
+import json
+import sys
+
+from app.schemas.common import IngestFilterRequest
+from app.services.ingest import ingest_filter, ingest_parse
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="run parse or filter over a CSV / Arrow IPC file")
+    ingest.add_argument("operation", choices=("parse", "filter"))
+    ingest.add_argument("input")
+    ingest.add_argument("output")
+    ingest.add_argument("--rules", default="", help="JSON file with q/p/k/kMode (filter only)")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.operation == "parse":
+            summary = ingest_parse(args.input, args.output)
+        else:
+            rules = {}
+            if args.rules:
+                with open(args.rules, encoding="utf-8") as handle:
+                    rules = json.load(handle)
+            payload = IngestFilterRequest.model_validate({**rules, "input": args.input, "output": args.output})
+            summary = ingest_filter(args.input, args.output, payload)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+from collections import deque
+
+import anyio
+import psutil
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.security import get_header
+
+# Request models reject lists of 1,000,000 items or more.
+MAX_ROWS = 1_000_000
+BODY_METHODS = ("POST", "PUT", "PATCH")
+
+
+class RequestMemory:
+    """Process RSS high-water mark observed while one request was in flight.
+
+    RSS is process-wide: other requests in flight at the same time add to it,
+    so this is an upper bound on the request's own memory, not a measurement.
+    """
+
+    def __init__(self, baseline: int) -> None:
+        self.baseline = baseline
+        self.peak = baseline
+
+    def observe(self, rss: int) -> None:
+        if rss > self.peak:
+            self.peak = rss
+
+    @property
+    def rss_growth_bytes(self) -> int:
+        return max(0, self.peak - self.baseline)
+
+
+class MemoryTracker:
+    """Samples process RSS on a background thread while requests are in flight.
+
+    Every in-flight request sees every sample, so concurrent requests share
+    attribution of the memory they allocate together.
+    """
+
+    def __init__(self, interval_seconds: float | None = None) -> None:
+        self.interval = interval_seconds or float(os.getenv("MEMORY_SAMPLE_INTERVAL_MS", "10")) / 1000
+        self._process = psutil.Process(os.getpid())
+        self._active: set[RequestMemory] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def rss(self) -> int:
+        return self._process.memory_info().rss
+
+    def start(self) -> RequestMemory:
+        handle = RequestMemory(self.rss())
+        with self._lock:
+            self._active.add(handle)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="memory-sampler", daemon=True)
+                self._thread.start()
+        return handle
+
+    def stop(self, handle: RequestMemory) -> None:
+        handle.observe(self.rss())
+        with self._lock:
+            self._active.discard(handle)
+
+    def _sample(self) -> None:
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                handles = list(self._active)
+            rss = self.rss()
+            for handle in handles:
+                handle.observe(rss)
+            time.sleep(self.interval)
+
+
+class _Waiter:
+    __slots__ = ("estimate", "event")
+
+    def __init__(self, estimate: int) -> None:
+        self.estimate = estimate
+        self.event = anyio.Event()
+
+
+class AdmissionController:
+    """In-flight memory budget shared by the admission middleware and ``/performance``.
+
+    The estimate comes from ``Content-Length`` and the row count derived from
+    the body size. An ``X-Row-Count`` hint can raise the row count, up to the
+    1,000,000 row model limit, but never lower it. A body without a length
+    (chunked upload) is assumed to be ``ADMISSION_UNKNOWN_BODY_MB``. Compressed
+    bodies are assumed to expand by ``ADMISSION_COMPRESSION_RATIO``. A request
+    that does not fit waits in FIFO order for up to
+    ``ADMISSION_QUEUE_TIMEOUT_S``; every release wakes the head of the queue.
+    A request larger than the whole budget is still admitted once nothing else
+    is in flight.
+    """
+
+    def __init__(self, tracker: MemoryTracker | None = None) -> None:
+        self.tracker = tracker or MemoryTracker()
+        self.budget_bytes = int(float(os.getenv("MEMORY_BUDGET_MB", "1024")) * 1024 * 1024)
+        self.queue_timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "5"))
+        self.retry_after = os.getenv("ADMISSION_RETRY_AFTER_S", "5")
+        self.bytes_per_row = int(os.getenv("ADMISSION_BYTES_PER_ROW", "1600"))
+        self.body_bytes_per_row = int(os.getenv("ADMISSION_BODY_BYTES_PER_ROW", "64"))
+        self.compression_ratio = float(os.getenv("ADMISSION_COMPRESSION_RATIO", "8"))
+        self.unknown_body_bytes = int(float(os.getenv("ADMISSION_UNKNOWN_BODY_MB", "16")) * 1024 * 1024)
+        self.in_flight_bytes = 0
+        self.in_flight = 0
+        self.waiters: deque[_Waiter] = deque()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def estimate(self, scope: Scope) -> int:
+        if self.budget_bytes <= 0:
+            return 0
+        content_length = get_header(scope, b"content-length")
+        if content_length.isdigit():
+            body_bytes = int(content_length)
+        elif get_header(scope, b"transfer-encoding") or scope.get("method") in BODY_METHODS:
+            body_bytes = self.unknown_body_bytes
+        else:
+            body_bytes = 0
+        if get_header(scope, b"content-encoding").strip().lower() not in ("", "identity"):
+            body_bytes = int(body_bytes * self.compression_ratio)
+        rows = body_bytes // self.body_bytes_per_row
+        hint = get_header(scope, b"x-row-count")
+        if hint.isdigit():
+            rows = max(rows, min(int(hint), MAX_ROWS))
+        return body_bytes * 2 + rows * self.bytes_per_row
+
+    def _fits(self, estimate: int) -> bool:
+        return self.in_flight == 0 or self.in_flight_bytes + estimate <= self.budget_bytes
+
+    def _wake(self) -> None:
+        if self.waiters and self._fits(self.waiters[0].estimate):
+            self.waiters[0].event.set()
+
+    async def acquire(self, estimate: int) -> bool:
+        if estimate and (self.waiters or not self._fits(estimate)):
+            waiter = _Waiter(estimate)
+            self.waiters.append(waiter)
+            self.stats["queued"] += 1
+            admitted = False
+            try:
+                with anyio.move_on_after(self.queue_timeout):
+                    while not (self.waiters[0] is waiter and self._fits(estimate)):
+                        await waiter.event.wait()
+                        waiter.event = anyio.Event()
+                    admitted = True
+            finally:
+                self.waiters.remove(waiter)
+                # The next waiter may fit too, or may now be at the head after a timeout.
+                self._wake()
+            if not admitted:
+                self.stats["rejected"] += 1
+                return False
+
+        self.stats["admitted"] += 1
+        self.in_flight += 1
+        self.in_flight_bytes += estimate
+        return True
+
+    def release(self, estimate: int) -> None:
+        self.in_flight -= 1
+        self.in_flight_bytes -= estimate
+        self._wake()
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "budgetMb": round(self.budget_bytes / (1024 * 1024), 2),
+            "inFlight": self.in_flight,
+            "inFlightEstimateMb": round(self.in_flight_bytes / (1024 * 1024), 2),
+            "waiting": len(self.waiters),
+        }
+
+
+class AdmissionMiddleware:
+    """Rejects with 503 + ``Retry-After`` when a request cannot be admitted in time.
+
+    Also attaches a ``RequestMemory`` handle to ``request.state.memory`` so
+    handlers can record the RSS growth seen while the request ran.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController | None = None) -> None:
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        estimate = controller.estimate(scope)
+        if not await controller.acquire(estimate):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server memory budget exhausted, retry later"},
+                headers={"Retry-After": controller.retry_after},
+            )
+            await response(scope, receive, send)
+            return
+
+        handle = controller.tracker.start()
+        scope.setdefault("state", {})["memory"] = handle
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.tracker.stop(handle)
+            controller.release(estimate)
@@ -0,0 +1,51 @@
+import time
+
+
+CHECK_EVERY = 4096
+
+
+class OperationCancelled(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"operation cancelled: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cooperative cancellation shared between a request and its engine work.
+
+    Engine loops call ``checkpoint`` every ``CHECK_EVERY`` rows; it raises
+    ``OperationCancelled`` once the token is cancelled or its deadline passes.
+    """
+
+    def __init__(self, deadline: float | None = None) -> None:
+        self.deadline = deadline
+        self.reason: str | None = None
+
+    @classmethod
+    def with_timeout(cls, timeout_ms: float | None) -> "CancellationToken":
+        if not timeout_ms or timeout_ms <= 0:
+            return cls()
+        return cls(deadline=time.monotonic() + timeout_ms / 1000)
+
+    def remaining(self) -> float | None:
+        """Seconds left before the deadline, or ``None`` without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str) -> None:
+        if self.reason is None:
+            self.reason = reason
+
+    def check(self) -> None:
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "deadline"
+        if self.reason is not None:
+            raise OperationCancelled(self.reason)
+
+    def checkpoint(self, done: int, total: int) -> None:
+        self.check()
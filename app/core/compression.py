@@ -0,0 +1,297 @@
+import os
+import zlib
+
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is only offered when the package is installed
+    zstandard = None
+
+
+# Largest list the request schemas accept; bounds how far a compressed body may expand.
+MAX_ROWS = 1_000_000
+# Decompressed bodies are read in slices of this size so one small chunk cannot expand unbounded.
+DECOMPRESS_SLICE = 256 * 1024
+
+
+def supported_encodings() -> tuple[str, ...]:
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+class DecodedTooLarge(Exception):
+    pass
+
+
+class _GzipDecoder:
+    def __init__(self, limit: int) -> None:
+        self._inner = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.limit = limit
+        self.total = 0
+
+    def _take(self, part: bytes) -> bytes:
+        self.total += len(part)
+        if self.total > self.limit:
+            raise DecodedTooLarge()
+        return part
+
+    def decode(self, data: bytes) -> bytes:
+        parts = [self._take(self._inner.decompress(data, DECOMPRESS_SLICE))]
+        while self._inner.unconsumed_tail:
+            parts.append(self._take(self._inner.decompress(self._inner.unconsumed_tail, DECOMPRESS_SLICE)))
+        return b"".join(parts)
+
+    def finish(self) -> bytes:
+        if not self._inner.eof:
+            raise zlib.error("truncated gzip stream")
+        return self._take(self._inner.flush())
+
+
+class _LimitedSink:
+    """Write target for the zstd stream writer; refuses output past the limit."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.total = 0
+        self.parts: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.total += len(data)
+        if self.total > self.limit:
+            raise DecodedTooLarge()
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+class _ZstdDecoder:
+    def __init__(self, limit: int) -> None:
+        self._sink = _LimitedSink(limit)
+        self._inner = zstandard.ZstdDecompressor().stream_writer(
+            self._sink, write_size=DECOMPRESS_SLICE, closefd=False
+        )
+
+    @property
+    def total(self) -> int:
+        return self._sink.total
+
+    def decode(self, data: bytes) -> bytes:
+        self._inner.write(data)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._inner.flush()
+        return self._sink.drain()
+
+
+def _decoder(encoding: str, limit: int):
+    if encoding in ("gzip", "x-gzip"):
+        return _GzipDecoder(limit)
+    if encoding == "zstd" and zstandard is not None:
+        return _ZstdDecoder(limit)
+    return None
+
+
+def _encoder(encoding: str, gzip_level: int, zstd_level: int):
+    """``(compress, sync_flush, finish)``; ``sync_flush`` ends the current block so the client can decode it now."""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+        return (
+            compressor.compress,
+            lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH),
+        )
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _qualities(accept_encoding: str) -> dict[str, float]:
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            qualities[name.strip()] = quality
+    return qualities
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether ``Accept-Encoding`` allows ``encoding``: listed with ``q`` above 0, or covered by ``*``."""
+    qualities = _qualities(accept_encoding)
+    return qualities.get(encoding, qualities.get("*", 0.0)) > 0
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Best supported coding the client accepts; zstd wins over gzip when both are allowed."""
+    for encoding in supported_encodings():
+        if accepts_encoding(accept_encoding, encoding):
+            return encoding
+    return None
+
+
+def _header(headers: list, name: bytes) -> str:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+class CompressionMiddleware:
+    """Decodes ``Content-Encoding: gzip|zstd`` request bodies and compresses large responses.
+
+    Request bodies are inflated chunk by chunk as the handler reads them and
+    rejected with ``413`` once the decoded size passes ``MAX_DECOMPRESSED_BYTES``
+    (by default ``MAX_ROWS`` rows at ``DECOMPRESSED_BYTES_PER_ROW``). The decoded
+    size is left in ``request.state.body_bytes``.
+
+    Responses of at least ``COMPRESSION_MIN_BYTES`` are streamed through gzip
+    (``COMPRESSION_GZIP_LEVEL``) or zstd (``COMPRESSION_ZSTD_LEVEL``) according
+    to ``Accept-Encoding``. Responses that already carry a ``Content-Encoding``
+    are passed through.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        per_row = int(os.getenv("DECOMPRESSED_BYTES_PER_ROW", "256"))
+        self.max_decoded = int(os.getenv("MAX_DECOMPRESSED_BYTES", str(MAX_ROWS * per_row)))
+        self.min_size = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+        self.gzip_level = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+        self.zstd_level = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "1"))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = list(scope.get("headers", ()))
+        content_encoding = _header(headers, b"content-encoding").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            decoder = _decoder(content_encoding, self.max_decoded)
+            if decoder is None:
+                response = JSONResponse(
+                    status_code=415,
+                    content={"detail": f"Unsupported Content-Encoding '{content_encoding}'"},
+                    headers={"Accept-Encoding": ", ".join(supported_encodings())},
+                )
+                await response(scope, receive, send)
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (key, value) for key, value in headers if key.lower() not in (b"content-encoding", b"content-length")
+            ]
+            receive = self._decoding_receive(scope, receive, decoder)
+
+        encoding = choose_encoding(_header(headers, b"accept-encoding"))
+        if encoding is not None:
+            send = self._compressing_send(send, encoding)
+
+        started = False
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal started
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, tracking_send)
+        except HTTPException as exc:
+            if started or exc.status_code not in (400, 413):
+                raise
+            response = JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+            await response(scope, receive, send)
+
+    def _decoding_receive(self, scope: Scope, receive: Receive, decoder) -> Receive:
+        state = scope.setdefault("state", {})
+
+        async def decoding_receive() -> Message:
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            more_body = message.get("more_body", False)
+            try:
+                body = decoder.decode(message.get("body", b""))
+                if not more_body:
+                    body += decoder.finish()
+            except DecodedTooLarge as exc:
+                raise HTTPException(status_code=413, detail="Decompressed request body is too large") from exc
+            except Exception as exc:
+                raise HTTPException(status_code=400, detail="Malformed compressed request body") from exc
+            state["body_bytes"] = decoder.total
+            return {"type": "http.request", "body": body, "more_body": more_body}
+
+        return decoding_receive
+
+    def _compressing_send(self, send: Send, encoding: str) -> Send:
+        min_size = self.min_size
+        pending: list[Message] = []
+        buffered = 0
+        compress = sync_flush = finish = None
+        passthrough = False
+
+        async def start_compressed(start: Message) -> None:
+            nonlocal compress, sync_flush, finish
+            compress, sync_flush, finish = _encoder(encoding, self.gzip_level, self.zstd_level)
+            headers = [(key, value) for key, value in start.get("headers", ()) if key.lower() != b"content-length"]
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers.append((b"vary", b"Accept-Encoding"))
+            await send({**start, "headers": headers})
+
+        async def compressing_send(message: Message) -> None:
+            nonlocal buffered, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", ())
+                length = _header(headers, b"content-length")
+                if _header(headers, b"content-encoding") or (length.isdigit() and int(length) < min_size):
+                    passthrough = True
+                    await send(message)
+                    return
+                pending.append(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compress is None:
+                pending.append(message)
+                buffered += len(body)
+                if buffered < min_size and more_body:
+                    return
+                start, *bodies = pending
+                pending.clear()
+                if buffered < min_size:
+                    passthrough = True
+                    await send(start)
+                    for item in bodies:
+                        await send(item)
+                    return
+                await start_compressed(start)
+                body = b"".join(item.get("body", b"") for item in bodies)
+
+            chunk = compress(body)
+            if not more_body:
+                chunk += finish()
+            elif body:
+                # Streamed rows reach the client as they are produced, not when the compressor's buffer fills.
+                chunk += sync_flush()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        return compressing_send
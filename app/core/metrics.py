@@ -0,0 +1,373 @@
+"""In-process metrics with Prometheus/OpenMetrics text exposition.
+
+Series are plain floats keyed by ``(sample name, labels)``. Every series has
+a single writer: request, rate-limit and scheduler series are only updated
+from the event loop thread, and process stats are only set by collectors that
+run on it too. That keeps updates lock-free and a few microseconds per
+request. Nothing touches the metrics database.
+
+With ``METRICS_MULTIPROC_DIR`` set, each worker process writes its series to
+its own memory-mapped file in that directory. A scrape on any worker reads
+every file:
+- Counters and histograms are summed across all files, including those of
+  workers that have exited.
+- Gauges are summed across live workers.
+- Per-process series carry a ``pid`` label and are dropped once their worker
+  is gone.
+Clear the directory before the workers start.
+"""
+
+import bisect
+import gc
+import json
+import mmap
+import os
+import struct
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+import anyio
+import psutil
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# family name -> (type, help)
+FAMILIES = {
+    "app_requests": ("counter", "HTTP requests served, by route, method and status."),
+    "app_request_duration_seconds": ("histogram", "HTTP request latency, by route, method and status."),
+    "app_rate_limited": ("counter", "Requests rejected by the per-client rate limit."),
+    "app_scheduler_queue_depth": ("gauge", "Engine calls waiting for a scheduler lane."),
+    "app_scheduler_active": ("gauge", "Engine calls running in a scheduler lane."),
+    "app_scheduler_completed": ("counter", "Engine calls finished per scheduler lane."),
+    "app_cache_hits": ("counter", "Cache lookups answered from the cache."),
+    "app_cache_misses": ("counter", "Cache lookups that missed."),
+    "app_jobs_queued": ("gauge", "Background jobs waiting for a job worker."),
+    "app_jobs_running": ("gauge", "Background jobs running on a job worker."),
+    "app_threads_busy": ("gauge", "Worker threads borrowed from the default anyio thread limiter."),
+    "app_threads_limit": ("gauge", "Size of the default anyio thread limiter."),
+    "process_resident_memory_bytes": ("gauge", "Resident set size of the worker process."),
+    "process_cpu_seconds": ("counter", "User and system CPU time of the worker process."),
+    "process_threads": ("gauge", "Threads in the worker process."),
+    "python_gc_collections": ("counter", "Garbage collector runs per generation."),
+    "python_gc_objects_collected": ("counter", "Objects collected per generation."),
+    "python_gc_objects_uncollectable": ("counter", "Uncollectable objects found per generation."),
+}
+_SUFFIXES = ("_total", "_bucket", "_sum", "_count")
+
+Key = tuple[str, tuple[tuple[str, str], ...]]
+
+
+def family_of(sample: str) -> str:
+    if sample in FAMILIES:
+        return sample
+    for suffix in _SUFFIXES:
+        if sample.endswith(suffix) and sample[: -len(suffix)] in FAMILIES:
+            return sample[: -len(suffix)]
+    raise KeyError(sample)
+
+
+class _MmapValues:
+    """Append-only ``key -> float64`` file written by one process.
+
+    Layout: an 8-byte used length, then entries of a 4-byte key length, the
+    JSON key padded to 8 bytes, and the value. The used length is written
+    after the entry, so readers never see a partial one.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = open(path, "a+b")
+        if os.path.getsize(path) < self.INITIAL_SIZE:
+            self._file.truncate(self.INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._used = struct.unpack_from("q", self._map, 0)[0] or 8
+        self._offsets = {key: offset for key, offset, _ in _read_entries(self._map, self._used)}
+
+    def _offset(self, key: Key) -> int:
+        offset = self._offsets.get(key)
+        if offset is not None:
+            return offset
+        encoded = json.dumps([key[0], [list(pair) for pair in key[1]]]).encode("utf-8")
+        padded = encoded + b" " * (-(len(encoded) + 4) % 8)
+        needed = self._used + 4 + len(padded) + 8
+        if needed > len(self._map):
+            size = len(self._map)
+            while size < needed:
+                size *= 2
+            self._map.close()
+            self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        struct.pack_into(f"i{len(padded)}sd", self._map, self._used, len(padded), padded, 0.0)
+        offset = self._used + 4 + len(padded)
+        self._used = needed
+        struct.pack_into("q", self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def inc(self, key: Key, amount: float) -> None:
+        offset = self._offset(key)
+        struct.pack_into("d", self._map, offset, struct.unpack_from("d", self._map, offset)[0] + amount)
+
+    def set(self, key: Key, value: float) -> None:
+        struct.pack_into("d", self._map, self._offset(key), value)
+
+    def items(self) -> list[tuple[Key, float]]:
+        return [(key, value) for key, _, value in _read_entries(self._map, self._used)]
+
+
+class _DictValues:
+    def __init__(self) -> None:
+        self._values: dict[Key, float] = {}
+
+    def inc(self, key: Key, amount: float) -> None:
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key: Key, value: float) -> None:
+        self._values[key] = value
+
+    def items(self) -> list[tuple[Key, float]]:
+        return list(self._values.items())
+
+
+def _read_entries(data, used: int):
+    position = 8
+    while position < used:
+        length = struct.unpack_from("i", data, position)[0]
+        name, labels = json.loads(bytes(data[position + 4:position + 4 + length]))
+        offset = position + 4 + length
+        yield (name, tuple(tuple(pair) for pair in labels)), offset, struct.unpack_from("d", data, offset)[0]
+        position = offset + 8
+
+
+def _labels(**labels: str) -> tuple[tuple[str, str], ...]:
+    return tuple(labels.items())
+
+
+class Metrics:
+    """Counters, gauges and latency histograms for one worker process."""
+
+    def __init__(self, directory: str | None = None) -> None:
+        self.pid = os.getpid()
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.values = _MmapValues(self.directory / f"metrics_{self.pid}.db")
+        else:
+            self.values = _DictValues()
+        self.collectors: list[Callable[["Metrics"], None]] = [collect_process, collect_threads]
+        self.refresh_seconds = float(os.getenv("METRICS_REFRESH_SECONDS", "5"))
+        self._next_refresh = 0.0
+
+    def inc(self, sample: str, amount: float = 1.0, **labels: str) -> None:
+        self.values.inc((sample, _labels(**labels)), float(amount))
+
+    def set(self, sample: str, value: float, **labels: str) -> None:
+        self.values.set((sample, _labels(**labels)), float(value))
+
+    def observe(self, family: str, seconds: float, **labels: str) -> None:
+        """One histogram observation; buckets are stored per bound and summed up at exposition."""
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        bound = str(LATENCY_BUCKETS[index]) if index < len(LATENCY_BUCKETS) else "+Inf"
+        self.values.inc((f"{family}_bucket", _labels(**labels, le=bound)), 1.0)
+        self.values.inc((f"{family}_sum", _labels(**labels)), seconds)
+        self.values.inc((f"{family}_count", _labels(**labels)), 1.0)
+
+    def collect(self) -> None:
+        for collector in self.collectors:
+            collector(self)
+
+    def maybe_refresh(self) -> None:
+        """Re-runs the collectors at most every ``METRICS_REFRESH_SECONDS`` so other workers see fresh values."""
+        now = time.monotonic()
+        if self.directory is not None and now >= self._next_refresh:
+            self._next_refresh = now + self.refresh_seconds
+            self.collect()
+
+    def samples(self) -> dict[Key, float]:
+        """Every series, merged across worker files in multiprocess mode."""
+        self.collect()
+        if self.directory is None:
+            return dict(self.values.items())
+        merged: dict[Key, float] = {}
+        for path in sorted(self.directory.glob("metrics_*.db")):
+            pid = int(path.stem.split("_", 1)[1])
+            alive = pid == self.pid or psutil.pid_exists(pid)
+            items = self.values.items() if pid == self.pid else _read_file(path)
+            for key, value in items:
+                kind = FAMILIES[family_of(key[0])][0]
+                per_process = any(name == "pid" for name, _ in key[1])
+                if not alive and (kind == "gauge" or per_process):
+                    continue
+                merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+    def render(self, openmetrics: bool = True) -> str:
+        by_family: dict[str, list[tuple[Key, float]]] = {}
+        for key, value in self.samples().items():
+            by_family.setdefault(family_of(key[0]), []).append((key, value))
+        lines = []
+        for family, (kind, help_text) in FAMILIES.items():
+            series = by_family.get(family)
+            if not series:
+                continue
+            # The Prometheus text format names counters by their sample; OpenMetrics drops the suffix.
+            name = f"{family}_total" if kind == "counter" and not openmetrics else family
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                lines.extend(_histogram_lines(family, series))
+            else:
+                for (sample, labels), value in sorted(series):
+                    lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _read_file(path: Path) -> list[tuple[Key, float]]:
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if len(data) < 8:
+        return []
+    return [(key, value) for key, _, value in _read_entries(data, struct.unpack_from("q", data, 0)[0])]
+
+
+def _histogram_lines(family: str, series: list[tuple[Key, float]]) -> list[str]:
+    groups: dict[tuple, dict] = {}
+    for (sample, labels), value in series:
+        base = tuple(pair for pair in labels if pair[0] != "le")
+        group = groups.setdefault(base, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        if sample.endswith("_bucket"):
+            bound = dict(labels)["le"]
+            group["buckets"][bound] = group["buckets"].get(bound, 0.0) + value
+        elif sample.endswith("_sum"):
+            group["sum"] += value
+        else:
+            group["count"] += value
+    lines = []
+    for base, group in sorted(groups.items()):
+        cumulative = 0.0
+        for bound in [*map(str, LATENCY_BUCKETS), "+Inf"]:
+            cumulative += group["buckets"].get(bound, 0.0)
+            lines.append(f"{family}_bucket{_format_labels((*base, ('le', bound)))} {_format_value(cumulative)}")
+        lines.append(f"{family}_sum{_format_labels(base)} {_format_value(group['sum'])}")
+        lines.append(f"{family}_count{_format_labels(base)} {_format_value(group['count'])}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+@lru_cache(maxsize=1)
+def _process() -> psutil.Process:
+    return psutil.Process(os.getpid())
+
+
+def process_age_ms() -> float:
+    """Milliseconds since this process was created (clock-tick resolution)."""
+    return (time.time() - _process().create_time()) * 1000
+
+
+def collect_process(metrics: Metrics) -> None:
+    """RSS, CPU time, threads and GC stats of this process."""
+    pid = str(metrics.pid)
+    process = _process()
+    with process.oneshot():
+        cpu = process.cpu_times()
+        metrics.set("process_resident_memory_bytes", float(process.memory_info().rss), pid=pid)
+        metrics.set("process_cpu_seconds_total", cpu.user + cpu.system, pid=pid)
+        metrics.set("process_threads", float(process.num_threads()), pid=pid)
+    for generation, stats in enumerate(gc.get_stats()):
+        labels = {"pid": pid, "generation": str(generation)}
+        metrics.set("python_gc_collections_total", float(stats["collections"]), **labels)
+        metrics.set("python_gc_objects_collected_total", float(stats["collected"]), **labels)
+        metrics.set("python_gc_objects_uncollectable_total", float(stats["uncollectable"]), **labels)
+
+
+def collect_threads(metrics: Metrics) -> None:
+    """Borrowed and total tokens of the thread limiter ``anyio.to_thread`` calls share; needs the event loop."""
+    try:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+    except RuntimeError:  # no event loop running, e.g. a scrape of the series from a plain thread
+        return
+    metrics.set("app_threads_busy", float(limiter.borrowed_tokens))
+    metrics.set("app_threads_limit", float(limiter.total_tokens))
+
+
+def jobs_collector(jobs) -> Callable[[Metrics], None]:
+    """Publishes the queued and running counts of a ``JobManager``."""
+
+    def collect(metrics: Metrics) -> None:
+        metrics.set("app_jobs_queued", float(jobs.queued))
+        metrics.set("app_jobs_running", float(jobs.running))
+
+    return collect
+
+
+def cache_collector(name: str, cached: Callable) -> Callable[[Metrics], None]:
+    """Publishes the hit and miss counts of an ``lru_cache``-wrapped function as cache ``name``."""
+
+    def collect(metrics: Metrics) -> None:
+        info = cached.cache_info()
+        metrics.set("app_cache_hits_total", float(info.hits), cache=name, pid=str(metrics.pid))
+        metrics.set("app_cache_misses_total", float(info.misses), cache=name, pid=str(metrics.pid))
+
+    return collect
+
+
+def create_metrics() -> Metrics:
+    return Metrics(os.getenv("METRICS_MULTIPROC_DIR") or None)
+
+
+class MetricsMiddleware:
+    """Counts every HTTP response and observes its latency by route template, method and status.
+
+    The route template comes from ``request.state.route_path``, which the API
+    route class sets; other paths are reported as ``other``.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            labels = {"route": state.get("route_path", "other"), "method": scope["method"], "status": str(status)}
+            self.metrics.inc("app_requests_total", **labels)
+            self.metrics.observe("app_request_duration_seconds", time.perf_counter() - started, **labels)
+            self.metrics.maybe_refresh()
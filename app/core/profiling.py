@@ -0,0 +1,144 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+_current_timings: ContextVar["StageTimings | None"] = ContextVar("stage_timings", default=None)
+_profile_lock = threading.Lock()
+
+
+class StageTimings:
+    """Wall-clock milliseconds per named stage of one request."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.headers: dict[str, str] = {}
+        self.handler_started: float | None = None
+        self.handler_finished: float | None = None
+        self.on_complete: Callable[[dict], None] | None = None
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - started) * 1000)
+
+    def add(self, name: str, duration_ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + duration_ms
+
+    def mark_handler_start(self) -> None:
+        self.handler_started = time.perf_counter()
+        self.add("validation", (self.handler_started - self.started) * 1000)
+
+    def mark_handler_end(self) -> None:
+        self.handler_finished = time.perf_counter()
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [f"{name};dur={duration:.3f}" for name, duration in self.stages.items()]
+        parts.append(f"total;dur={total:.3f}")
+        return ", ".join(parts)
+
+
+def current_timings() -> StageTimings | None:
+    return _current_timings.get()
+
+
+def stage(name: str):
+    """Times a block against the current request; a no-op outside a request."""
+    timings = _current_timings.get()
+    if timings is None:
+        return nullcontext()
+    return timings.stage(name)
+
+
+class ServerTimingMiddleware:
+    """Collects stage timings per request and emits them as a ``Server-Timing`` header.
+
+    ``validation`` covers body receive, decoding and schema validation (middleware
+    entry until the handler starts); ``serialize`` covers response model
+    validation and encoding (handler end until the response starts). Handlers
+    register ``on_complete`` to persist the final stage map once it is known.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = StageTimings()
+        token = _current_timings.set(timings)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                if timings.handler_finished is not None:
+                    timings.add("serialize", (time.perf_counter() - timings.handler_finished) * 1000)
+                headers = list(message.get("headers", ()))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                for name, value in timings.headers.items():
+                    headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+            if timings.on_complete is not None:
+                timings.on_complete(dict(timings.stages))
+
+
+def run_profiled(operation: Callable) -> tuple[object, dict]:
+    """Runs ``operation`` under cProfile and tracemalloc.
+
+    tracemalloc is process-wide, so profiled requests are serialized; the
+    allocation figures still include other requests running concurrently.
+    """
+    profile_id = uuid.uuid4().hex
+    profiler = cProfile.Profile()
+    with _profile_lock:
+        tracemalloc.start(10)
+        try:
+            profiler.enable()
+            try:
+                result = operation()
+            finally:
+                profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    profiler.create_stats()
+    raw_stats = marshal.dumps(profiler.stats)
+    text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    stats.sort_stats("cumulative").print_stats(40)
+    text.write(f"\ntracemalloc: current={current} bytes peak={peak} bytes\n")
+    text.write("top allocations by line:\n")
+    for entry in snapshot.statistics("lineno")[:20]:
+        text.write(f"  {entry}\n")
+
+    profile = {
+        "id": profile_id,
+        "stats": raw_stats,
+        "summary": text.getvalue(),
+        "peakMemoryBytes": peak,
+    }
+    return result, profile
@@ -0,0 +1,118 @@
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable
+
+import anyio
+import anyio.to_thread
+
+
+class WorkClass:
+    """One executor lane: a fixed number of worker threads and a FIFO wait queue."""
+
+    def __init__(self, name: str, concurrency: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.limiter = anyio.CapacityLimiter(concurrency)
+        self.waiting = 0
+        self.active = 0
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.recent_waits: deque[float] = deque(maxlen=1000)
+
+    def record_wait(self, wait_ms: float) -> None:
+        self.started += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        self.recent_waits.append(wait_ms)
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.recent_waits)
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queueDepth": self.waiting,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "avgWaitMs": round(self.wait_ms_total / self.started, 3) if self.started else 0.0,
+            "maxWaitMs": round(self.wait_ms_max, 3),
+            "p99WaitMs": round(ordered[max(0, int(len(ordered) * 0.99) - 1)], 3) if ordered else 0.0,
+        }
+
+
+# File ingest streams whole files regardless of the tiny request body.
+ALWAYS_LARGE = frozenset({"ingest:transactions:parse", "ingest:transactions:filter"})
+
+
+class Scheduler:
+    """Routes engine work to separately sized executors by request size or endpoint.
+
+    Requests whose body is at least ``SCHEDULER_LARGE_BYTES`` or whose endpoint
+    is listed in ``SCHEDULER_LARGE_ENDPOINTS`` run in the ``large`` lane; the
+    rest run in the ``small`` lane, so a burst of big jobs can only occupy the
+    large lane's threads.
+    """
+
+    def __init__(self, metrics=None) -> None:
+        self.metrics = metrics
+        self.large_bytes = int(os.getenv("SCHEDULER_LARGE_BYTES", str(1024 * 1024)))
+        self.large_endpoints = ALWAYS_LARGE | {
+            item.strip() for item in os.getenv("SCHEDULER_LARGE_ENDPOINTS", "").split(",") if item.strip()
+        }
+        self.classes = {
+            "small": WorkClass("small", int(os.getenv("SCHEDULER_SMALL_CONCURRENCY", "16"))),
+            "large": WorkClass("large", int(os.getenv("SCHEDULER_LARGE_CONCURRENCY", "2"))),
+        }
+        # Lane limiters already bound concurrency; threads themselves are not capped again.
+        self._threads = anyio.CapacityLimiter(sum(item.concurrency for item in self.classes.values()))
+
+    def classify(self, endpoint: str, content_length: int) -> WorkClass:
+        if endpoint in self.large_endpoints or content_length >= self.large_bytes:
+            return self.classes["large"]
+        return self.classes["small"]
+
+    @asynccontextmanager
+    async def slot(self, work_class: WorkClass, on_wait: Callable[[float], None] | None = None):
+        """Holds one of ``work_class``'s slots; ``run_sync`` runs code on a thread meanwhile."""
+        work_class.submitted += 1
+        work_class.waiting += 1
+        self._publish(work_class)
+        enqueued = time.perf_counter()
+        try:
+            await work_class.limiter.acquire()
+        finally:
+            work_class.waiting -= 1
+        wait_ms = (time.perf_counter() - enqueued) * 1000
+        work_class.record_wait(wait_ms)
+        if on_wait is not None:
+            on_wait(wait_ms)
+        work_class.active += 1
+        self._publish(work_class)
+        try:
+            yield
+        finally:
+            work_class.active -= 1
+            work_class.completed += 1
+            work_class.limiter.release()
+            self._publish(work_class)
+            if self.metrics is not None:
+                self.metrics.inc("app_scheduler_completed_total", lane=work_class.name)
+
+    async def run_sync(self, func: Callable):
+        return await anyio.to_thread.run_sync(func, limiter=self._threads)
+
+    async def run(self, work_class: WorkClass, func: Callable, on_wait: Callable[[float], None] | None = None):
+        async with self.slot(work_class, on_wait):
+            return await self.run_sync(func)
+
+    def _publish(self, work_class: WorkClass) -> None:
+        if self.metrics is not None:
+            self.metrics.set("app_scheduler_queue_depth", work_class.waiting, lane=work_class.name)
+            self.metrics.set("app_scheduler_active", work_class.active, lane=work_class.name)
+
+    def snapshot(self) -> dict:
+        return {name: work_class.snapshot() for name, work_class in self.classes.items()}
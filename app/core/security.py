@@ -1,27 +1,64 @@
+import hmac
 import os
-import threading
-import time
-from collections import defaultdict, deque
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+import anyio
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.core.shared_state import MemorySharedState, SharedState
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["Referrer-Policy"] = "no-referrer"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Cache-Control"] = "no-store"
-        return response
 
+SECURITY_HEADERS = (
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"referrer-policy", b"no-referrer"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"cache-control", b"no-store"),
+)
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in SECURITY_HEADERS)
 
-class ApiKeyMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+
+def get_header(scope: Scope, name: bytes) -> str:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def is_admin(headers) -> bool:
+    admin_key = os.getenv("ADMIN_API_KEY", "")
+    provided = headers.get("x-admin-key", "")
+    return bool(admin_key) and hmac.compare_digest(provided.encode(), admin_key.encode())
+
+
+def is_peer(headers) -> bool:
+    secret = os.getenv("SCATTER_SECRET", "")
+    provided = headers.get("x-scatter-secret", "")
+    return bool(secret) and hmac.compare_digest(provided.encode(), secret.encode())
+
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [item for item in message.get("headers", ()) if item[0].lower() not in _SECURITY_HEADER_NAMES]
+                headers.extend(SECURITY_HEADERS)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class ApiKeyMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
         self.enabled = os.getenv("REQUIRE_API_KEY", "false").strip().lower() == "true"
         self.api_key = os.getenv("API_KEY", "")
         self.exempt_paths = {
@@ -30,34 +67,42 @@ class ApiKeyMiddleware(BaseHTTPMiddleware):
             "/openapi.json",
         }
 
-    async def dispatch(self, request: Request, call_next):
-        if not self.enabled or request.url.path in self.exempt_paths:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
 
-        provided = request.headers.get("x-api-key", "")
+        provided = get_header(scope, b"x-api-key")
         if not self.api_key or provided != self.api_key:
-            return JSONResponse(status_code=401, content={"detail": "Unauthorized"})
-        return await call_next(request)
+            response = JSONResponse(status_code=401, content={"detail": "Unauthorized"})
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, state: SharedState | None = None, metrics=None) -> None:
+        self.app = app
+        self.metrics = metrics
         self.limit = int(os.getenv("RATE_LIMIT_PER_MIN", "120"))
         self.window_seconds = 60
-        self.hits = defaultdict(deque)
-        self.lock = threading.Lock()
-
-    async def dispatch(self, request: Request, call_next):
-        client = request.client.host if request.client else "unknown"
-        now = time.time()
-
-        with self.lock:
-            bucket = self.hits[client]
-            while bucket and (now - bucket[0]) > self.window_seconds:
-                bucket.popleft()
-            if len(bucket) >= self.limit:
-                return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
-            bucket.append(now)
-
-        return await call_next(request)
+        self.state = state or MemorySharedState()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        if self.state.blocking:
+            allowed = await anyio.to_thread.run_sync(self.state.hit, client, self.limit, self.window_seconds)
+        else:
+            allowed = self.state.hit(client, self.limit, self.window_seconds)
+        if not allowed:
+            self.state.incr("rateLimited")
+            if self.metrics is not None:
+                self.metrics.inc("app_rate_limited_total")
+            response = JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Protocol
+
+import psutil
+
+
+class SharedState(Protocol):
+    # Whether ``hit`` does I/O and must run off the event loop.
+    blocking: bool
+
+    def hit(self, client: str, limit: int, window_seconds: int) -> bool: ...
+
+    def incr(self, name: str, delta: int = 1) -> None: ...
+
+    def counters(self) -> dict: ...
+
+    def close(self) -> None: ...
+
+
+class MemorySharedState:
+    """Per-process state; correct only when the API runs a single worker."""
+
+    blocking = False
+
+    def __init__(self) -> None:
+        self.hits = defaultdict(deque)
+        self.values: dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def hit(self, client: str, limit: int, window_seconds: int) -> bool:
+        now = time.time()
+        with self.lock:
+            bucket = self.hits[client]
+            while bucket and (now - bucket[0]) > window_seconds:
+                bucket.popleft()
+            if len(bucket) >= limit:
+                return False
+            bucket.append(now)
+            return True
+
+    def incr(self, name: str, delta: int = 1) -> None:
+        with self.lock:
+            self.values[name] += delta
+
+    def counters(self) -> dict:
+        with self.lock:
+            values = dict(self.values)
+        values["workers"] = 1
+        return values
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteSharedState:
+    """Node-wide state shared by every worker through a sqlite WAL file.
+
+    Rate limiting uses one counter slot per client and second, so the window
+    has one-second granularity. Slots that left the window are pruned for
+    every client once per second. ``hit`` is blocking I/O, so callers on the
+    event loop run it in a thread.
+
+    Counters are kept per process id and summed on read; rows left by dead
+    workers are folded into pid 0 at startup so totals survive restarts while
+    in-flight gauges do not. ``incr`` only adds to an in-process batch, which a
+    background thread writes every ``SHARED_STATE_FLUSH_MS``; other workers'
+    counters can lag by that much.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str | None = None, flush_interval: float | None = None) -> None:
+        self.path = path or os.getenv("SHARED_STATE_PATH", "shared_state.db")
+        self.pid = os.getpid()
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else float(os.getenv("SHARED_STATE_FLUSH_MS", "200")) / 1000
+        )
+        self._local = threading.local()
+        self._pending: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flusher: threading.Thread | None = None
+        self._pruned_slot = 0
+        self.initialize()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def initialize(self) -> None:
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_slots (
+                client TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                hits INTEGER NOT NULL,
+                PRIMARY KEY (client, slot)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS rate_limit_slots_slot ON rate_limit_slots (slot)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS live_counters (
+                pid INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (pid, name)
+            ) WITHOUT ROWID
+            """
+        )
+        pids = [row[0] for row in conn.execute("SELECT DISTINCT pid FROM live_counters WHERE pid != 0")]
+        stale = [(pid,) for pid in pids if pid != self.pid and not psutil.pid_exists(pid)]
+        if stale:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                """
+                INSERT INTO live_counters (pid, name, value)
+                SELECT 0, name, value FROM live_counters WHERE pid = ? AND name != 'inFlight'
+                ON CONFLICT (pid, name) DO UPDATE SET value = value + excluded.value
+                """,
+                stale,
+            )
+            conn.executemany("DELETE FROM live_counters WHERE pid = ?", stale)
+            conn.execute("COMMIT")
+        self.incr("inFlight", 0)
+        self.flush()
+
+    def hit(self, client: str, limit: int, window_seconds: int) -> bool:
+        slot = int(time.time())
+        oldest = slot - window_seconds
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if slot != self._pruned_slot:
+                self._pruned_slot = slot
+                conn.execute("DELETE FROM rate_limit_slots WHERE slot <= ?", (oldest,))
+            (used,) = conn.execute(
+                "SELECT COALESCE(SUM(hits), 0) FROM rate_limit_slots WHERE client = ? AND slot > ?",
+                (client, oldest),
+            ).fetchone()
+            allowed = used < limit
+            if allowed:
+                conn.execute(
+                    """
+                    INSERT INTO rate_limit_slots (client, slot, hits) VALUES (?, ?, 1)
+                    ON CONFLICT (client, slot) DO UPDATE SET hits = hits + 1
+                    """,
+                    (client, slot),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def incr(self, name: str, delta: int = 1) -> None:
+        with self._lock:
+            self._pending[name] += delta
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="shared-state-flush", daemon=True)
+                self._flusher.start()
+
+    def flush(self) -> None:
+        """Writes this process's batched counter increments."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO live_counters (pid, name, value) VALUES (?, ?, ?)
+                ON CONFLICT (pid, name) DO UPDATE SET value = value + excluded.value
+                """,
+                [(self.pid, name, delta) for name, delta in pending.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            with self._lock:
+                for name, delta in pending.items():
+                    self._pending[name] += delta
+            raise
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # kept in the batch and retried on the next tick
+
+    def close(self) -> None:
+        self.flush()
+
+    def counters(self) -> dict:
+        self.flush()
+        conn = self._conn()
+        values = {
+            name: int(total)
+            for name, total in conn.execute("SELECT name, SUM(value) FROM live_counters GROUP BY name")
+        }
+        (workers,) = conn.execute("SELECT COUNT(DISTINCT pid) FROM live_counters WHERE pid != 0").fetchone()
+        values["workers"] = max(1, int(workers))
+        return values
+
+
+def create_shared_state() -> SharedState:
+    backend = os.getenv("SHARED_STATE_BACKEND", "memory").strip().lower()
+
+    if backend == "memory":
+        return MemorySharedState()
+
+    if backend == "sqlite":
+        return SqliteSharedState()
+
+    raise ValueError(f"Unsupported shared state backend '{backend}'. Use 'memory' or 'sqlite'.")
@@ -1,18 +1,84 @@
+import time
 from contextlib import asynccontextmanager
 
+import anyio
 from fastapi import FastAPI
 
-from app.api.routes import router
+from app.api.negotiation import DATE_CACHES
+from app.api.routes import metrics_router, router
+from app.core.admission import AdmissionController, AdmissionMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware, cache_collector, create_metrics, jobs_collector, process_age_ms
+from app.core.profiling import ServerTimingMiddleware, StageTimings
+from app.core.scheduler import Scheduler
 from app.core.security import ApiKeyMiddleware, RateLimitMiddleware, SecurityHeadersMiddleware
-from app.repositories.factory import create_metrics_repository
+from app.core.shared_state import create_shared_state
+from app.repositories.factory import (
+    create_job_repository,
+    create_metrics_repository,
+    create_transaction_repository,
+)
+from app.services.engine import SavingsEngine
+from app.services.jobs import JobManager
+from app.services.results import ResultCursors
+from app.services.scatter import ScatterCoordinator
+from app.services.warmup import warm_up, warmup_enabled
+
+
+shared_state = create_shared_state()
+admission = AdmissionController()
+metrics = create_metrics()
+metrics.collectors += [cache_collector(name, cached) for name, cached in DATE_CACHES.items()]
+# Interpreter start-up plus every import above.
+boot_ms = process_age_ms()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    repo = create_metrics_repository()
-    repo.initialize()
+    startup = StageTimings()
+    startup.add("boot", boot_ms)
+    with startup.stage("repositories"):
+        repo = create_metrics_repository()
+        repo.initialize()
+        transactions = create_transaction_repository()
+        transactions.initialize()
     app.state.metrics_repo = repo
-    yield
+    app.state.transactions_repo = transactions
+    app.state.shared_state = shared_state
+    app.state.admission = admission
+    app.state.metrics = metrics
+    app.state.scheduler = Scheduler(metrics)
+    app.state.result_cursors = ResultCursors()
+    # Plugins and the engine hold no per-request state, so one instance serves every request and job.
+    engine = SavingsEngine()
+    app.state.engine = engine
+    with startup.stage("jobs"):
+        jobs = JobManager(create_job_repository(), engine_factory=lambda: engine)
+        jobs.initialize()
+    app.state.jobs = jobs
+    collect_jobs = jobs_collector(jobs)
+    metrics.collectors.append(collect_jobs)
+    coordinator = ScatterCoordinator()
+    app.state.coordinator = coordinator
+    warmup_ms = {}
+    if warmup_enabled():
+        with startup.stage("warmup"):
+            # On a worker thread, so the thread pool engine work runs on is started too.
+            warmup_ms = await anyio.to_thread.run_sync(warm_up, engine)
+        with startup.stage("openapi"):
+            app.openapi()
+    app.state.startup = {
+        "stagesMs": {name: round(duration, 3) for name, duration in startup.stages.items()},
+        "warmupMs": warmup_ms,
+        "readyMs": round(boot_ms + (time.perf_counter() - startup.started) * 1000, 3),
+    }
+    try:
+        yield
+    finally:
+        metrics.collectors.remove(collect_jobs)
+        jobs.shutdown()
+        coordinator.close()
+        shared_state.close()
 
 
 app = FastAPI(
@@ -21,8 +87,13 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionMiddleware, controller=admission)
 app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(RateLimitMiddleware)
+app.add_middleware(RateLimitMiddleware, state=shared_state, metrics=metrics)
 app.add_middleware(ApiKeyMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 app.include_router(router)
+app.include_router(metrics_router)
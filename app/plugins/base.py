@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+import math
+from dataclasses import dataclass, replace
 from decimal import Decimal
 
 
@@ -10,12 +11,44 @@ class InvestmentContext:
     inflation: Decimal
 
 
+@dataclass(frozen=True)
+class ReturnDistribution:
+    """Yearly returns ``r`` with ``log(1 + r)`` normally distributed, independent across years.
+
+    ``mean`` and ``volatility`` are the mean and standard deviation of ``r``
+    itself, so expected growth over ``years`` is ``(1 + mean) ** years``, the
+    deterministic growth of a plugin whose ``annual_rate`` is ``mean``.
+    """
+
+    mean: float
+    volatility: float
+    kind = "lognormal"
+
+    def log_growth(self, rng, shape: tuple[int, ...]):
+        """``log(1 + r)`` samples from numpy generator ``rng``."""
+        variance = math.log1p((self.volatility / (1 + self.mean)) ** 2)
+        return rng.normal(math.log1p(self.mean) - variance / 2, math.sqrt(variance), size=shape)
+
+
 class InvestmentPlugin:
     channel_id: str
     annual_rate: Decimal
+    annual_volatility = Decimal("0")
+
+    def return_distribution(self) -> ReturnDistribution:
+        """Yearly returns for simulated profits; centred on ``annual_rate``."""
+        return ReturnDistribution(mean=float(self.annual_rate), volatility=float(self.annual_volatility))
 
     def compute_nominal_return(self, ctx: InvestmentContext) -> Decimal:
         return ctx.principal * ((Decimal("1") + self.annual_rate) ** ctx.years)
 
     def compute_tax_benefit(self, ctx: InvestmentContext) -> Decimal:
         return Decimal("0")
+
+    def compute_nominal_returns(self, principals: list[Decimal], ctx: InvestmentContext) -> list[Decimal]:
+        """``compute_nominal_return`` for many principals sharing ``ctx``; ``ctx.principal`` is ignored."""
+        growth = (Decimal("1") + self.annual_rate) ** ctx.years
+        return [principal * growth for principal in principals]
+
+    def compute_tax_benefits(self, principals: list[Decimal], ctx: InvestmentContext) -> list[Decimal]:
+        return [self.compute_tax_benefit(replace(ctx, principal=principal)) for principal in principals]
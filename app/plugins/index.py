@@ -6,3 +6,4 @@ from app.plugins.base import InvestmentPlugin
 class IndexPlugin(InvestmentPlugin):
     channel_id = "index"
     annual_rate = Decimal("0.1449")
+    annual_volatility = Decimal("0.16")
@@ -26,9 +26,23 @@ def calculate_tax(income: Decimal) -> Decimal:
 class NpsPlugin(InvestmentPlugin):
     channel_id = "nps"
     annual_rate = Decimal("0.0711")
+    annual_volatility = Decimal("0.08")
 
     def compute_tax_benefit(self, ctx: InvestmentContext) -> Decimal:
         deduction = min(ctx.principal, Decimal("0.10") * ctx.annual_income, Decimal("200000"))
         before = calculate_tax(ctx.annual_income)
         after = calculate_tax(max(Decimal("0"), ctx.annual_income - deduction))
         return before - after
+
+    def compute_tax_benefits(self, principals: list[Decimal], ctx: InvestmentContext) -> list[Decimal]:
+        # Tax before the deduction is shared, and capped deductions repeat, so each distinct one is taxed once.
+        cap = min(Decimal("0.10") * ctx.annual_income, Decimal("200000"))
+        before = calculate_tax(ctx.annual_income)
+        benefits: dict[Decimal, Decimal] = {}
+        results = []
+        for principal in principals:
+            deduction = min(principal, cap)
+            if deduction not in benefits:
+                benefits[deduction] = before - calculate_tax(max(Decimal("0"), ctx.annual_income - deduction))
+            results.append(benefits[deduction])
+        return results
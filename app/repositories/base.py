@@ -4,6 +4,77 @@ from typing import Protocol
 class MetricsRepository(Protocol):
     def initialize(self) -> None: ...
 
-    def save(self, endpoint: str, duration_ms: float, status: str) -> None: ...
+    def save(
+        self,
+        endpoint: str,
+        duration_ms: float,
+        status: str,
+        stages: dict | None = None,
+        peak_memory_bytes: int | None = None,
+    ) -> None: ...
 
     def get_performance_snapshot(self) -> dict: ...
+
+    def save_profile(self, profile_id: str, endpoint: str, stats: bytes, summary: str) -> None: ...
+
+    def get_profile(self, profile_id: str) -> dict | None: ...
+
+
+class JobRepository(Protocol):
+    def initialize(self) -> None: ...
+
+    def create_job(self, job_id: str, operation: str, submitted_at: float) -> None: ...
+
+    def start_job(self, job_id: str, started_at: float) -> None: ...
+
+    def update_job_progress(self, job_id: str, progress: float) -> None: ...
+
+    def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        finished_at: float,
+        expires_at: float | None = None,
+        result: bytes | None = None,
+        error: str | None = None,
+    ) -> None: ...
+
+    def get_job(self, job_id: str) -> dict | None: ...
+
+    def get_job_result(self, job_id: str) -> bytes | None: ...
+
+    def expire_jobs(self, now: float, forget_before: float) -> int: ...
+
+    def fail_unfinished_jobs(
+        self,
+        submitted_before: float,
+        finished_at: float,
+        expires_at: float,
+        error: str,
+    ) -> int: ...
+
+
+class TransactionRepository(Protocol):
+    """Per-customer transactions keyed by ``(customer_id, epoch)``, money in integer cents.
+
+    Rows carry a running remanent sum in epoch order, so the remanent total of
+    any date range is two indexed lookups.
+    """
+
+    def initialize(self) -> None: ...
+
+    def upsert_transactions(self, customer_id: str, rows: list[tuple[int, int, int, int]]) -> int: ...
+
+    def delete_customer(self, customer_id: str) -> int: ...
+
+    def get_summary(self, customer_id: str) -> dict | None: ...
+
+    def get_range(
+        self,
+        customer_id: str,
+        start: int | None = None,
+        end: int | None = None,
+        limit: int | None = None,
+    ) -> list[tuple[int, int, int, int]]: ...
+
+    def get_window_sums(self, customer_id: str, windows: list[tuple[int, int]]) -> list[int]: ...
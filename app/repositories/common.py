@@ -0,0 +1,24 @@
+"""Helpers shared by the sqlite and Postgres transaction repositories."""
+
+import os
+
+# Full int64 range; stands in for an open end of a range query.
+MIN_EPOCH = -(2**63)
+MAX_EPOCH = 2**63 - 1
+
+
+def transaction_batch_rows() -> int:
+    return int(os.getenv("TRANSACTION_BATCH_ROWS", "5000"))
+
+
+def summary_row(row) -> dict | None:
+    if row is None or not row[0]:
+        return None
+    return {
+        "count": int(row[0]),
+        "minEpoch": int(row[1]),
+        "maxEpoch": int(row[2]),
+        "totalAmount": int(row[3]),
+        "totalCeiling": int(row[4]),
+        "totalRemanent": int(row[5]),
+    }
@@ -1,16 +1,40 @@
 import os
 
-from app.repositories.postgres_repo import PostgresMetricsRepository
-from app.repositories.sqlite_repo import SqliteMetricsRepository
+# Repository modules are imported by the factory that needs them, so a worker only loads the backend it runs on.
 
 
-def create_metrics_repository():
+def _provider() -> str:
     provider = os.getenv("DB_PROVIDER", "sqlite").strip().lower()
+    if provider not in ("sqlite", "postgres"):
+        raise ValueError(f"Unsupported DB provider '{provider}'. Use 'sqlite' or 'postgres'.")
+    return provider
+
+
+def create_metrics_repository():
+    if _provider() == "sqlite":
+        from app.repositories.sqlite_repo import SqliteMetricsRepository
 
-    if provider == "sqlite":
         return SqliteMetricsRepository()
+    from app.repositories.postgres_repo import PostgresMetricsRepository
+
+    return PostgresMetricsRepository()
+
+
+def create_job_repository():
+    if _provider() == "sqlite":
+        from app.repositories.sqlite_repo import SqliteJobRepository
+
+        return SqliteJobRepository()
+    from app.repositories.postgres_repo import PostgresJobRepository
+
+    return PostgresJobRepository()
+
+
+def create_transaction_repository():
+    if _provider() == "sqlite":
+        from app.repositories.sqlite_repo import SqliteTransactionRepository
 
-    if provider == "postgres":
-        return PostgresMetricsRepository()
+        return SqliteTransactionRepository()
+    from app.repositories.postgres_repo import PostgresTransactionRepository
 
-    raise ValueError(f"Unsupported DB provider '{provider}'. Use 'sqlite' or 'postgres'.")
+    return PostgresTransactionRepository()
@@ -1,3 +1,4 @@
+import json
 import os
 import threading
 from contextlib import contextmanager
@@ -5,6 +6,8 @@ from datetime import datetime
 
 import psutil
 
+from app.repositories.common import MAX_EPOCH, MIN_EPOCH, summary_row, transaction_batch_rows
+
 
 class PostgresMetricsRepository:
     def __init__(self) -> None:
@@ -39,20 +42,77 @@ class PostgresMetricsRepository:
                     )
                     """
                 )
+                cursor.execute("ALTER TABLE request_metrics ADD COLUMN IF NOT EXISTS stages JSONB")
+                cursor.execute("ALTER TABLE request_metrics ADD COLUMN IF NOT EXISTS peak_memory_bytes BIGINT")
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS request_profiles (
+                        id TEXT PRIMARY KEY,
+                        endpoint TEXT NOT NULL,
+                        stats BYTEA NOT NULL,
+                        summary TEXT NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL
+                    )
+                    """
+                )
             conn.commit()
 
-    def save(self, endpoint: str, duration_ms: float, status: str) -> None:
+    def save(
+        self,
+        endpoint: str,
+        duration_ms: float,
+        status: str,
+        stages: dict | None = None,
+        peak_memory_bytes: int | None = None,
+    ) -> None:
         with self._connect() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     """
-                    INSERT INTO request_metrics (endpoint, duration_ms, status, created_at)
-                    VALUES (%s, %s, %s, %s)
+                    INSERT INTO request_metrics (endpoint, duration_ms, status, created_at, stages, peak_memory_bytes)
+                    VALUES (%s, %s, %s, %s, %s, %s)
                     """,
-                    (endpoint, duration_ms, status, datetime.utcnow()),
+                    (
+                        endpoint,
+                        duration_ms,
+                        status,
+                        datetime.utcnow(),
+                        json.dumps(stages) if stages is not None else None,
+                        peak_memory_bytes,
+                    ),
                 )
             conn.commit()
 
+    def save_profile(self, profile_id: str, endpoint: str, stats: bytes, summary: str) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO request_profiles (id, endpoint, stats, summary, created_at)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    (profile_id, endpoint, stats, summary, datetime.utcnow()),
+                )
+            conn.commit()
+
+    def get_profile(self, profile_id: str) -> dict | None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, endpoint, stats, summary, created_at FROM request_profiles WHERE id = %s",
+                    (profile_id,),
+                )
+                row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "endpoint": row[1],
+            "stats": bytes(row[2]),
+            "summary": row[3],
+            "createdAt": row[4].isoformat(),
+        }
+
     def get_performance_snapshot(self) -> dict:
         with self._connect() as conn:
             with conn.cursor() as cursor:
@@ -64,7 +124,10 @@ class PostgresMetricsRepository:
                            COUNT(1) AS total,
                            AVG(duration_ms) AS avg_ms,
                            MAX(duration_ms) AS max_ms,
-                           SUM(CASE WHEN status='error' THEN 1 ELSE 0 END) AS error_count
+                           SUM(CASE WHEN status='error' THEN 1 ELSE 0 END) AS error_count,
+                           SUM(CASE WHEN status='cancelled' THEN 1 ELSE 0 END) AS cancelled_count,
+                           AVG(peak_memory_bytes) AS avg_peak,
+                           MAX(peak_memory_bytes) AS max_peak
                     FROM request_metrics
                     GROUP BY endpoint
                     ORDER BY endpoint
@@ -77,7 +140,7 @@ class PostgresMetricsRepository:
         process = psutil.Process(os.getpid())
         memory_mb = process.memory_info().rss / (1024 * 1024)
         endpoint_stats = []
-        for endpoint, total, avg_ms, max_ms, error_count in endpoint_rows:
+        for endpoint, total, avg_ms, max_ms, error_count, cancelled_count, avg_peak, max_peak in endpoint_rows:
             endpoint_stats.append(
                 {
                     "endpoint": endpoint,
@@ -85,6 +148,9 @@ class PostgresMetricsRepository:
                     "avgMs": round(float(avg_ms or 0.0), 3),
                     "maxMs": round(float(max_ms or 0.0), 3),
                     "errorCount": int(error_count or 0),
+                    "cancelledCount": int(cancelled_count or 0),
+                    "avgPeakMemoryMb": round(float(avg_peak or 0.0) / (1024 * 1024), 3),
+                    "maxPeakMemoryMb": round(float(max_peak or 0.0) / (1024 * 1024), 3),
                 }
             )
         return {
@@ -94,3 +160,310 @@ class PostgresMetricsRepository:
             "requestsServed": served,
             "endpointStats": endpoint_stats,
         }
+
+
+JOB_COLUMNS = (
+    "id, operation, status, progress, submitted_at, started_at, finished_at, expires_at, result_bytes, error"
+)
+
+
+class PostgresJobRepository:
+    def __init__(self) -> None:
+        self.metrics = PostgresMetricsRepository()
+
+    def _connect(self):
+        return self.metrics._connect()
+
+    def initialize(self) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        operation TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        submitted_at DOUBLE PRECISION NOT NULL,
+                        started_at DOUBLE PRECISION,
+                        finished_at DOUBLE PRECISION,
+                        expires_at DOUBLE PRECISION,
+                        result BYTEA,
+                        result_bytes BIGINT,
+                        error TEXT
+                    )
+                    """
+                )
+                cursor.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+            conn.commit()
+
+    def create_job(self, job_id: str, operation: str, submitted_at: float) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO jobs (id, operation, status, submitted_at) VALUES (%s, %s, 'queued', %s)",
+                    (job_id, operation, submitted_at),
+                )
+            conn.commit()
+
+    def start_job(self, job_id: str, started_at: float) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE jobs SET status = 'running', started_at = %s WHERE id = %s",
+                    (started_at, job_id),
+                )
+            conn.commit()
+
+    def update_job_progress(self, job_id: str, progress: float) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("UPDATE jobs SET progress = %s WHERE id = %s", (progress, job_id))
+            conn.commit()
+
+    def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        finished_at: float,
+        expires_at: float | None = None,
+        result: bytes | None = None,
+        error: str | None = None,
+    ) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs
+                    SET status = %s, progress = CASE WHEN %s = 'succeeded' THEN 1 ELSE progress END,
+                        finished_at = %s, expires_at = %s, result = %s, result_bytes = %s, error = %s
+                    WHERE id = %s
+                    """,
+                    (
+                        status,
+                        status,
+                        finished_at,
+                        expires_at,
+                        result,
+                        len(result) if result is not None else None,
+                        error,
+                        job_id,
+                    ),
+                )
+            conn.commit()
+
+    def fail_unfinished_jobs(self, submitted_before: float, finished_at: float, expires_at: float, error: str) -> int:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs SET status = 'failed', finished_at = %s, expires_at = %s, error = %s
+                    WHERE status IN ('queued', 'running') AND submitted_at < %s
+                    """,
+                    (finished_at, expires_at, error, submitted_before),
+                )
+                failed = cursor.rowcount
+            conn.commit()
+        return failed
+
+    def get_job(self, job_id: str) -> dict | None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = %s", (job_id,))
+                row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "operation": row[1],
+            "status": row[2],
+            "progress": float(row[3] or 0.0),
+            "submittedAt": row[4],
+            "startedAt": row[5],
+            "finishedAt": row[6],
+            "expiresAt": row[7],
+            "resultBytes": row[8],
+            "error": row[9],
+        }
+
+    def get_job_result(self, job_id: str) -> bytes | None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT result FROM jobs WHERE id = %s", (job_id,))
+                row = cursor.fetchone()
+        return bytes(row[0]) if row is not None and row[0] is not None else None
+
+    def expire_jobs(self, now: float, forget_before: float) -> int:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs SET status = 'expired', result = NULL
+                    WHERE expires_at IS NOT NULL AND expires_at <= %s AND status != 'expired'
+                    """,
+                    (now,),
+                )
+                expired = cursor.rowcount
+                cursor.execute(
+                    "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= %s",
+                    (forget_before,),
+                )
+            conn.commit()
+        return expired
+
+
+class PostgresTransactionRepository:
+    """Postgres twin of ``SqliteTransactionRepository``; the primary key doubles as the range index.
+
+    Each upsert takes a transaction-scoped advisory lock on the customer, so
+    concurrent upserts of one customer cannot rebase the running sums from
+    each other's uncommitted rows.
+    """
+
+    def __init__(self) -> None:
+        self.metrics = PostgresMetricsRepository()
+
+    def _connect(self):
+        return self.metrics._connect()
+
+    def initialize(self) -> None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS customer_transactions (
+                        customer_id TEXT NOT NULL,
+                        epoch BIGINT NOT NULL,
+                        amount BIGINT NOT NULL,
+                        ceiling BIGINT NOT NULL,
+                        remanent BIGINT NOT NULL,
+                        running_remanent BIGINT NOT NULL DEFAULT 0,
+                        PRIMARY KEY (customer_id, epoch)
+                    )
+                    """
+                )
+            conn.commit()
+
+    def upsert_transactions(self, customer_id: str, rows: list[tuple[int, int, int, int]]) -> int:
+        ordered = sorted(rows)
+        if not ordered:
+            return 0
+        batch_rows = transaction_batch_rows()
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", (customer_id,))
+                for offset in range(0, len(ordered), batch_rows):
+                    cursor.executemany(
+                        """
+                        INSERT INTO customer_transactions (customer_id, epoch, amount, ceiling, remanent)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (customer_id, epoch) DO UPDATE
+                        SET amount = excluded.amount, ceiling = excluded.ceiling, remanent = excluded.remanent
+                        """,
+                        [(customer_id, *row) for row in ordered[offset : offset + batch_rows]],
+                    )
+                cursor.execute(
+                    """
+                    WITH ordered AS (
+                        SELECT epoch, SUM(remanent) OVER (ORDER BY epoch) AS running
+                        FROM customer_transactions
+                        WHERE customer_id = %(customer)s AND epoch >= %(since)s
+                    )
+                    UPDATE customer_transactions
+                    SET running_remanent = ordered.running + COALESCE(
+                        (
+                            SELECT running_remanent FROM customer_transactions
+                            WHERE customer_id = %(customer)s AND epoch < %(since)s
+                            ORDER BY epoch DESC LIMIT 1
+                        ),
+                        0
+                    )
+                    FROM ordered
+                    WHERE customer_transactions.customer_id = %(customer)s
+                      AND customer_transactions.epoch = ordered.epoch
+                    """,
+                    {"customer": customer_id, "since": ordered[0][0]},
+                )
+            conn.commit()
+        return len(ordered)
+
+    def delete_customer(self, customer_id: str) -> int:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM customer_transactions WHERE customer_id = %s", (customer_id,))
+                deleted = cursor.rowcount
+            conn.commit()
+        return deleted
+
+    def get_summary(self, customer_id: str) -> dict | None:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT COUNT(1), MIN(epoch), MAX(epoch), SUM(amount), SUM(ceiling), SUM(remanent)
+                    FROM customer_transactions WHERE customer_id = %s
+                    """,
+                    (customer_id,),
+                )
+                row = cursor.fetchone()
+        return summary_row(row)
+
+    def get_range(
+        self,
+        customer_id: str,
+        start: int | None = None,
+        end: int | None = None,
+        limit: int | None = None,
+    ) -> list[tuple[int, int, int, int]]:
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT epoch, amount, ceiling, remanent FROM customer_transactions
+                    WHERE customer_id = %s AND epoch >= %s AND epoch <= %s
+                    ORDER BY epoch LIMIT %s
+                    """,
+                    (
+                        customer_id,
+                        MIN_EPOCH if start is None else start,
+                        MAX_EPOCH if end is None else end,
+                        limit,
+                    ),
+                )
+                return cursor.fetchall()
+
+    def get_window_sums(self, customer_id: str, windows: list[tuple[int, int]]) -> list[int]:
+        if not windows:
+            return []
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT COALESCE(
+                               (
+                                   SELECT running_remanent FROM customer_transactions
+                                   WHERE customer_id = %(customer)s AND epoch <= w.end_epoch
+                                   ORDER BY epoch DESC LIMIT 1
+                               ),
+                               0
+                           )
+                           - COALESCE(
+                               (
+                                   SELECT running_remanent FROM customer_transactions
+                                   WHERE customer_id = %(customer)s AND epoch < w.start_epoch
+                                   ORDER BY epoch DESC LIMIT 1
+                               ),
+                               0
+                           )
+                    FROM unnest(%(starts)s::bigint[], %(ends)s::bigint[])
+                         WITH ORDINALITY AS w(start_epoch, end_epoch, position)
+                    ORDER BY w.position
+                    """,
+                    {
+                        "customer": customer_id,
+                        "starts": [start for start, _ in windows],
+                        "ends": [end for _, end in windows],
+                    },
+                )
+                rows = cursor.fetchall()
+        return [int(row[0]) for row in rows]
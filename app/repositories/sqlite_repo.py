@@ -1,3 +1,4 @@
+import json
 import os
 import sqlite3
 import threading
@@ -5,6 +6,8 @@ from datetime import datetime
 
 import psutil
 
+from app.repositories.common import MAX_EPOCH, MIN_EPOCH, summary_row, transaction_batch_rows
+
 
 class SqliteMetricsRepository:
     def __init__(self, db_path: str | None = None) -> None:
@@ -23,19 +26,70 @@ class SqliteMetricsRepository:
                 )
                 """
             )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(request_metrics)")}
+            if "stages" not in columns:
+                conn.execute("ALTER TABLE request_metrics ADD COLUMN stages TEXT")
+            if "peak_memory_bytes" not in columns:
+                conn.execute("ALTER TABLE request_metrics ADD COLUMN peak_memory_bytes INTEGER")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS request_profiles (
+                    id TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    stats BLOB NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            conn.commit()
+
+    def save(
+        self,
+        endpoint: str,
+        duration_ms: float,
+        status: str,
+        stages: dict | None = None,
+        peak_memory_bytes: int | None = None,
+    ) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                INSERT INTO request_metrics (endpoint, duration_ms, status, created_at, stages, peak_memory_bytes)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    endpoint,
+                    duration_ms,
+                    status,
+                    datetime.utcnow().isoformat(),
+                    json.dumps(stages) if stages is not None else None,
+                    peak_memory_bytes,
+                ),
+            )
             conn.commit()
 
-    def save(self, endpoint: str, duration_ms: float, status: str) -> None:
+    def save_profile(self, profile_id: str, endpoint: str, stats: bytes, summary: str) -> None:
         with sqlite3.connect(self.db_path) as conn:
             conn.execute(
                 """
-                INSERT INTO request_metrics (endpoint, duration_ms, status, created_at)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO request_profiles (id, endpoint, stats, summary, created_at)
+                VALUES (?, ?, ?, ?, ?)
                 """,
-                (endpoint, duration_ms, status, datetime.utcnow().isoformat()),
+                (profile_id, endpoint, stats, summary, datetime.utcnow().isoformat()),
             )
             conn.commit()
 
+    def get_profile(self, profile_id: str) -> dict | None:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT id, endpoint, stats, summary, created_at FROM request_profiles WHERE id = ?",
+                (profile_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "endpoint": row[1], "stats": bytes(row[2]), "summary": row[3], "createdAt": row[4]}
+
     def get_performance_snapshot(self) -> dict:
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.execute("SELECT COUNT(1), AVG(duration_ms) FROM request_metrics")
@@ -46,7 +100,10 @@ class SqliteMetricsRepository:
                        COUNT(1) AS total,
                        AVG(duration_ms) AS avg_ms,
                        MAX(duration_ms) AS max_ms,
-                       SUM(CASE WHEN status='error' THEN 1 ELSE 0 END) AS error_count
+                       SUM(CASE WHEN status='error' THEN 1 ELSE 0 END) AS error_count,
+                       SUM(CASE WHEN status='cancelled' THEN 1 ELSE 0 END) AS cancelled_count,
+                       AVG(peak_memory_bytes) AS avg_peak,
+                       MAX(peak_memory_bytes) AS max_peak
                 FROM request_metrics
                 GROUP BY endpoint
                 ORDER BY endpoint
@@ -58,7 +115,7 @@ class SqliteMetricsRepository:
         process = psutil.Process(os.getpid())
         memory_mb = process.memory_info().rss / (1024 * 1024)
         endpoint_stats = []
-        for endpoint, total, avg_ms, max_ms, error_count in endpoint_rows:
+        for endpoint, total, avg_ms, max_ms, error_count, cancelled_count, avg_peak, max_peak in endpoint_rows:
             endpoint_stats.append(
                 {
                     "endpoint": endpoint,
@@ -66,6 +123,9 @@ class SqliteMetricsRepository:
                     "avgMs": round(float(avg_ms or 0.0), 3),
                     "maxMs": round(float(max_ms or 0.0), 3),
                     "errorCount": int(error_count or 0),
+                    "cancelledCount": int(cancelled_count or 0),
+                    "avgPeakMemoryMb": round(float(avg_peak or 0.0) / (1024 * 1024), 3),
+                    "maxPeakMemoryMb": round(float(max_peak or 0.0) / (1024 * 1024), 3),
                 }
             )
         return {
@@ -75,3 +135,277 @@ class SqliteMetricsRepository:
             "requestsServed": served,
             "endpointStats": endpoint_stats,
         }
+
+
+JOB_COLUMNS = (
+    "id, operation, status, progress, submitted_at, started_at, finished_at, expires_at, result_bytes, error"
+)
+
+
+def job_row(row) -> dict:
+    return {
+        "id": row[0],
+        "operation": row[1],
+        "status": row[2],
+        "progress": float(row[3] or 0.0),
+        "submittedAt": row[4],
+        "startedAt": row[5],
+        "finishedAt": row[6],
+        "expiresAt": row[7],
+        "resultBytes": row[8],
+        "error": row[9],
+    }
+
+
+class SqliteJobRepository:
+    """Job status, progress and gzip-compressed results, stored next to the request metrics."""
+
+    def __init__(self, db_path: str | None = None) -> None:
+        self.db_path = db_path or os.getenv("DB_PATH", "app.db")
+
+    def initialize(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    operation TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    submitted_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    expires_at REAL,
+                    result BLOB,
+                    result_bytes INTEGER,
+                    error TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires_at ON jobs (expires_at)")
+            conn.commit()
+
+    def create_job(self, job_id: str, operation: str, submitted_at: float) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, operation, status, submitted_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, operation, submitted_at),
+            )
+            conn.commit()
+
+    def start_job(self, job_id: str, started_at: float) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (started_at, job_id))
+            conn.commit()
+
+    def update_job_progress(self, job_id: str, progress: float) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+            conn.commit()
+
+    def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        finished_at: float,
+        expires_at: float | None = None,
+        result: bytes | None = None,
+        error: str | None = None,
+    ) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, progress = CASE WHEN ? = 'succeeded' THEN 1 ELSE progress END,
+                    finished_at = ?, expires_at = ?, result = ?, result_bytes = ?, error = ?
+                WHERE id = ?
+                """,
+                (
+                    status,
+                    status,
+                    finished_at,
+                    expires_at,
+                    result,
+                    len(result) if result is not None else None,
+                    error,
+                    job_id,
+                ),
+            )
+            conn.commit()
+
+    def fail_unfinished_jobs(self, submitted_before: float, finished_at: float, expires_at: float, error: str) -> int:
+        """Marks queued and running jobs submitted before ``submitted_before`` as failed."""
+        with sqlite3.connect(self.db_path) as conn:
+            failed = conn.execute(
+                """
+                UPDATE jobs SET status = 'failed', finished_at = ?, expires_at = ?, error = ?
+                WHERE status IN ('queued', 'running') AND submitted_at < ?
+                """,
+                (finished_at, expires_at, error, submitted_before),
+            ).rowcount
+            conn.commit()
+        return failed
+
+    def get_job(self, job_id: str) -> dict | None:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return job_row(row) if row is not None else None
+
+    def get_job_result(self, job_id: str) -> bytes | None:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bytes(row[0]) if row is not None and row[0] is not None else None
+
+    def expire_jobs(self, now: float, forget_before: float) -> int:
+        with sqlite3.connect(self.db_path) as conn:
+            expired = conn.execute(
+                """
+                UPDATE jobs SET status = 'expired', result = NULL
+                WHERE expires_at IS NOT NULL AND expires_at <= ? AND status != 'expired'
+                """,
+                (now,),
+            ).rowcount
+            conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (forget_before,))
+            conn.commit()
+        return expired
+
+
+class SqliteTransactionRepository:
+    """Stored customer transactions in a ``(customer_id, epoch)`` clustered table.
+
+    ``running_remanent`` is the customer's remanent sum up to and including
+    each row. An upsert is one transaction: rows are written in
+    ``TRANSACTION_BATCH_ROWS`` statements, then the running sums are rebased
+    once from the earliest upserted epoch onwards. Appending newer rows
+    therefore only touches the new rows, while backfilling older ones
+    rewrites the later tail.
+    """
+
+    def __init__(self, db_path: str | None = None) -> None:
+        self.db_path = db_path or os.getenv("DB_PATH", "app.db")
+
+    def initialize(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS customer_transactions (
+                    customer_id TEXT NOT NULL,
+                    epoch INTEGER NOT NULL,
+                    amount INTEGER NOT NULL,
+                    ceiling INTEGER NOT NULL,
+                    remanent INTEGER NOT NULL,
+                    running_remanent INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (customer_id, epoch)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.commit()
+
+    def upsert_transactions(self, customer_id: str, rows: list[tuple[int, int, int, int]]) -> int:
+        ordered = sorted(rows)
+        if not ordered:
+            return 0
+        batch_rows = transaction_batch_rows()
+        with sqlite3.connect(self.db_path) as conn:
+            for offset in range(0, len(ordered), batch_rows):
+                conn.executemany(
+                    """
+                    INSERT INTO customer_transactions (customer_id, epoch, amount, ceiling, remanent)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (customer_id, epoch) DO UPDATE
+                    SET amount = excluded.amount, ceiling = excluded.ceiling, remanent = excluded.remanent
+                    """,
+                    [(customer_id, *row) for row in ordered[offset : offset + batch_rows]],
+                )
+            conn.execute(
+                """
+                WITH ordered AS (
+                    SELECT epoch, SUM(remanent) OVER (ORDER BY epoch) AS running
+                    FROM customer_transactions
+                    WHERE customer_id = :customer AND epoch >= :since
+                )
+                UPDATE customer_transactions
+                SET running_remanent = ordered.running + COALESCE(
+                    (
+                        SELECT running_remanent FROM customer_transactions
+                        WHERE customer_id = :customer AND epoch < :since
+                        ORDER BY epoch DESC LIMIT 1
+                    ),
+                    0
+                )
+                FROM ordered
+                WHERE customer_transactions.customer_id = :customer AND customer_transactions.epoch = ordered.epoch
+                """,
+                {"customer": customer_id, "since": ordered[0][0]},
+            )
+            conn.commit()
+        return len(ordered)
+
+    def delete_customer(self, customer_id: str) -> int:
+        with sqlite3.connect(self.db_path) as conn:
+            deleted = conn.execute("DELETE FROM customer_transactions WHERE customer_id = ?", (customer_id,)).rowcount
+            conn.commit()
+        return deleted
+
+    def get_summary(self, customer_id: str) -> dict | None:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                """
+                SELECT COUNT(1), MIN(epoch), MAX(epoch), SUM(amount), SUM(ceiling), SUM(remanent)
+                FROM customer_transactions WHERE customer_id = ?
+                """,
+                (customer_id,),
+            ).fetchone()
+        return summary_row(row)
+
+    def get_range(
+        self,
+        customer_id: str,
+        start: int | None = None,
+        end: int | None = None,
+        limit: int | None = None,
+    ) -> list[tuple[int, int, int, int]]:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                """
+                SELECT epoch, amount, ceiling, remanent FROM customer_transactions
+                WHERE customer_id = ? AND epoch >= ? AND epoch <= ?
+                ORDER BY epoch LIMIT ?
+                """,
+                (
+                    customer_id,
+                    MIN_EPOCH if start is None else start,
+                    MAX_EPOCH if end is None else end,
+                    -1 if limit is None else limit,
+                ),
+            ).fetchall()
+
+    def get_window_sums(self, customer_id: str, windows: list[tuple[int, int]]) -> list[int]:
+        """Remanent total of each closed ``(start, end)`` epoch window, in window order."""
+        if not windows:
+            return []
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                """
+                SELECT COALESCE(
+                           (
+                               SELECT running_remanent FROM customer_transactions
+                               WHERE customer_id = :customer AND epoch <= json_extract(w.value, '$[1]')
+                               ORDER BY epoch DESC LIMIT 1
+                           ),
+                           0
+                       )
+                       - COALESCE(
+                           (
+                               SELECT running_remanent FROM customer_transactions
+                               WHERE customer_id = :customer AND epoch < json_extract(w.value, '$[0]')
+                               ORDER BY epoch DESC LIMIT 1
+                           ),
+                           0
+                       )
+                FROM json_each(:windows) AS w
+                ORDER BY w.key
+                """,
+                {"customer": customer_id, "windows": json.dumps(windows)},
+            ).fetchall()
+        return [int(row[0]) for row in rows]
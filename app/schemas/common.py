@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import Literal
+from typing import Annotated, Literal
 from typing import List
 
-from pydantic import AliasChoices, BaseModel, Field, field_validator
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
@@ -55,7 +55,24 @@ class InvalidTransaction(Transaction):
     message: str
 
 
-class TransactionValidationRequest(BaseModel):
+class ResultViewOptions(BaseModel):
+    """Optional shaping of a row-list response: projection, summary only, or cursor pages."""
+
+    fields: List[Literal["date", "amount", "ceiling", "remanent"]] | None = Field(default=None, min_length=1)
+    summaryOnly: bool = False
+    pageSize: int | None = Field(default=None, ge=1, le=1_000_000)
+
+    @model_validator(mode="after")
+    def validate_view(self) -> "ResultViewOptions":
+        if self.summaryOnly and (self.fields is not None or self.pageSize is not None):
+            raise ValueError("summaryOnly cannot be combined with fields or pageSize")
+        return self
+
+    def has_view(self) -> bool:
+        return self.summaryOnly or self.fields is not None or self.pageSize is not None
+
+
+class TransactionValidationRequest(ResultViewOptions):
     wage: float = Field(ge=0)
     maxInvest: float | None = Field(default=None, ge=0)
     transactions: List[Transaction] = Field(default_factory=list)
@@ -100,11 +117,23 @@ class EvalPeriod(BaseModel):
     _valid_end = field_validator("end")(ensure_timestamp)
 
 
-class TemporalFilterRequest(BaseModel):
+class KBuckets(BaseModel):
+    unit: Literal["day", "week", "month", "quarter", "year"]
+    start: str | None = None
+    end: str | None = None
+
+    @field_validator("start", "end")
+    @classmethod
+    def validate_timestamp(cls, value: str | None) -> str | None:
+        return ensure_timestamp(value) if value is not None else None
+
+
+class TemporalFilterRequest(ResultViewOptions):
     q: List[FixedPeriod] = Field(default_factory=list)
     p: List[ExtraPeriod] = Field(default_factory=list)
     k: List[EvalPeriod] = Field(default_factory=list)
     kMode: Literal["grouping", "strict"] = "grouping"
+    sorted: bool = False
     transactions: List[Transaction] = Field(default_factory=list)
 
     @field_validator("q", "p", "k", "transactions")
@@ -115,6 +144,16 @@ class TemporalFilterRequest(BaseModel):
         return value
 
 
+class FilterJobRequest(TemporalFilterRequest):
+    """``TemporalFilterRequest`` for an async job. Cursor pages live in one worker's memory, so no ``pageSize``."""
+
+    @model_validator(mode="after")
+    def validate_job_view(self) -> "FilterJobRequest":
+        if self.pageSize is not None:
+            raise ValueError("pageSize is not supported for jobs; use fields or summaryOnly")
+        return self
+
+
 class TemporalTransaction(Transaction):
     pass
 
@@ -128,6 +167,14 @@ class TemporalFilterResponse(BaseModel):
     invalid: List[TemporalInvalidTransaction]
 
 
+class SimulationOptions(BaseModel):
+    paths: int = Field(default=10000, ge=1, le=1_000_000)
+    seed: int | None = Field(default=None, ge=0, lt=2**63)
+    percentiles: List[Annotated[float, Field(ge=0, le=100)]] = Field(
+        default_factory=lambda: [5, 25, 50, 75, 95], min_length=1, max_length=99
+    )
+
+
 class ReturnsRequest(BaseModel):
     age: int = Field(ge=0)
     wage: float = Field(ge=0)
@@ -136,6 +183,37 @@ class ReturnsRequest(BaseModel):
     p: List[ExtraPeriod] = Field(default_factory=list)
     k: List[EvalPeriod] = Field(default_factory=list)
     kMode: Literal["grouping", "strict"] = "grouping"
+    kBuckets: KBuckets | None = None
+    sorted: bool = False
+    transactions: List[Transaction] = Field(default_factory=list)
+    simulation: SimulationOptions | None = None
+
+    @field_validator("q", "p", "k", "transactions")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+    @model_validator(mode="after")
+    def validate_k_source(self) -> "ReturnsRequest":
+        if self.kBuckets is not None and self.k:
+            raise ValueError("use either k or kBuckets, not both")
+        return self
+
+
+class ScenarioSweepRequest(BaseModel):
+    wage: float = Field(ge=0)
+    ages: List[Annotated[int, Field(ge=0)]] = Field(min_length=1)
+    inflations: List[Annotated[float, Field(ge=0)]] = Field(min_length=1)
+    channels: List[str] = Field(min_length=1)
+    rates: dict[str, Annotated[float, Field(gt=-1)]] = Field(default_factory=dict)
+    q: List[FixedPeriod] = Field(default_factory=list)
+    p: List[ExtraPeriod] = Field(default_factory=list)
+    k: List[EvalPeriod] = Field(default_factory=list)
+    kMode: Literal["grouping", "strict"] = "grouping"
+    kBuckets: KBuckets | None = None
+    sorted: bool = False
     transactions: List[Transaction] = Field(default_factory=list)
 
     @field_validator("q", "p", "k", "transactions")
@@ -145,6 +223,32 @@ class ReturnsRequest(BaseModel):
             raise ValueError("list size must be less than 1,000,000")
         return value
 
+    @model_validator(mode="after")
+    def validate_grid(self) -> "ScenarioSweepRequest":
+        if self.kBuckets is not None and self.k:
+            raise ValueError("use either k or kBuckets, not both")
+        if len(self.ages) * len(self.inflations) * len(self.channels) > 100_000:
+            raise ValueError("ages x inflations x channels must be at most 100,000 scenarios")
+        return self
+
+
+class SweepWindow(BaseModel):
+    start: str
+    end: str
+    amount: float
+
+
+class ScenarioSweepResponse(BaseModel):
+    channels: List[str]
+    ages: List[int]
+    inflations: List[float]
+    rates: dict[str, float]
+    transactionsTotalAmount: float
+    transactionsTotalCeiling: float
+    windows: List[SweepWindow]
+    profits: List[List[List[List[float]]]]
+    taxBenefit: List[List[float]]
+
 
 class SavingsByDate(BaseModel):
     start: str
@@ -161,9 +265,232 @@ class ReturnsResponse(BaseModel):
     savingsByDates: List[SavingsByDate]
 
 
+class ProfitDistribution(BaseModel):
+    mean: float
+    percentiles: dict[str, float]
+
+
+class SimulatedSavingsByDate(SavingsByDate):
+    profitsDistribution: ProfitDistribution
+
+
+class SimulationSummary(BaseModel):
+    paths: int
+    seed: int
+    years: int
+    distribution: dict
+
+
+class SimulatedReturnsResponse(ReturnsResponse):
+    savingsByDates: List[SimulatedSavingsByDate]
+    simulation: SimulationSummary
+
+
+PIPELINE_STAGES = ("parse", "validator", "filter", "returns")
+
+
+class PipelineRequest(BaseModel):
+    expenses: List[ExpenseIn] = Field(default_factory=list)
+    wage: float = Field(ge=0)
+    maxInvest: float | None = Field(default=None, ge=0)
+    age: int | None = Field(default=None, ge=0)
+    inflation: float | None = Field(default=None, ge=0)
+    channels: List[str] = Field(default_factory=lambda: ["nps", "index"])
+    q: List[FixedPeriod] = Field(default_factory=list)
+    p: List[ExtraPeriod] = Field(default_factory=list)
+    k: List[EvalPeriod] = Field(default_factory=list)
+    kMode: Literal["grouping", "strict"] = "grouping"
+    outputs: List[Literal["parse", "validator", "filter", "returns"]] = Field(
+        default_factory=lambda: ["returns"], min_length=1
+    )
+
+    @field_validator("expenses", "q", "p", "k")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+    @model_validator(mode="after")
+    def validate_returns_inputs(self) -> "PipelineRequest":
+        if "returns" in self.outputs:
+            if self.age is None or self.inflation is None:
+                raise ValueError("age and inflation are required when outputs include returns")
+            if not self.channels:
+                raise ValueError("channels must not be empty when outputs include returns")
+        return self
+
+
+class PipelineResponse(BaseModel):
+    parse: ParseResponse | None = None
+    validator: TransactionValidationResponse | None = None
+    filter: TemporalFilterResponse | None = None
+    returns: List[ReturnsResponse] | None = None
+
+
+# Shard columns become int64 numpy arrays.
+Int64 = Annotated[int, Field(ge=-(2**63), lt=2**63)]
+
+
+class ShardRules(BaseModel):
+    starts: List[Int64] = Field(default_factory=list)
+    ends: List[Int64] = Field(default_factory=list)
+    values: List[Int64] = Field(default_factory=list)
+
+    @field_validator("starts", "ends", "values")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+
+class FilterShardRequest(BaseModel):
+    """One time range of a scattered filter or returns request; dates in epoch seconds, money in cents."""
+
+    epochs: List[Int64]
+    amount: List[Int64]
+    ceiling: List[Int64]
+    remanent: List[Int64]
+    q: ShardRules = Field(default_factory=ShardRules)
+    p: ShardRules = Field(default_factory=ShardRules)
+    k: ShardRules = Field(default_factory=ShardRules)
+    kStrict: bool = False
+    windows: bool = False
+
+    @field_validator("epochs", "amount", "ceiling", "remanent")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+    @model_validator(mode="after")
+    def validate_columns(self) -> "FilterShardRequest":
+        if not len(self.epochs) == len(self.amount) == len(self.ceiling) == len(self.remanent):
+            raise ValueError("epochs, amount, ceiling and remanent must have the same length")
+        for label in ("q", "p", "k"):
+            rules = getattr(self, label)
+            if len(rules.starts) != len(rules.ends) or (label != "k" and len(rules.values) != len(rules.starts)):
+                raise ValueError(f"{label} columns must have the same length")
+        return self
+
+
+class FilterShardResponse(BaseModel):
+    remanent: List[int] | None = None
+    codes: List[int] | None = None
+    windowSums: List[int] | None = None
+    totalAmount: int | None = None
+    totalCeiling: int | None = None
+
+
+class StoredTransactionsRequest(BaseModel):
+    transactions: List[Transaction] = Field(min_length=1)
+
+    @field_validator("transactions")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+
+class StoredTransactionsResponse(BaseModel):
+    customerId: str
+    upserted: int
+    count: int
+
+
+class CustomerTransactionsResponse(BaseModel):
+    customerId: str
+    transactions: List[Transaction]
+
+
+class StoredReturnsRequest(BaseModel):
+    age: int = Field(ge=0)
+    wage: float = Field(ge=0)
+    inflation: float = Field(ge=0)
+    q: List[FixedPeriod] = Field(default_factory=list)
+    p: List[ExtraPeriod] = Field(default_factory=list)
+    k: List[EvalPeriod] = Field(default_factory=list)
+    kMode: Literal["grouping", "strict"] = "grouping"
+
+    @field_validator("q", "p", "k")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+
+class IngestRequest(BaseModel):
+    input: str = Field(min_length=1)
+    output: str = Field(min_length=1)
+
+
+class IngestFilterRequest(IngestRequest):
+    q: List[FixedPeriod] = Field(default_factory=list)
+    p: List[ExtraPeriod] = Field(default_factory=list)
+    k: List[EvalPeriod] = Field(default_factory=list)
+    kMode: Literal["grouping", "strict"] = "grouping"
+
+    @field_validator("q", "p", "k")
+    @classmethod
+    def validate_list_sizes(cls, value: list) -> list:
+        if len(value) >= 1_000_000:
+            raise ValueError("list size must be less than 1,000,000")
+        return value
+
+
+class IngestResponse(BaseModel):
+    operation: str
+    output: str
+    rows: int
+    chunks: int
+    elapsedMs: float
+    validRows: int | None = None
+    invalidRows: int | None = None
+    totals: ParseTotals | None = None
+
+
+class FilterBatchItem(BaseModel):
+    operation: Literal["transactions:filter"]
+    payload: FilterJobRequest
+
+
+class ReturnsBatchItem(BaseModel):
+    operation: Literal["returns:nps", "returns:index"]
+    payload: ReturnsRequest
+
+
+class BatchJobRequest(BaseModel):
+    items: List[Annotated[FilterBatchItem | ReturnsBatchItem, Field(discriminator="operation")]] = Field(
+        min_length=1, max_length=1000
+    )
+
+
+class JobStatusResponse(BaseModel):
+    id: str
+    operation: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled", "expired"]
+    progress: float
+    submittedAt: float
+    startedAt: float | None = None
+    finishedAt: float | None = None
+    expiresAt: float | None = None
+    resultBytes: int | None = None
+    error: str | None = None
+
+
 class PerformanceResponse(BaseModel):
     time: str
     memory: str
     threads: int
     requestsServed: int
     endpointStats: List[dict] = Field(default_factory=list)
+    live: dict = Field(default_factory=dict)
+    admission: dict = Field(default_factory=dict)
+    scheduler: dict = Field(default_factory=dict)
+    jobs: dict = Field(default_factory=dict)
+    startup: dict = Field(default_factory=dict)
+    scatter: dict = Field(default_factory=dict)
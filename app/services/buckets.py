@@ -0,0 +1,84 @@
+"""Calendar-aligned k windows generated server-side from a ``kBuckets`` spec.
+
+Weeks start on Monday; quarters start in January, April, July and October.
+The first and last buckets are clipped to the requested range.
+"""
+
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_BUCKETS = 1_000_000
+ONE_SECOND = timedelta(seconds=1)
+
+
+class Bucket(NamedTuple):
+    start: str
+    end: str
+    start_dt: datetime
+    end_dt: datetime
+
+
+def _month_floor(value: datetime, months: int) -> datetime:
+    month = (value.month - 1) // months * months + 1
+    return datetime(value.year, month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def bucket_floor(value: datetime, unit: str) -> datetime:
+    day = datetime(value.year, value.month, value.day)
+    if unit == "day":
+        return day
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return _month_floor(value, 1)
+    if unit == "quarter":
+        return _month_floor(value, 3)
+    return datetime(value.year, 1, 1)
+
+
+def bucket_next(start: datetime, unit: str) -> datetime:
+    if unit == "day":
+        return start + timedelta(days=1)
+    if unit == "week":
+        return start + timedelta(weeks=1)
+    return _add_months(start, {"month": 1, "quarter": 3, "year": 12}[unit])
+
+
+def calendar_buckets(unit: str, start: datetime, end: datetime) -> list[Bucket]:
+    """Contiguous buckets covering ``[start, end]`` in time order."""
+    buckets: list[Bucket] = []
+    current = bucket_floor(start, unit)
+    while current <= end:
+        following = bucket_next(current, unit)
+        low = max(current, start)
+        high = min(following - ONE_SECOND, end)
+        buckets.append(Bucket(low.strftime(TIMESTAMP_FORMAT), high.strftime(TIMESTAMP_FORMAT), low, high))
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"kBuckets must produce at most {MAX_BUCKETS:,} windows")
+        current = following
+    return buckets
+
+
+def bucket_sums(sorted_dates: list[datetime], prefix: list, buckets: list[Bucket]) -> list:
+    """Window totals from one merge pass over sorted dates and contiguous buckets.
+
+    ``prefix[i]`` is the sum of the first ``i`` sorted values.
+    """
+    sums = []
+    position = 0
+    count = len(sorted_dates)
+    if buckets:
+        while position < count and sorted_dates[position] < buckets[0].start_dt:
+            position += 1
+    for bucket in buckets:
+        left = position
+        while position < count and sorted_dates[position] <= bucket.end_dt:
+            position += 1
+        sums.append(prefix[position] - prefix[left])
+    return sums
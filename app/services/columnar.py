@@ -0,0 +1,309 @@
+"""Vectorized engine kernels over integer columns.
+
+Dates are int64 epoch seconds (the naive timestamp read as UTC) and money is
+int64 cents, so every rule is exact integer arithmetic. The kernels implement
+the same rules as ``SavingsEngine`` for inputs with at most two decimal places.
+Callers that may see finer amounts check with ``try_cents`` and fall back to the
+Decimal engine.
+"""
+
+import heapq
+from decimal import Decimal
+
+import numpy as np
+
+
+VALID = 0
+CEILING_BELOW_AMOUNT = 1
+CEILING_NOT_MULTIPLE = 2
+REMANENT_MISMATCH = 3
+OUTSIDE_K = 4
+NEGATIVE = 5
+AMOUNT_TOO_LARGE = 6
+WAGE_NOT_POSITIVE = 7
+ABOVE_WAGE = 8
+ABOVE_MAX_INVEST = 9
+
+MESSAGES = (
+    None,
+    "ceiling cannot be less than amount",
+    "ceiling must be a multiple of 100",
+    "remanent must equal ceiling - amount",
+    "transaction does not fall within any k period",
+    "amount, ceiling and remanent must be non-negative",
+    "amount must be less than 500000",
+    "wage must be greater than 0 when remanent exists",
+    "remanent cannot exceed wage",
+    "remanent cannot exceed maxInvest",
+)
+
+# Largest magnitude (in cents) that float64 still holds exactly.
+MAX_EXACT_CENTS = 2**53
+
+NO_FIXED = -1
+
+
+def parse_epochs(values) -> np.ndarray:
+    """``YYYY-MM-DD HH:MM:SS`` strings to epoch seconds; other layouts raise ``ValueError``."""
+    text = np.asarray(values, dtype=str)
+    if text.size and ((np.char.str_len(text) != 19).any() or (np.char.find(text, " ") != 10).any()):
+        raise ValueError("dates must use the 'YYYY-MM-DD HH:MM:SS' format")
+    return text.astype("datetime64[s]").astype(np.int64)
+
+
+def format_epochs(epochs: np.ndarray) -> np.ndarray:
+    text = np.datetime_as_string(np.asarray(epochs, dtype=np.int64).astype("datetime64[s]"), unit="s")
+    return np.char.replace(text, "T", " ")
+
+
+def try_cents(values) -> np.ndarray | None:
+    """Money as int64 cents, or ``None`` when a value has more than two decimal places or is too large.
+
+    A value is whole cents only when ``cents / 100`` gives back the very same
+    float. A tolerance would let values such as ``0.1 + 0.2`` onto the integer
+    path while the Decimal engine sees their full digits.
+    """
+    money = np.asarray(values, dtype=np.float64)
+    scaled = money * 100
+    cents = np.rint(scaled)
+    if money.size and (not (np.abs(scaled) < MAX_EXACT_CENTS).all() or (cents / 100 != money).any()):
+        return None
+    return cents.astype(np.int64)
+
+
+def to_cents(values, label: str) -> np.ndarray:
+    cents = try_cents(values)
+    if cents is None:
+        raise ValueError(f"{label} must have at most 2 decimal places")
+    return cents
+
+
+def from_cents(cents: np.ndarray) -> np.ndarray:
+    return np.asarray(cents, dtype=np.int64) / 100
+
+
+def decimal_from_cents(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def round_up(amount: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Ceiling (next multiple of 100) and remanent for amounts in cents."""
+    ceiling = -(-amount // 10000) * 10000
+    return ceiling, ceiling - amount
+
+
+def check_transaction_schema(amount: np.ndarray, ceiling: np.ndarray, remanent: np.ndarray, offset: int = 0) -> None:
+    """Field bounds the request schema enforces (``ge=0``, ``amount < 500000``)."""
+    bad = (amount < 0) | (amount >= 50_000_000) | (ceiling < 0) | (remanent < 0)
+    if bad.any():
+        row = offset + int(np.argmax(bad))
+        raise ValueError(f"row {row}: amount must be in [0, 500000) and ceiling/remanent must be non-negative")
+
+
+def validation_codes(amount: np.ndarray, ceiling: np.ndarray, remanent: np.ndarray) -> np.ndarray:
+    """Per-row message code, first failing check wins as in ``SavingsEngine._validate_transaction``."""
+    codes = np.zeros(len(amount), dtype=np.int8)
+    codes[ceiling - amount != remanent] = REMANENT_MISMATCH
+    codes[ceiling % 10000 != 0] = CEILING_NOT_MULTIPLE
+    codes[ceiling < amount] = CEILING_BELOW_AMOUNT
+    return codes
+
+
+def validator_codes(
+    amount: np.ndarray,
+    ceiling: np.ndarray,
+    remanent: np.ndarray,
+    wage_floor: int,
+    wage_positive: bool,
+    max_invest_floor: int | None,
+) -> np.ndarray:
+    """Per-row code for ``transactions:validator``, checks in ``SavingsEngine._validate_transaction`` order.
+
+    ``wage_floor`` and ``max_invest_floor`` are the bounds in cents rounded
+    down, which decide ``remanent > bound`` exactly for whole-cent remanents.
+    """
+    codes = np.zeros(len(amount), dtype=np.int8)
+    if max_invest_floor is not None:
+        codes[remanent > max_invest_floor] = ABOVE_MAX_INVEST
+    codes[remanent > wage_floor] = ABOVE_WAGE
+    if not wage_positive:
+        codes[remanent > 0] = WAGE_NOT_POSITIVE
+    codes[ceiling - amount != remanent] = REMANENT_MISMATCH
+    codes[ceiling % 10000 != 0] = CEILING_NOT_MULTIPLE
+    codes[ceiling < amount] = CEILING_BELOW_AMOUNT
+    codes[amount >= 50_000_000] = AMOUNT_TOO_LARGE
+    codes[(amount < 0) | (ceiling < 0) | (remanent < 0)] = NEGATIVE
+    return codes
+
+
+def window_sums(sorted_epochs: np.ndarray, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Sum of ``values`` over the rows inside each closed ``[start, end]`` window; rows sorted by epoch."""
+    prefix = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    left = np.searchsorted(sorted_epochs, starts, side="left")
+    right = np.searchsorted(sorted_epochs, ends, side="right")
+    return prefix[right] - prefix[left]
+
+
+def first_occurrences(epochs: np.ndarray) -> np.ndarray:
+    """Mask of rows whose timestamp has not appeared earlier in the input."""
+    mask = np.zeros(len(epochs), dtype=bool)
+    mask[np.unique(epochs, return_index=True)[1]] = True
+    return mask
+
+
+def messages(codes: np.ndarray) -> list[str | None]:
+    return [MESSAGES[code] for code in codes.tolist()]
+
+
+class Periods:
+    """One rule list (q, p or k) as epoch columns, plus its value column in cents."""
+
+    def __init__(self, label: str, starts, ends, values=None) -> None:
+        self.label = label
+        self.starts = parse_epochs(starts) if len(starts) else np.empty(0, dtype=np.int64)
+        self.ends = parse_epochs(ends) if len(ends) else np.empty(0, dtype=np.int64)
+        self.values = to_cents(values, label) if values is not None and len(values) else np.zeros(0, np.int64)
+
+    @classmethod
+    def from_models(cls, label: str, periods, value_field: str | None = None) -> "Periods":
+        return cls(
+            label,
+            [period.start for period in periods],
+            [period.end for period in periods],
+            [getattr(period, value_field) for period in periods] if value_field else None,
+        )
+
+    @classmethod
+    def from_epochs(cls, label: str, starts, ends, values=None) -> "Periods":
+        """Periods from columns that are already epoch seconds and cents."""
+        periods = cls(label, [], [])
+        periods.starts = np.asarray(starts, dtype=np.int64)
+        periods.ends = np.asarray(ends, dtype=np.int64)
+        if values is not None:
+            periods.values = np.asarray(values, dtype=np.int64)
+        return periods
+
+    def overlapping(self, low: int, high: int) -> np.ndarray:
+        """Mask of the periods that share at least one second with ``[low, high]``."""
+        return (self.starts <= high) & (self.ends >= low)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def validate(self, min_epoch: int | None, max_epoch: int | None) -> None:
+        """Same checks and messages as ``SavingsEngine._validate_periods``."""
+        reversed_ = self.starts > self.ends
+        outside = np.zeros(len(self), dtype=bool)
+        if min_epoch is not None:
+            outside = (self.starts < min_epoch) | (self.ends > max_epoch)
+        bad = reversed_ | outside
+        if bad.any():
+            idx = int(np.argmax(bad))
+            if reversed_[idx]:
+                raise ValueError(f"{self.label}[{idx}] has start > end")
+            raise ValueError(f"{self.label}[{idx}] is outside transaction date bounds")
+
+
+def rules_exact(payload) -> bool:
+    """Whether the kernels take ``payload``'s q/p/k rules exactly: canonical dates and q/p values in whole cents."""
+    values = [
+        value for periods in (payload.q, payload.p, payload.k) for period in periods for value in (period.start, period.end)
+    ]
+    try:
+        parse_epochs(values)
+    except ValueError:
+        return False
+    amounts = [rule.fixed for rule in payload.q] + [rule.extra for rule in payload.p]
+    return try_cents(amounts) is not None
+
+
+class _IntervalSum:
+    """Sum of per-interval values over the closed intervals containing a timestamp."""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, values: np.ndarray) -> None:
+        by_start = np.argsort(starts, kind="stable")
+        by_end = np.argsort(ends, kind="stable")
+        self.starts = starts[by_start]
+        self.ends = ends[by_end]
+        self.started = np.concatenate(([0], np.cumsum(values[by_start])))
+        self.ended = np.concatenate(([0], np.cumsum(values[by_end])))
+
+    def at(self, epochs: np.ndarray) -> np.ndarray:
+        started = self.started[np.searchsorted(self.starts, epochs, side="right")]
+        ended = self.ended[np.searchsorted(self.ends, epochs, side="left")]
+        return started - ended
+
+
+def _q_segments(q: Periods) -> tuple[np.ndarray, np.ndarray]:
+    """Piecewise-constant fixed amount over time.
+
+    The winning q rule at a timestamp is the active one with the latest start,
+    lowest list index on ties. The active set only changes at starts and at
+    ``end + 1``, so one heap sweep over those boundaries yields the winner of
+    every segment.
+    """
+    if not len(q):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    order = np.lexsort((np.arange(len(q)), q.starts))
+    starts = q.starts[order].tolist()
+    ends = q.ends[order].tolist()
+    fixed = q.values[order].tolist()
+    indexes = order.tolist()
+    boundaries = np.unique(np.concatenate((q.starts, q.ends + 1)))
+
+    heap: list[tuple[int, int, int, int]] = []
+    pointer = 0
+    winners = []
+    for boundary in boundaries.tolist():
+        while pointer < len(starts) and starts[pointer] <= boundary:
+            heapq.heappush(heap, (-starts[pointer], indexes[pointer], ends[pointer], fixed[pointer]))
+            pointer += 1
+        while heap and heap[0][2] < boundary:
+            heapq.heappop(heap)
+        winners.append(heap[0][3] if heap else NO_FIXED)
+    return boundaries, np.asarray(winners, dtype=np.int64)
+
+
+class FilterPlan:
+    """q/p/k rules compiled into lookup tables.
+
+    A transaction's outcome depends only on its own fields and timestamp, so
+    ``apply`` can be called on any chunk of rows in any order.
+    """
+
+    def __init__(self, q: Periods, p: Periods, k: Periods, k_mode: str = "grouping") -> None:
+        self.q_boundaries, self.q_fixed = _q_segments(q)
+        self.p_extra = _IntervalSum(p.starts, p.ends, p.values)
+        self.k_count = _IntervalSum(k.starts, k.ends, np.ones(len(k), dtype=np.int64))
+        self.strict_k = k_mode == "strict" and len(k) > 0
+
+    @classmethod
+    def from_request(cls, payload, min_epoch: int | None, max_epoch: int | None) -> "FilterPlan":
+        """Validates and compiles the q/p/k lists of a filter or returns request."""
+        periods = (
+            Periods.from_models("q", payload.q, "fixed"),
+            Periods.from_models("p", payload.p, "extra"),
+            Periods.from_models("k", payload.k),
+        )
+        for item in periods:
+            item.validate(min_epoch, max_epoch)
+        return cls(*periods, k_mode=payload.kMode)
+
+    def apply(
+        self,
+        epochs: np.ndarray,
+        amount: np.ndarray,
+        ceiling: np.ndarray,
+        remanent: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Adjusted remanent (cents) and message code per row."""
+        codes = validation_codes(amount, ceiling, remanent)
+        adjusted = remanent
+        if len(self.q_boundaries):
+            segment = np.searchsorted(self.q_boundaries, epochs, side="right") - 1
+            fixed = np.where(segment >= 0, self.q_fixed[np.maximum(segment, 0)], NO_FIXED)
+            adjusted = np.where(fixed != NO_FIXED, fixed, remanent)
+        adjusted = np.maximum(adjusted + self.p_extra.at(epochs), 0)
+        if self.strict_k:
+            codes[(codes == VALID) & (self.k_count.at(epochs) == 0)] = OUTSIDE_K
+        return adjusted, codes
@@ -0,0 +1,115 @@
+"""Stored customer transactions and returns computed from the store.
+
+Stored rows are validated on write, so every stored transaction is valid
+before q/p/k rules. Without q/p rules and outside strict k mode, the k-window
+amounts come straight from ``TransactionRepository.get_window_sums``, two
+indexed lookups per window. Otherwise only the rows inside the k span are read,
+already in epoch order, and the rules run through the columnar kernels. Rules
+the kernels cannot take exactly (non-canonical dates, sub-cent q/p values) run
+the Decimal sweep over every stored row instead.
+"""
+
+import numpy as np
+
+from app.core.cancellation import CancellationToken
+from app.core.profiling import stage
+from app.services import columnar
+from app.schemas.common import ReturnsRequest, Transaction
+from app.services.engine import SavingsEngine
+
+
+def transaction_rows(transactions) -> list[tuple[int, int, int, int]]:
+    """Validated ``(epoch, amount, ceiling, remanent)`` cent rows; raises ``ValueError`` on the first bad row."""
+    epochs = columnar.parse_epochs([tx.date for tx in transactions])
+    amount = columnar.to_cents([tx.amount for tx in transactions], "amount")
+    ceiling = columnar.to_cents([tx.ceiling for tx in transactions], "ceiling")
+    remanent = columnar.to_cents([tx.remanent for tx in transactions], "remanent")
+    codes = columnar.validation_codes(amount, ceiling, remanent)
+    if codes.any():
+        index = int(np.flatnonzero(codes)[0])
+        raise ValueError(f"transactions[{index}]: {columnar.MESSAGES[codes[index]]}")
+    ordered = np.sort(epochs)
+    if (ordered[1:] == ordered[:-1]).any():
+        raise ValueError("duplicate transaction date found in transactions")
+    return list(zip(epochs.tolist(), amount.tolist(), ceiling.tolist(), remanent.tolist()))
+
+
+def store_transactions(store, customer_id: str, payload) -> dict:
+    upserted = store.upsert_transactions(customer_id, transaction_rows(payload.transactions))
+    return {"customerId": customer_id, "upserted": upserted, "count": store.get_summary(customer_id)["count"]}
+
+
+def _columns(rows: list[tuple[int, int, int, int]]) -> zip:
+    """``(date, amount, ceiling, remanent)`` per stored cent row, formatted as in requests."""
+    if not rows:
+        return zip()
+    epochs, amount, ceiling, remanent = np.asarray(rows, dtype=np.int64).reshape(-1, 4).T
+    return zip(
+        columnar.format_epochs(epochs).tolist(),
+        columnar.from_cents(amount).tolist(),
+        columnar.from_cents(ceiling).tolist(),
+        columnar.from_cents(remanent).tolist(),
+    )
+
+
+def list_transactions(store, customer_id: str, start: str | None, end: str | None, limit: int) -> dict:
+    bounds = [int(columnar.parse_epochs([value])[0]) if value else None for value in (start, end)]
+    rows = store.get_range(customer_id, *bounds, limit=limit)
+    return {
+        "customerId": customer_id,
+        "transactions": [
+            {"date": date, "amount": amount, "ceiling": ceiling, "remanent": remanent}
+            for date, amount, ceiling, remanent in _columns(rows)
+        ],
+    }
+
+
+def _stored_transactions(store, customer_id: str) -> list[Transaction]:
+    # Stored rows were validated on write, so skip model validation.
+    return [
+        Transaction.model_construct(date=date, amount=amount, ceiling=ceiling, remanent=remanent)
+        for date, amount, ceiling, remanent in _columns(store.get_range(customer_id))
+    ]
+
+
+def stored_returns(
+    engine: SavingsEngine,
+    store,
+    customer_id: str,
+    summary: dict,
+    payload,
+    channel: str,
+    cancel: CancellationToken | None = None,
+) -> dict:
+    """``calculate_returns`` for a stored customer; ``summary`` is ``store.get_summary(customer_id)``."""
+    if not columnar.rules_exact(payload):
+        with stage("load"):
+            request = ReturnsRequest.model_validate(
+                {**payload.model_dump(), "sorted": True, "transactions": _stored_transactions(store, customer_id)}
+            )
+        return engine.calculate_returns(request, channel, cancel)
+
+    plan = columnar.FilterPlan.from_request(payload, summary["minEpoch"], summary["maxEpoch"])
+    k = columnar.Periods.from_models("k", payload.k)
+    strict = payload.kMode == "strict" and len(k) > 0
+    total_amount, total_ceiling = summary["totalAmount"], summary["totalCeiling"]
+
+    with stage("aggregate"):
+        if not payload.q and not payload.p and not strict:
+            sums = store.get_window_sums(customer_id, list(zip(k.starts.tolist(), k.ends.tolist())))
+        elif len(k):
+            rows = store.get_range(customer_id, int(k.starts.min()), int(k.ends.max()))
+            if cancel:
+                cancel.checkpoint(0, len(rows))
+            epochs, amount, ceiling, remanent = np.asarray(rows, dtype=np.int64).reshape(-1, 4).T
+            adjusted, codes = plan.apply(epochs, amount, ceiling, remanent)
+            valid = codes == columnar.VALID
+            sums = columnar.window_sums(epochs, np.where(valid, adjusted, 0), k.starts, k.ends).tolist()
+            if strict:
+                total_amount, total_ceiling = int(amount[valid].sum()), int(ceiling[valid].sum())
+        else:
+            sums = []
+
+    money = columnar.decimal_from_cents
+    windows = [(period, money(cents)) for period, cents in zip(payload.k, sums)]
+    return engine.returns_from_windows(payload, channel, windows, money(total_amount), money(total_ceiling), cancel)
@@ -1,10 +1,17 @@
 from bisect import bisect_left, bisect_right
 from datetime import datetime
-from decimal import Decimal, ROUND_CEILING, ROUND_HALF_UP
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
 import heapq
 
+import numpy as np
+
+from app.core.cancellation import CHECK_EVERY, CancellationToken
+from app.core.profiling import stage
 from app.plugins.base import InvestmentContext
 from app.plugins.registry import PluginRegistry
+from app.services import columnar
+from app.services.buckets import Bucket, bucket_sums, calendar_buckets
+from app.services.rows import MONEY_FIELDS, RowStream, materialize
 from app.schemas.common import (
     ParseRequest,
     ReturnsRequest,
@@ -28,35 +35,88 @@ def to_money_float(value: Decimal) -> float:
     return float(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
 
 
+def _cents_floor(value: Decimal) -> int:
+    """``value`` in cents rounded down, clamped into int64 range for mask comparisons."""
+    cents = int((value * 100).to_integral_value(rounding=ROUND_FLOOR))
+    return max(-(2**62), min(cents, 2**62))
+
+
+def _input_rows(
+    transactions: list[Transaction],
+    mask: np.ndarray,
+    money: tuple[np.ndarray, np.ndarray, np.ndarray],
+    codes: np.ndarray | None = None,
+    adjusted: bool = False,
+) -> RowStream:
+    """Input rows selected by ``mask``, in input order.
+
+    ``money`` holds the amount, ceiling and remanent cent columns the totals
+    come from. ``codes`` adds each row's ``message``. ``adjusted`` replaces
+    each row's remanent with the one in ``money``.
+    """
+    index = np.flatnonzero(mask)
+
+    def build(start: int, stop: int) -> list[dict]:
+        chunk = index[start:stop]
+        rows = [
+            {"date": tx.date, "amount": tx.amount, "ceiling": tx.ceiling, "remanent": tx.remanent}
+            for tx in map(transactions.__getitem__, chunk.tolist())
+        ]
+        if adjusted:
+            for row, value in zip(rows, columnar.from_cents(money[2][chunk]).tolist()):
+                row["remanent"] = value
+        if codes is not None:
+            for row, message in zip(rows, columnar.messages(codes[chunk])):
+                row["message"] = message
+        return rows
+
+    def totals() -> tuple[Decimal, Decimal, Decimal]:
+        return tuple(columnar.decimal_from_cents(column[index].sum()) for column in money)
+
+    return RowStream(len(index), build, totals)
+
+
+def _scatter(items: list[tuple[int, dict]], count: int) -> list[dict]:
+    """Rows of ``(input index, row)`` pairs back in input order, in O(count)."""
+    slots: list[dict | None] = [None] * count
+    for index, row in items:
+        slots[index] = row
+    return [row for row in slots if row is not None]
+
+
 class SavingsEngine:
     def __init__(self) -> None:
         self.registry = PluginRegistry()
 
-    def parse_transactions(self, payload: ParseRequest) -> dict:
+    def parse_transactions(self, payload: ParseRequest, cancel: CancellationToken | None = None) -> dict:
         transactions: list[dict] = []
         total_amount = Decimal("0")
         total_ceiling = Decimal("0")
         total_remanent = Decimal("0")
         seen_dates: set[str] = set()
 
-        for expense in payload.expenses:
-            if expense.date in seen_dates:
-                raise ValueError("duplicate transaction date found in expenses")
-            seen_dates.add(expense.date)
-
-            amount = to_decimal(expense.amount)
-            rounded = (amount / Decimal("100")).to_integral_value(rounding=ROUND_CEILING) * Decimal("100")
-            remanent = rounded - amount
-            transaction = {
-                "date": expense.date,
-                "amount": to_money_float(amount),
-                "ceiling": to_money_float(rounded),
-                "remanent": to_money_float(remanent),
-            }
-            transactions.append(transaction)
-            total_amount += amount
-            total_ceiling += rounded
-            total_remanent += remanent
+        total = len(payload.expenses)
+        with stage("parse"):
+            for position, expense in enumerate(payload.expenses):
+                if cancel and position % CHECK_EVERY == 0:
+                    cancel.checkpoint(position, total)
+                if expense.date in seen_dates:
+                    raise ValueError("duplicate transaction date found in expenses")
+                seen_dates.add(expense.date)
+
+                amount = to_decimal(expense.amount)
+                rounded = (amount / Decimal("100")).to_integral_value(rounding=ROUND_CEILING) * Decimal("100")
+                remanent = rounded - amount
+                transaction = {
+                    "date": expense.date,
+                    "amount": to_money_float(amount),
+                    "ceiling": to_money_float(rounded),
+                    "remanent": to_money_float(remanent),
+                }
+                transactions.append(transaction)
+                total_amount += amount
+                total_ceiling += rounded
+                total_remanent += remanent
 
         return {
             "transactions": transactions,
@@ -67,7 +127,19 @@ class SavingsEngine:
             },
         }
 
-    def validate_transactions(self, payload: TransactionValidationRequest) -> dict:
+    def validate_transactions(
+        self,
+        payload: TransactionValidationRequest,
+        cancel: CancellationToken | None = None,
+    ) -> dict:
+        return materialize(self.validate_transaction_rows(payload, cancel))
+
+    def validate_transaction_rows(
+        self,
+        payload: TransactionValidationRequest,
+        cancel: CancellationToken | None = None,
+    ) -> dict[str, RowStream]:
+        """``validate_transactions`` with each list as a ``RowStream``."""
         valid: list[dict] = []
         invalid: list[dict] = []
         duplicates: list[dict] = []
@@ -75,61 +147,240 @@ class SavingsEngine:
         wage = to_decimal(payload.wage)
         max_invest = to_decimal(payload.maxInvest) if payload.maxInvest is not None else None
 
-        for tx in payload.transactions:
-            tx_dict = tx.model_dump()
-            if tx.date in seen_dates:
-                duplicates.append(tx_dict)
-                continue
-            seen_dates.add(tx.date)
+        total = len(payload.transactions)
+        with stage("validate"):
+            result = self._validate_columnar(payload, wage, max_invest, cancel)
+            if result is not None:
+                return result
+            for position, tx in enumerate(payload.transactions):
+                if cancel and position % CHECK_EVERY == 0:
+                    cancel.checkpoint(position, total)
+                tx_dict = tx.model_dump()
+                if tx.date in seen_dates:
+                    duplicates.append(tx_dict)
+                    continue
+                seen_dates.add(tx.date)
+
+                error = self._validate_transaction(tx, wage=wage, max_invest=max_invest)
+                if error:
+                    invalid.append({**tx_dict, "message": error})
+                else:
+                    valid.append(tx_dict)
+
+        return {
+            "valid": RowStream.from_list(valid),
+            "invalid": RowStream.from_list(invalid),
+            "duplicates": RowStream.from_list(duplicates),
+        }
+
+    def _validate_columnar(
+        self,
+        payload: TransactionValidationRequest,
+        wage: Decimal,
+        max_invest: Decimal | None,
+        cancel: CancellationToken | None = None,
+    ) -> dict[str, RowStream] | None:
+        """Mask-based ``validate_transactions``.
+
+        Every rule is one array comparison over integer cents, and duplicates
+        are the rows outside the first-occurrence mask of the epoch column.
+        Returns ``None`` when an input needs the Decimal path: a date not in
+        the canonical 19-character layout, or money with sub-cent digits.
+        """
+        transactions = payload.transactions
+        total = len(transactions)
+        dates = [tx.date for tx in transactions]
+        amounts = [tx.amount for tx in transactions]
+        ceilings = [tx.ceiling for tx in transactions]
+        remanents = [tx.remanent for tx in transactions]
+        try:
+            epochs = columnar.parse_epochs(dates)
+        except ValueError:
+            return None
+        amount, ceiling, remanent = (columnar.try_cents(values) for values in (amounts, ceilings, remanents))
+        if amount is None or ceiling is None or remanent is None:
+            return None
+        money = (amount, ceiling, remanent)
+        if cancel:
+            cancel.checkpoint(0, total)
+
+        codes = columnar.validator_codes(
+            amount,
+            ceiling,
+            remanent,
+            wage_floor=_cents_floor(wage),
+            wage_positive=wage > 0,
+            max_invest_floor=_cents_floor(max_invest) if max_invest is not None else None,
+        )
+        first = columnar.first_occurrences(epochs)
+        if cancel:
+            cancel.checkpoint(total // 2, total)
+        invalid = first & (codes != columnar.VALID)
+        return {
+            "valid": _input_rows(transactions, first & (codes == columnar.VALID), money),
+            "invalid": _input_rows(transactions, invalid, money, codes=codes),
+            "duplicates": _input_rows(transactions, ~first, money),
+        }
+
+    def filter_temporal_constraints(
+        self,
+        payload: TemporalFilterRequest,
+        cancel: CancellationToken | None = None,
+    ) -> dict:
+        return materialize(self.filter_temporal_rows(payload, cancel))
 
-            error = self._validate_transaction(tx, wage=wage, max_invest=max_invest)
-            if error:
-                invalid.append({**tx_dict, "message": error})
+    def filter_temporal_rows(
+        self,
+        payload: TemporalFilterRequest,
+        cancel: CancellationToken | None = None,
+    ) -> dict[str, RowStream]:
+        """``filter_temporal_constraints`` with each list as a ``RowStream``.
+
+        Inputs the integer kernels take exactly run through ``columnar.FilterPlan``;
+        others run the Decimal sweep.
+        """
+        result = self._filter_columnar(payload, cancel)
+        if result is not None:
+            return result
+        valid, invalid, tx_dates, in_order = self._filter_temporal(payload, cancel)
+        with stage("scatter"):
+            if in_order:
+                valid_rows, invalid_rows = [item[1] for item in valid], [item[1] for item in invalid]
             else:
-                valid.append(tx_dict)
+                valid_rows, invalid_rows = _scatter(valid, len(tx_dates)), _scatter(invalid, len(tx_dates))
+        return {"valid": RowStream.from_list(valid_rows), "invalid": RowStream.from_list(invalid_rows)}
 
-        return {"valid": valid, "invalid": invalid, "duplicates": duplicates}
+    def _filter_columnar(
+        self,
+        payload: TemporalFilterRequest,
+        cancel: CancellationToken | None = None,
+    ) -> dict[str, RowStream] | None:
+        """q/p/k rules as array lookups over epoch and cent columns.
+
+        Returns ``None`` for the same inputs as ``_validate_columnar``, or
+        when a q/p/k date is not in the canonical layout or a q/p value has
+        sub-cent digits.
+        """
+        transactions = payload.transactions
+        total = len(transactions)
+        with stage("dates"):
+            try:
+                epochs = columnar.parse_epochs([tx.date for tx in transactions])
+            except ValueError:
+                return None
+            columns = [columnar.try_cents([getattr(tx, name) for tx in transactions]) for name in MONEY_FIELDS]
+            if any(column is None for column in columns) or not columnar.rules_exact(payload):
+                return None
+            if getattr(payload, "sorted", False) and (np.diff(epochs) < 0).any():
+                raise ValueError("transactions are not in date order but sorted=true was declared")
+        if cancel:
+            cancel.checkpoint(0, total)
+
+        with stage("rules"):
+            bounds = (int(epochs.min()), int(epochs.max())) if total else (None, None)
+            plan = columnar.FilterPlan.from_request(payload, *bounds)
+        with stage("sweep"):
+            adjusted, codes = plan.apply(epochs, *columns)
+        if cancel:
+            cancel.checkpoint(total // 2, total)
+        kept = codes == columnar.VALID
+        return {
+            "valid": _input_rows(transactions, kept, (*columns[:2], adjusted), adjusted=True),
+            "invalid": _input_rows(transactions, ~kept, tuple(columns), codes=codes),
+        }
 
-    def filter_temporal_constraints(self, payload: TemporalFilterRequest) -> dict:
+    def _filter_temporal(
+        self,
+        payload,
+        cancel: CancellationToken | None = None,
+    ) -> tuple[list[tuple[int, dict]], list[tuple[int, dict]], list[datetime], bool]:
+        """Runs the q/p/k sweep in time order.
+
+        Returns ``(valid, invalid, dates, in_order)``. ``valid`` and ``invalid``
+        hold ``(input index, row)`` pairs in time order, and ``dates`` holds the
+        parsed input dates by input index. ``in_order`` says the input was
+        already in time order, so the pairs are in input order too.
+        """
         invalid: list[tuple[int, dict]] = []
         valid: list[tuple[int, dict]] = []
-        tx_dates = [to_dt(tx.date) for tx in payload.transactions]
-        min_tx_date = min(tx_dates) if tx_dates else None
-        max_tx_date = max(tx_dates) if tx_dates else None
+        with stage("dates"):
+            tx_dates = self._parse_dates(payload.transactions, cancel)
+            in_order = all(earlier <= later for earlier, later in zip(tx_dates, tx_dates[1:]))
+            if getattr(payload, "sorted", False) and not in_order:
+                raise ValueError("transactions are not in date order but sorted=true was declared")
+            if in_order:
+                min_tx_date = tx_dates[0] if tx_dates else None
+                max_tx_date = tx_dates[-1] if tx_dates else None
+            else:
+                min_tx_date = min(tx_dates)
+                max_tx_date = max(tx_dates)
+
+        with stage("rules"):
+            self._validate_periods(payload.q, "q", min_tx_date, max_tx_date)
+            self._validate_periods(payload.p, "p", min_tx_date, max_tx_date)
+            self._validate_periods(payload.k, "k", min_tx_date, max_tx_date)
+
+            q_rules = self._prepare_q_rules(payload.q)
+            p_rules = sorted(
+                [(to_dt(rule.start), to_dt(rule.end), to_decimal(rule.extra)) for rule in payload.p],
+                key=lambda item: item[0],
+            )
+            k_rules = sorted(
+                [(to_dt(rule.start), to_dt(rule.end)) for rule in payload.k],
+                key=lambda item: item[0],
+            )
+
+        with stage("sort"):
+            order = range(len(tx_dates)) if in_order else sorted(range(len(tx_dates)), key=tx_dates.__getitem__)
 
-        self._validate_periods(payload.q, "q", min_tx_date, max_tx_date)
-        self._validate_periods(payload.p, "p", min_tx_date, max_tx_date)
-        self._validate_periods(payload.k, "k", min_tx_date, max_tx_date)
+        with stage("sweep"):
+            self._sweep(payload, order, tx_dates, q_rules, p_rules, k_rules, valid, invalid, cancel)
+        return valid, invalid, tx_dates, in_order
 
-        sorted_tx = sorted(enumerate(payload.transactions), key=lambda item: to_dt(item[1].date))
+    def _parse_dates(self, transactions, cancel: CancellationToken | None) -> list[datetime]:
+        if not cancel:
+            return [to_dt(tx.date) for tx in transactions]
+        dates: list[datetime] = []
+        for start in range(0, len(transactions), CHECK_EVERY):
+            cancel.checkpoint(start, len(transactions))
+            dates.extend(to_dt(tx.date) for tx in transactions[start:start + CHECK_EVERY])
+        return dates
 
-        q_rules = self._prepare_q_rules(payload.q)
+    def _sweep(
+        self,
+        payload,
+        order,
+        tx_dates: list[datetime],
+        q_rules,
+        p_rules,
+        k_rules,
+        valid: list,
+        invalid: list,
+        cancel: CancellationToken | None = None,
+    ) -> None:
         q_ptr = 0
         q_heap: list[tuple[float, int, datetime, Decimal]] = []
 
-        p_rules = sorted(
-            [(to_dt(rule.start), to_dt(rule.end), to_decimal(rule.extra)) for rule in payload.p],
-            key=lambda item: item[0],
-        )
         p_ptr = 0
         p_end_heap: list[tuple[datetime, Decimal]] = []
         active_extra = Decimal("0")
 
-        k_rules = sorted(
-            [(to_dt(rule.start), to_dt(rule.end)) for rule in payload.k],
-            key=lambda item: item[0],
-        )
         k_ptr = 0
         k_end_heap: list[datetime] = []
         active_k_count = 0
 
-        for original_idx, tx in sorted_tx:
+        transactions = payload.transactions
+        total = len(order)
+        for position, original_idx in enumerate(order):
+            if cancel and position % CHECK_EVERY == 0:
+                cancel.checkpoint(position, total)
+            tx = transactions[original_idx]
             message = self._validate_transaction(tx)
             if message:
                 invalid.append((original_idx, {**tx.model_dump(), "message": message}))
                 continue
 
-            tx_dt = to_dt(tx.date)
+            tx_dt = tx_dates[original_idx]
 
             while q_ptr < len(q_rules) and q_rules[q_ptr][0] <= tx_dt:
                 start_dt, list_index, end_dt, fixed = q_rules[q_ptr]
@@ -181,71 +432,128 @@ class SavingsEngine:
             tx_data["remanent"] = to_money_float(adjusted)
             valid.append((original_idx, tx_data))
 
-        valid_sorted = [item[1] for item in sorted(valid, key=lambda item: item[0])]
-        invalid_sorted = [item[1] for item in sorted(invalid, key=lambda item: item[0])]
-        return {"valid": valid_sorted, "invalid": invalid_sorted}
-
-    def calculate_returns(self, payload: ReturnsRequest, channel: str) -> dict:
-        temporal = self.filter_temporal_constraints(
-            TemporalFilterRequest(
-                q=payload.q,
-                p=payload.p,
-                k=payload.k,
-                kMode=payload.kMode,
-                transactions=payload.transactions,
-            )
-        )
-        valid_transactions = temporal["valid"]
+    def calculate_returns(
+        self,
+        payload: ReturnsRequest,
+        channel: str,
+        cancel: CancellationToken | None = None,
+    ) -> dict:
+        windows, total_amount, total_ceiling = self.aggregate_windows(payload, cancel)
+        return self.returns_from_windows(payload, channel, windows, total_amount, total_ceiling, cancel)
+
+    def aggregate_windows(
+        self,
+        payload,
+        cancel: CancellationToken | None = None,
+    ) -> tuple[list[tuple[object, Decimal]], Decimal, Decimal]:
+        """Filtered k-window remanent totals plus the valid amount and ceiling totals.
+
+        ``payload`` carries ``q``, ``p``, ``k``, ``kMode``, ``kBuckets`` and
+        ``transactions`` as in a returns request.
+        """
+        valid, _, tx_dates, _ = self._filter_temporal(payload, cancel)
+        # The sweep emits valid rows in time order, so no re-sort is needed here.
+        sorted_valid = [item[1] for item in valid]
+        sorted_dates = [tx_dates[item[0]] for item in valid]
+        valid_transactions = sorted_valid
+
+        buckets = None
+        if payload.kBuckets is not None:
+            buckets = self._buckets(payload, sorted_dates)
+            if payload.kMode == "strict" and buckets:
+                # The buckets cover their range without gaps, so strict mode only drops rows outside it.
+                left = bisect_left(sorted_dates, buckets[0].start_dt)
+                right = bisect_right(sorted_dates, buckets[-1].end_dt)
+                sorted_valid, sorted_dates = sorted_valid[left:right], sorted_dates[left:right]
+            valid_transactions = sorted_valid
+
+        with stage("aggregate"):
+            prefix: list[Decimal] = [Decimal("0")]
+            for position, tx in enumerate(sorted_valid):
+                if cancel and position % CHECK_EVERY == 0:
+                    cancel.checkpoint(position, len(sorted_valid))
+                prefix.append(prefix[-1] + to_decimal(tx["remanent"]))
+
+            windows: list[tuple[object, Decimal]] = []
+            if buckets is not None:
+                windows = list(zip(buckets, bucket_sums(sorted_dates, prefix, buckets)))
+            for position, period in enumerate(payload.k):
+                if cancel and position % CHECK_EVERY == 0:
+                    cancel.checkpoint(position, len(payload.k))
+                start = to_dt(period.start)
+                end = to_dt(period.end)
+                if start > end:
+                    continue
+
+                left = bisect_left(sorted_dates, start)
+                right = bisect_right(sorted_dates, end)
+                windows.append((period, prefix[right] - prefix[left]))
+
+            total_amount = sum((to_decimal(tx["amount"]) for tx in valid_transactions), Decimal("0"))
+            total_ceiling = sum((to_decimal(tx["ceiling"]) for tx in valid_transactions), Decimal("0"))
+
+        return windows, total_amount, total_ceiling
+
+    def _buckets(self, payload, sorted_dates: list[datetime]) -> list[Bucket]:
+        spec = payload.kBuckets
+        start = to_dt(spec.start) if spec.start else (sorted_dates[0] if sorted_dates else None)
+        end = to_dt(spec.end) if spec.end else (sorted_dates[-1] if sorted_dates else None)
+        if start is None or end is None:
+            return []
+        if start > end:
+            raise ValueError("kBuckets has start > end")
+        return calendar_buckets(spec.unit, start, end)
+
+    def returns_from_windows(
+        self,
+        payload,
+        channel: str,
+        windows: list[tuple[object, Decimal]],
+        total_amount: Decimal,
+        total_ceiling: Decimal,
+        cancel: CancellationToken | None = None,
+    ) -> dict:
+        """Plugin math over already aggregated k windows.
+
+        ``windows`` pairs each k period with its remanent total; ``payload``
+        supplies ``age``, ``wage`` and ``inflation``.
+        """
         plugin = self.registry.get(channel)
-
         years = (60 - payload.age) if payload.age < 60 else 5
         annual_income = to_decimal(payload.wage) * Decimal("12")
         inflation = to_decimal(payload.inflation)
         savings_by_dates: list[dict] = []
-        sorted_valid = sorted(valid_transactions, key=lambda tx: to_dt(tx["date"]))
-        sorted_dates = [to_dt(tx["date"]) for tx in sorted_valid]
-        prefix: list[Decimal] = [Decimal("0")]
-        for tx in sorted_valid:
-            prefix.append(prefix[-1] + to_decimal(tx["remanent"]))
-
-        for period in payload.k:
-            start = to_dt(period.start)
-            end = to_dt(period.end)
-            if start > end:
-                continue
-
-            left = bisect_left(sorted_dates, start)
-            right = bisect_right(sorted_dates, end)
-            amount = prefix[right] - prefix[left]
-
+        with stage("plugin"):
             ctx = InvestmentContext(
-                principal=amount,
+                principal=Decimal("0"),
                 years=years,
                 annual_income=annual_income,
                 inflation=inflation,
             )
-            nominal = plugin.compute_nominal_return(ctx)
-            real = nominal / ((Decimal("1") + inflation) ** years) if years > 0 else nominal
-            tax_benefit = plugin.compute_tax_benefit(ctx)
-
-            savings_by_dates.append(
-                {
-                    "start": period.start,
-                    "end": period.end,
-                    "amount": to_money_float(amount),
-                    "profits": to_money_float(real - amount),
-                    "taxBenefit": to_money_float(tax_benefit),
-                }
-            )
+            principals = [amount for _, amount in windows]
+            nominals = plugin.compute_nominal_returns(principals, ctx)
+            tax_benefits = plugin.compute_tax_benefits(principals, ctx)
+            deflator = (Decimal("1") + inflation) ** years
+            for position, (period, amount) in enumerate(windows):
+                if cancel and position % CHECK_EVERY == 0:
+                    cancel.checkpoint(position, len(windows))
+                nominal = nominals[position]
+                real = nominal / deflator if years > 0 else nominal
+
+                savings_by_dates.append(
+                    {
+                        "start": period.start,
+                        "end": period.end,
+                        "amount": to_money_float(amount),
+                        "profits": to_money_float(real - amount),
+                        "taxBenefit": to_money_float(tax_benefits[position]),
+                    }
+                )
 
         return {
             "channel": channel,
-            "transactionsTotalAmount": to_money_float(
-                sum((to_decimal(tx["amount"]) for tx in valid_transactions), Decimal("0"))
-            ),
-            "transactionsTotalCeiling": to_money_float(
-                sum((to_decimal(tx["ceiling"]) for tx in valid_transactions), Decimal("0"))
-            ),
+            "transactionsTotalAmount": to_money_float(total_amount),
+            "transactionsTotalCeiling": to_money_float(total_ceiling),
             "savingsByDates": savings_by_dates,
         }
 
@@ -0,0 +1,356 @@
+"""File-to-file parse and filter over CSV and Arrow IPC, in bounded memory.
+
+Inputs are memory-mapped and read ``INGEST_CHUNK_ROWS`` rows at a time. Arrow
+IPC columns are used zero-copy where their type allows it. Each chunk goes
+through the columnar kernels and is appended to the output, so memory stays
+proportional to the chunk size. The exception is an 8-byte-per-row date column
+kept for the duplicate check that ``transactions:parse`` requires. Outputs are
+written to ``<output>.partial`` and renamed into place once complete.
+
+CSV works with the standard library alone. Arrow IPC and the faster CSV reader
+need ``pyarrow``, which is imported on the first ingest call rather than at
+start-up.
+"""
+
+import csv
+import io
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from app.core.cancellation import CancellationToken
+from app.services import columnar
+
+pyarrow = None  # set by _load_pyarrow()
+_pyarrow_loaded = False
+
+
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+DATE_COLUMNS = ("date", "timestamp")
+MONEY_COLUMNS = ("amount", "ceiling", "remanent")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _chunk_rows() -> int:
+    return int(os.getenv("INGEST_CHUNK_ROWS", "262144"))
+
+
+def file_format(path: str) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in ARROW_SUFFIXES:
+        return "arrow"
+    raise ValueError(f"Unsupported file type '{suffix}'. Use .csv or one of {', '.join(ARROW_SUFFIXES)}")
+
+
+def _load_pyarrow() -> None:
+    global pyarrow, _pyarrow_loaded
+    if _pyarrow_loaded:
+        return
+    _pyarrow_loaded = True
+    try:
+        import pyarrow as module
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.ipc
+    except ImportError:  # optional: CSV falls back to the standard library reader
+        return
+    pyarrow = module
+
+
+def _require_pyarrow(purpose: str) -> None:
+    _load_pyarrow()
+    if pyarrow is None:
+        raise RuntimeError(f"pyarrow is required for {purpose}. Install with 'pip install pyarrow'.")
+
+
+def _date_column(names: list[str]) -> str:
+    for name in DATE_COLUMNS:
+        if name in names:
+            return name
+    raise ValueError("input needs a 'date' (or 'timestamp') column")
+
+
+def _check_columns(names: list[str], money: tuple[str, ...]) -> None:
+    missing = [name for name in money if name not in names]
+    if missing:
+        raise ValueError(f"input is missing column(s): {', '.join(missing)}")
+
+
+# --- readers: each yields {"epoch": int64 seconds, <money>: int64 cents} per chunk ----------------
+
+
+def _arrow_dates(column) -> np.ndarray:
+    if pyarrow.types.is_timestamp(column.type):
+        return column.cast(pyarrow.timestamp("s")).cast(pyarrow.int64()).to_numpy()
+    parsed = pyarrow.compute.strptime(column.cast(pyarrow.string()), format=TIMESTAMP_FORMAT, unit="s")
+    return parsed.cast(pyarrow.int64()).to_numpy()
+
+
+def _arrow_chunk(batch, date_name: str, money: tuple[str, ...]) -> dict:
+    if any(batch.column(name).null_count for name in (date_name, *money)):
+        raise ValueError("input contains empty values")
+    chunk = {"epoch": _arrow_dates(batch.column(date_name))}
+    for name in money:
+        chunk[name] = columnar.to_cents(batch.column(name).cast(pyarrow.float64()).to_numpy(), name)
+    return chunk
+
+
+def _read_arrow(path: str, money: tuple[str, ...], chunk_rows: int) -> Iterator[dict]:
+    _require_pyarrow("Arrow IPC files")
+    with pyarrow.memory_map(path, "r") as source:
+        try:
+            reader = pyarrow.ipc.open_file(source)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            names = reader.schema.names
+        except pyarrow.ArrowInvalid:
+            source.seek(0)
+            reader = pyarrow.ipc.open_stream(source)
+            batches = iter(reader)
+            names = reader.schema.names
+        date_name = _date_column(names)
+        _check_columns(names, money)
+        for batch in batches:
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield _arrow_chunk(batch.slice(offset, chunk_rows), date_name, money)
+
+
+def _read_csv_arrow(path: str, money: tuple[str, ...], chunk_rows: int) -> Iterator[dict]:
+    with open(path, "rb") as handle:
+        names = next(csv.reader(io.TextIOWrapper(handle, encoding="utf-8")))
+    date_name = _date_column(names)
+    _check_columns(names, money)
+    convert = pyarrow.csv.ConvertOptions(
+        include_columns=[date_name, *money],
+        column_types={date_name: pyarrow.string(), **{name: pyarrow.float64() for name in money}},
+    )
+    with pyarrow.memory_map(path, "r") as source:
+        reader = pyarrow.csv.open_csv(
+            source,
+            read_options=pyarrow.csv.ReadOptions(block_size=8 * 1024 * 1024),
+            convert_options=convert,
+        )
+        for batch in reader:
+            for offset in range(0, batch.num_rows, chunk_rows):
+                yield _arrow_chunk(batch.slice(offset, chunk_rows), date_name, money)
+
+
+def _read_csv_stdlib(path: str, money: tuple[str, ...], chunk_rows: int) -> Iterator[dict]:
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        lines = iter(mapped.readline, b"")
+        names = next(csv.reader([next(lines).decode("utf-8")]))
+        date_name = _date_column(names)
+        _check_columns(names, money)
+        positions = [names.index(name) for name in (date_name, *money)]
+        while True:
+            block = [line.decode("utf-8") for _, line in zip(range(chunk_rows), lines)]
+            if not block:
+                return
+            rows = [row for row in csv.reader(block) if row]
+            try:
+                columns = list(zip(*([row[position] for position in positions] for row in rows)))
+            except IndexError as exc:
+                raise ValueError("input has rows with missing columns") from exc
+            chunk = {"epoch": columnar.parse_epochs(columns[0])}
+            for name, values in zip(money, columns[1:]):
+                chunk[name] = columnar.to_cents(np.asarray(values, dtype=np.float64), name)
+            yield chunk
+
+
+def _arrow_errors(chunks: Iterator[dict]) -> Iterator[dict]:
+    try:
+        yield from chunks
+    except pyarrow.ArrowInvalid as exc:
+        raise ValueError(str(exc)) from exc
+
+
+def read_chunks(path: str, money: tuple[str, ...], chunk_rows: int | None = None) -> Iterator[dict]:
+    chunk_rows = chunk_rows or _chunk_rows()
+    _load_pyarrow()
+    if file_format(path) == "arrow":
+        return _arrow_errors(_read_arrow(path, money, chunk_rows))
+    if pyarrow is not None:
+        return _arrow_errors(_read_csv_arrow(path, money, chunk_rows))
+    return _read_csv_stdlib(path, money, chunk_rows)
+
+
+# --- writers ---------------------------------------------------------------------------------------
+
+
+_CENT_SUFFIXES = np.array([f".{cents:02d}" for cents in range(100)])
+
+
+def _money_text(cents: np.ndarray) -> list[str]:
+    whole, fraction = np.divmod(cents, 100)
+    return np.strings.add(whole.astype(np.str_), _CENT_SUFFIXES[fraction]).tolist()
+
+
+class _CsvWriter:
+    def __init__(self, path: str, columns: list[str]) -> None:
+        self.handle = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.handle, lineterminator="\n")
+        self.writer.writerow(columns)
+
+    def write(self, columns: dict) -> None:
+        values = []
+        for name, column in columns.items():
+            if name == "date":
+                values.append(columnar.format_epochs(column).tolist())
+            elif name in MONEY_COLUMNS:
+                values.append(_money_text(column))
+            elif name == "valid":
+                values.append(["true" if item else "false" for item in column.tolist()])
+            else:
+                values.append(["" if item is None else item for item in column])
+        self.writer.writerows(zip(*values))
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+class _ArrowWriter:
+    def __init__(self, path: str, columns: list[str]) -> None:
+        _require_pyarrow("Arrow IPC output")
+        types = {"date": pyarrow.timestamp("s"), "valid": pyarrow.bool_(), "message": pyarrow.string()}
+        self.schema = pyarrow.schema([(name, types.get(name, pyarrow.float64())) for name in columns])
+        self.sink = pyarrow.OSFile(path, "wb")
+        self.writer = pyarrow.ipc.new_file(self.sink, self.schema)
+
+    def write(self, columns: dict) -> None:
+        arrays = []
+        for name, column in columns.items():
+            if name == "date":
+                arrays.append(pyarrow.array(column, type=pyarrow.int64()).cast(pyarrow.timestamp("s")))
+            elif name in MONEY_COLUMNS:
+                arrays.append(pyarrow.array(columnar.from_cents(column)))
+            else:
+                arrays.append(pyarrow.array(column, type=self.schema.field(name).type))
+        self.writer.write_batch(pyarrow.record_batch(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+        self.sink.close()
+
+
+def _open_writer(path: str, columns: list[str]):
+    writer_class = _ArrowWriter if file_format(path) == "arrow" else _CsvWriter
+    return writer_class(path + ".partial", columns)
+
+
+def _finish(writer, path: str, ok: bool) -> None:
+    writer.close()
+    if ok:
+        os.replace(path + ".partial", path)
+    elif os.path.exists(path + ".partial"):
+        os.remove(path + ".partial")
+
+
+# --- operations ------------------------------------------------------------------------------------
+
+
+def ingest_parse(input_path: str, output_path: str, cancel: CancellationToken | None = None) -> dict:
+    """``transactions:parse`` over a file of ``date,amount`` expenses."""
+    started = time.perf_counter()
+    file_format(output_path)
+    writer = _open_writer(output_path, ["date", "amount", "ceiling", "remanent"])
+    epochs: list[np.ndarray] = []
+    totals = {"amount": 0, "ceiling": 0, "remanent": 0}
+    rows = chunks = 0
+    ok = False
+    try:
+        for chunk in read_chunks(input_path, ("amount",)):
+            if cancel:
+                cancel.checkpoint(rows, 0)
+            amount = chunk["amount"]
+            ceiling, remanent = columnar.round_up(amount)
+            columnar.check_transaction_schema(amount, ceiling, remanent, offset=rows)
+            writer.write({"date": chunk["epoch"], "amount": amount, "ceiling": ceiling, "remanent": remanent})
+            epochs.append(chunk["epoch"])
+            totals["amount"] += int(amount.sum())
+            totals["ceiling"] += int(ceiling.sum())
+            totals["remanent"] += int(remanent.sum())
+            rows += len(amount)
+            chunks += 1
+        if rows:
+            ordered = np.sort(np.concatenate(epochs))
+            if (ordered[1:] == ordered[:-1]).any():
+                raise ValueError("duplicate transaction date found in expenses")
+        ok = True
+    finally:
+        _finish(writer, output_path, ok)
+
+    return {
+        "operation": "transactions:parse",
+        "output": output_path,
+        "rows": rows,
+        "chunks": chunks,
+        "totals": {
+            "totalExpense": totals["amount"] / 100,
+            "totalCeiling": totals["ceiling"] / 100,
+            "totalRemanent": totals["remanent"] / 100,
+        },
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def _date_bounds(input_path: str) -> tuple[int | None, int | None]:
+    low = high = None
+    for chunk in read_chunks(input_path, ()):
+        if len(chunk["epoch"]):
+            low = int(chunk["epoch"].min()) if low is None else min(low, int(chunk["epoch"].min()))
+            high = int(chunk["epoch"].max()) if high is None else max(high, int(chunk["epoch"].max()))
+    return low, high
+
+
+def ingest_filter(input_path: str, output_path: str, rules, cancel: CancellationToken | None = None) -> dict:
+    """``transactions:filter`` over a file of transactions.
+
+    ``rules`` carries ``q``, ``p``, ``k`` and ``kMode`` like a filter request. A
+    first pass over the date column finds the bounds the rule validation needs.
+    Output rows keep input order with ``valid`` and ``message`` columns.
+    """
+    started = time.perf_counter()
+    file_format(output_path)
+    plan = columnar.FilterPlan.from_request(rules, *_date_bounds(input_path))
+    writer = _open_writer(output_path, ["date", "amount", "ceiling", "remanent", "valid", "message"])
+    rows = valid_rows = chunks = 0
+    ok = False
+    try:
+        for chunk in read_chunks(input_path, MONEY_COLUMNS):
+            if cancel:
+                cancel.checkpoint(rows, 0)
+            amount, ceiling, remanent = chunk["amount"], chunk["ceiling"], chunk["remanent"]
+            columnar.check_transaction_schema(amount, ceiling, remanent, offset=rows)
+            adjusted, codes = plan.apply(chunk["epoch"], amount, ceiling, remanent)
+            valid = codes == columnar.VALID
+            writer.write(
+                {
+                    "date": chunk["epoch"],
+                    "amount": amount,
+                    "ceiling": ceiling,
+                    "remanent": np.where(valid, adjusted, remanent),
+                    "valid": valid,
+                    "message": columnar.messages(codes),
+                }
+            )
+            rows += len(amount)
+            valid_rows += int(valid.sum())
+            chunks += 1
+        ok = True
+    finally:
+        _finish(writer, output_path, ok)
+
+    return {
+        "operation": "transactions:filter",
+        "output": output_path,
+        "rows": rows,
+        "validRows": valid_rows,
+        "invalidRows": rows - valid_rows,
+        "chunks": chunks,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 3),
+    }
@@ -0,0 +1,224 @@
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.core.cancellation import CancellationToken, OperationCancelled
+from app.schemas.common import BatchJobRequest, ReturnsResponse, SimulatedReturnsResponse, TemporalFilterResponse
+from app.services.engine import SavingsEngine
+from app.services.results import apply_view
+from app.services.rows import materialize
+from app.services.simulation import simulate_returns
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobProgress(CancellationToken):
+    """Cancellation token that also reports engine checkpoints as job progress.
+
+    ``base`` and ``span`` map the current engine pass onto a slice of the job,
+    so a batch can report progress across its items.
+    """
+
+    def __init__(self, report: Callable[[float], None], interval: float) -> None:
+        super().__init__()
+        self.report = report
+        self.interval = interval
+        self.base = 0.0
+        self.span = 1.0
+        self._last_report = 0.0
+
+    def checkpoint(self, done: int, total: int) -> None:
+        self.check()
+        now = time.monotonic()
+        if total and now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(round(self.base + self.span * done / total, 4))
+
+
+def _run_filter(engine: SavingsEngine, payload, cancel: JobProgress) -> str:
+    if payload.has_view():
+        # Job payloads reject pageSize, so the view never needs the cursor store.
+        return json.dumps(materialize(apply_view(engine.filter_temporal_rows(payload, cancel), payload, None)))
+    result = engine.filter_temporal_constraints(payload, cancel)
+    return TemporalFilterResponse.model_validate(result).model_dump_json(by_alias=True)
+
+
+def _returns_runner(channel: str) -> Callable:
+    def run(engine: SavingsEngine, payload, cancel: JobProgress) -> str:
+        if payload.simulation is not None:
+            result = simulate_returns(engine, payload, channel, cancel)
+            return SimulatedReturnsResponse.model_validate(result).model_dump_json(by_alias=True)
+        result = engine.calculate_returns(payload, channel=channel, cancel=cancel)
+        return ReturnsResponse.model_validate(result).model_dump_json(by_alias=True)
+
+    return run
+
+
+def _run_batch(engine: SavingsEngine, payload: BatchJobRequest, cancel: JobProgress) -> str:
+    parts = []
+    cancel.span = 1.0 / len(payload.items)
+    for position, item in enumerate(payload.items):
+        cancel.base = position * cancel.span
+        parts.append(JOB_OPERATIONS[item.operation](engine, item.payload, cancel))
+    return '{"results":[' + ",".join(parts) + "]}"
+
+
+# operation -> runner returning the JSON document stored as the job result.
+JOB_OPERATIONS: dict[str, Callable[[SavingsEngine, object, JobProgress], str]] = {
+    "transactions:filter": _run_filter,
+    "returns:nps": _returns_runner("nps"),
+    "returns:index": _returns_runner("index"),
+    "batch": _run_batch,
+}
+
+
+class JobManager:
+    """Runs submitted computations on a bounded worker pool and persists their outcome.
+
+    At most ``JOB_WORKERS`` jobs run at once and at most ``JOB_MAX_QUEUED`` wait;
+    further submissions raise ``JobQueueFull``. Results are stored gzip-compressed
+    and expire ``JOB_RESULT_TTL_SECONDS`` after the job finishes; expired rows
+    are forgotten after another TTL.
+
+    Jobs live in this process's pool, so ``initialize`` fails jobs a previous
+    process left queued or running. Only jobs submitted before this manager was
+    created are touched, so workers that start together do not fail each
+    other's new jobs.
+    """
+
+    def __init__(self, repo, engine_factory: Callable[[], SavingsEngine] = SavingsEngine) -> None:
+        self.repo = repo
+        self.engine_factory = engine_factory
+        self.workers = int(os.getenv("JOB_WORKERS", "2"))
+        self.max_queued = int(os.getenv("JOB_MAX_QUEUED", "64"))
+        self.result_ttl = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+        self.compression_level = int(os.getenv("JOB_COMPRESSION_LEVEL", "6"))
+        self.progress_interval = float(os.getenv("JOB_PROGRESS_INTERVAL_MS", "500")) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._tokens: dict[str, JobProgress] = {}
+        self.queued = 0
+        self.running = 0
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self.queue_waits: deque[float] = deque(maxlen=1000)
+        self.run_times: deque[float] = deque(maxlen=1000)
+        self.recent_finishes: deque[float] = deque()
+        self.created_at = time.time()
+
+    def initialize(self) -> None:
+        self.repo.initialize()
+        now = time.time()
+        self.repo.fail_unfinished_jobs(
+            self.created_at, now, now + self.result_ttl, "server restarted before the job finished"
+        )
+
+    def submit(self, operation: str, payload) -> dict:
+        if operation not in JOB_OPERATIONS:
+            raise ValueError(f"Unsupported job operation '{operation}'")
+        with self._lock:
+            if self.queued >= self.max_queued:
+                self.stats["rejected"] += 1
+                raise JobQueueFull("Job queue is full, retry later")
+            self.queued += 1
+            self.stats["submitted"] += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self.expire()
+            self.repo.create_job(job_id, operation, time.time())
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+                self.stats["submitted"] -= 1
+            raise
+        token = JobProgress(lambda progress: self.repo.update_job_progress(job_id, progress), self.progress_interval)
+        with self._lock:
+            self._tokens[job_id] = token
+        self._executor.submit(self._run, job_id, operation, payload, token, time.perf_counter())
+        return self.repo.get_job(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        self.expire()
+        return self.repo.get_job(job_id)
+
+    def result(self, job_id: str) -> bytes | None:
+        return self.repo.get_job_result(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Whether ``job_id`` is queued or running in this process and is now cancelled."""
+        with self._lock:
+            token = self._tokens.get(job_id)
+        if token is None:
+            return False
+        token.cancel("cancelled")
+        return True
+
+    def expire(self) -> int:
+        now = time.time()
+        return self.repo.expire_jobs(now, now - self.result_ttl)
+
+    def _run(self, job_id: str, operation: str, payload, token: JobProgress, enqueued: float) -> None:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.queue_waits.append((time.perf_counter() - enqueued) * 1000)
+        started = time.perf_counter()
+        status, result, error = "failed", None, None
+        try:
+            token.check()
+            self.repo.start_job(job_id, time.time())
+            body = JOB_OPERATIONS[operation](self.engine_factory(), payload, token)
+            result = gzip.compress(body.encode("utf-8"), compresslevel=self.compression_level)
+            status = "succeeded"
+        except OperationCancelled as exc:
+            if exc.reason == "cancelled":
+                status, error = "cancelled", "cancelled by client"
+            else:
+                error = "server shut down before the job finished"
+        except Exception as exc:
+            error = str(exc) or type(exc).__name__
+        finally:
+            finished = time.time()
+            self.repo.finish_job(job_id, status, finished, finished + self.result_ttl, result, error)
+            with self._lock:
+                self.running -= 1
+                self.stats[status] += 1
+                self.run_times.append((time.perf_counter() - started) * 1000)
+                self.recent_finishes.append(time.monotonic())
+                self._tokens.pop(job_id, None)
+
+    def shutdown(self) -> None:
+        """Stops running jobs at their next checkpoint; jobs still queued are failed."""
+        with self._lock:
+            tokens = list(self._tokens.values())
+        for token in tokens:
+            token.cancel("shutdown")
+        self._executor.shutdown(wait=True)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            while self.recent_finishes and now - self.recent_finishes[0] > 60:
+                self.recent_finishes.popleft()
+            waits = sorted(self.queue_waits)
+            runs = list(self.run_times)
+            return {
+                **self.stats,
+                "workers": self.workers,
+                "maxQueued": self.max_queued,
+                "queued": self.queued,
+                "running": self.running,
+                "throughputPerMin": len(self.recent_finishes),
+                "avgQueueMs": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "maxQueueMs": round(waits[-1], 3) if waits else 0.0,
+                "p99QueueMs": round(waits[max(0, int(len(waits) * 0.99) - 1)], 3) if waits else 0.0,
+                "avgRunMs": round(sum(runs) / len(runs), 3) if runs else 0.0,
+            }
@@ -0,0 +1,185 @@
+"""Parse, validate, filter and returns in one request.
+
+Raw expenses are turned into epoch and cent columns once. Every later stage
+works on index arrays over those columns, so no stage builds the row dicts the
+next one would read. Dicts are only built for the stage outputs the caller
+asks for. Stages after the last requested one are not run.
+
+Inputs the integer kernels cannot take exactly (sub-cent amounts or rule
+values, or expense or rule dates outside the canonical layout) run the same
+stages through ``SavingsEngine`` one after the other.
+"""
+
+import numpy as np
+
+from app.core.cancellation import CancellationToken
+from app.core.profiling import stage
+from app.schemas.common import (
+    PIPELINE_STAGES,
+    ParseRequest,
+    ReturnsRequest,
+    TemporalFilterRequest,
+    TransactionValidationRequest,
+)
+from app.services import columnar
+from app.services.engine import SavingsEngine, _cents_floor, to_decimal
+
+
+def _last_stage(payload) -> int:
+    return max(PIPELINE_STAGES.index(name) for name in payload.outputs)
+
+
+def _rows(dates: list[str], index: np.ndarray, amount, ceiling, remanent) -> list[dict]:
+    return [
+        {"date": dates[i], "amount": a, "ceiling": c, "remanent": r}
+        for i, a, c, r in zip(
+            index.tolist(),
+            columnar.from_cents(amount).tolist(),
+            columnar.from_cents(ceiling).tolist(),
+            columnar.from_cents(remanent).tolist(),
+        )
+    ]
+
+
+def _invalid_rows(rows: list[dict], codes: np.ndarray) -> list[dict]:
+    return [{**row, "message": columnar.MESSAGES[code]} for row, code in zip(rows, codes.tolist())]
+
+
+def run_pipeline(engine: SavingsEngine, payload, cancel: CancellationToken | None = None) -> dict:
+    """Outputs named in ``payload.outputs``, each shaped like its single-stage endpoint.
+
+    ``filter`` runs on the transactions ``validator`` accepts, and ``returns``
+    aggregates the transactions ``filter`` keeps, as a client chaining the
+    four endpoints would. ``returns`` holds one entry per channel.
+    """
+    last = _last_stage(payload)
+    if last == 3:
+        for channel in payload.channels:
+            engine.registry.get(channel)
+    dates = [expense.date for expense in payload.expenses]
+    try:
+        epochs = columnar.parse_epochs(dates)
+    except ValueError:
+        return _run_chained(engine, payload, last, cancel)
+    amount = columnar.try_cents([expense.amount for expense in payload.expenses])
+    if amount is None or (last >= 2 and not columnar.rules_exact(payload)):
+        return _run_chained(engine, payload, last, cancel)
+
+    wanted = set(payload.outputs)
+    result: dict = {}
+    total = len(dates)
+    with stage("parse"):
+        if not columnar.first_occurrences(epochs).all():
+            raise ValueError("duplicate transaction date found in expenses")
+        ceiling, remanent = columnar.round_up(amount)
+        if "parse" in wanted:
+            result["parse"] = {
+                "transactions": _rows(dates, np.arange(total), amount, ceiling, remanent),
+                "totals": {
+                    "totalExpense": int(amount.sum()) / 100,
+                    "totalCeiling": int(ceiling.sum()) / 100,
+                    "totalRemanent": int(remanent.sum()) / 100,
+                },
+            }
+    if last == 0:
+        return result
+    if cancel:
+        cancel.checkpoint(total // 4, total)
+
+    with stage("validate"):
+        wage = to_decimal(payload.wage)
+        codes = columnar.validator_codes(
+            amount,
+            ceiling,
+            remanent,
+            wage_floor=_cents_floor(wage),
+            wage_positive=wage > 0,
+            max_invest_floor=_cents_floor(to_decimal(payload.maxInvest)) if payload.maxInvest is not None else None,
+        )
+        accepted = np.flatnonzero(codes == columnar.VALID)
+        if "validator" in wanted:
+            rejected = np.flatnonzero(codes != columnar.VALID)
+            result["validator"] = {
+                "valid": _rows(dates, accepted, amount[accepted], ceiling[accepted], remanent[accepted]),
+                "invalid": _invalid_rows(
+                    _rows(dates, rejected, amount[rejected], ceiling[rejected], remanent[rejected]), codes[rejected]
+                ),
+                "duplicates": [],
+            }
+    if last == 1:
+        return result
+    if cancel:
+        cancel.checkpoint(total // 2, total)
+
+    with stage("rules"):
+        epochs, amount, ceiling, remanent = (column[accepted] for column in (epochs, amount, ceiling, remanent))
+        bounds = (int(epochs.min()), int(epochs.max())) if len(epochs) else (None, None)
+        plan = columnar.FilterPlan.from_request(payload, *bounds)
+        adjusted, codes = plan.apply(epochs, amount, ceiling, remanent)
+        kept = codes == columnar.VALID
+        if "filter" in wanted:
+            dropped = ~kept
+            result["filter"] = {
+                "valid": _rows(dates, accepted[kept], amount[kept], ceiling[kept], adjusted[kept]),
+                "invalid": _invalid_rows(
+                    _rows(dates, accepted[dropped], amount[dropped], ceiling[dropped], remanent[dropped]),
+                    codes[dropped],
+                ),
+            }
+    if last == 2:
+        return result
+    if cancel:
+        cancel.checkpoint(3 * total // 4, total)
+
+    with stage("aggregate"):
+        order = np.argsort(epochs[kept], kind="stable")
+        k = columnar.Periods.from_models("k", payload.k)
+        sums = columnar.window_sums(epochs[kept][order], adjusted[kept][order], k.starts, k.ends)
+        windows = [(period, columnar.decimal_from_cents(cents)) for period, cents in zip(payload.k, sums.tolist())]
+        total_amount = columnar.decimal_from_cents(amount[kept].sum())
+        total_ceiling = columnar.decimal_from_cents(ceiling[kept].sum())
+    result["returns"] = [
+        engine.returns_from_windows(payload, channel, windows, total_amount, total_ceiling, cancel)
+        for channel in payload.channels
+    ]
+    return result
+
+
+def _run_chained(engine: SavingsEngine, payload, last: int, cancel: CancellationToken | None) -> dict:
+    """The same stages through the Decimal engine, each fed the previous stage's output."""
+    wanted = set(payload.outputs)
+    result: dict = {}
+    parsed = engine.parse_transactions(ParseRequest(expenses=payload.expenses), cancel)
+    if "parse" in wanted:
+        result["parse"] = parsed
+    if last == 0:
+        return result
+
+    validated = engine.validate_transactions(
+        TransactionValidationRequest(
+            wage=payload.wage, maxInvest=payload.maxInvest, transactions=parsed["transactions"]
+        ),
+        cancel,
+    )
+    if "validator" in wanted:
+        result["validator"] = validated
+    if last == 1:
+        return result
+
+    rules = {"q": payload.q, "p": payload.p, "k": payload.k, "kMode": payload.kMode}
+    if "filter" in wanted:
+        result["filter"] = engine.filter_temporal_constraints(
+            TemporalFilterRequest(**rules, transactions=validated["valid"]), cancel
+        )
+    if last == 2:
+        return result
+
+    returns_payload = ReturnsRequest(
+        age=payload.age, wage=payload.wage, inflation=payload.inflation, **rules, transactions=validated["valid"]
+    )
+    windows, total_amount, total_ceiling = engine.aggregate_windows(returns_payload, cancel)
+    result["returns"] = [
+        engine.returns_from_windows(returns_payload, channel, windows, total_amount, total_ceiling, cancel)
+        for channel in payload.channels
+    ]
+    return result
@@ -0,0 +1,325 @@
+"""Frozen Decimal reference for every engine operation.
+
+``ReferenceEngine`` is a copy of the ``SavingsEngine`` Decimal code paths as
+they stood when the columnar, pipeline and sweep fast paths were added. Those
+paths define correct results to the cent. That includes:
+- q ties broken by list order;
+- overlapping p extras summed;
+- half-up rounding of every money value.
+
+The copy keeps the algorithms but drops cancellation, stage timing, row
+streams and the batched plugin calls, and it calls the scalar plugin methods
+instead. The kBuckets helpers are copied from ``app.services.buckets`` too, so
+a change there cannot move both sides at once. The API never uses it. ``python -m benchmarks fuzz`` and the tests
+compare the optimized paths against it.
+
+Do not optimize this module or change it together with the engine: a change
+here redefines what the fast paths are checked against.
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import replace
+from datetime import datetime, timedelta
+from decimal import ROUND_CEILING, ROUND_HALF_UP, Decimal
+import heapq
+from typing import NamedTuple
+
+from app.plugins.base import InvestmentContext
+from app.plugins.registry import PluginRegistry
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+ZERO = Decimal("0")
+MAX_BUCKETS = 1_000_000
+ONE_SECOND = timedelta(seconds=1)
+
+
+def _dt(value: str) -> datetime:
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def _dec(value) -> Decimal:
+    return Decimal(str(value))
+
+
+def _money(value: Decimal) -> float:
+    return float(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def _row(tx) -> dict:
+    return {"date": tx.date, "amount": tx.amount, "ceiling": tx.ceiling, "remanent": tx.remanent}
+
+
+def _input_order(pairs: list[tuple[int, dict]], count: int) -> list[dict]:
+    slots: list[dict | None] = [None] * count
+    for index, row in pairs:
+        slots[index] = row
+    return [row for row in slots if row is not None]
+
+
+class Bucket(NamedTuple):
+    start: str
+    end: str
+    start_dt: datetime
+    end_dt: datetime
+
+
+def _month_floor(value: datetime, months: int) -> datetime:
+    month = (value.month - 1) // months * months + 1
+    return datetime(value.year, month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _bucket_floor(value: datetime, unit: str) -> datetime:
+    day = datetime(value.year, value.month, value.day)
+    if unit == "day":
+        return day
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return _month_floor(value, 1)
+    if unit == "quarter":
+        return _month_floor(value, 3)
+    return datetime(value.year, 1, 1)
+
+
+def _bucket_next(start: datetime, unit: str) -> datetime:
+    if unit == "day":
+        return start + timedelta(days=1)
+    if unit == "week":
+        return start + timedelta(weeks=1)
+    return _add_months(start, {"month": 1, "quarter": 3, "year": 12}[unit])
+
+
+def _calendar_buckets(unit: str, start: datetime, end: datetime) -> list[Bucket]:
+    buckets: list[Bucket] = []
+    current = _bucket_floor(start, unit)
+    while current <= end:
+        following = _bucket_next(current, unit)
+        low = max(current, start)
+        high = min(following - ONE_SECOND, end)
+        buckets.append(Bucket(low.strftime(TIMESTAMP_FORMAT), high.strftime(TIMESTAMP_FORMAT), low, high))
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"kBuckets must produce at most {MAX_BUCKETS:,} windows")
+        current = following
+    return buckets
+
+
+def _bucket_sums(sorted_dates: list[datetime], prefix: list, buckets: list[Bucket]) -> list:
+    sums = []
+    position = 0
+    count = len(sorted_dates)
+    if buckets:
+        while position < count and sorted_dates[position] < buckets[0].start_dt:
+            position += 1
+    for bucket in buckets:
+        left = position
+        while position < count and sorted_dates[position] <= bucket.end_dt:
+            position += 1
+        sums.append(prefix[position] - prefix[left])
+    return sums
+
+
+class ReferenceEngine:
+    def __init__(self) -> None:
+        self.registry = PluginRegistry()
+
+    def parse_transactions(self, payload) -> dict:
+        transactions = []
+        totals = [ZERO, ZERO, ZERO]
+        seen: set[str] = set()
+        for expense in payload.expenses:
+            if expense.date in seen:
+                raise ValueError("duplicate transaction date found in expenses")
+            seen.add(expense.date)
+            amount = _dec(expense.amount)
+            ceiling = (amount / Decimal("100")).to_integral_value(rounding=ROUND_CEILING) * Decimal("100")
+            remanent = ceiling - amount
+            transactions.append(
+                {
+                    "date": expense.date,
+                    "amount": _money(amount),
+                    "ceiling": _money(ceiling),
+                    "remanent": _money(remanent),
+                }
+            )
+            totals = [totals[0] + amount, totals[1] + ceiling, totals[2] + remanent]
+        return {
+            "transactions": transactions,
+            "totals": {
+                "totalExpense": _money(totals[0]),
+                "totalCeiling": _money(totals[1]),
+                "totalRemanent": _money(totals[2]),
+            },
+        }
+
+    def validate_transactions(self, payload) -> dict:
+        valid, invalid, duplicates = [], [], []
+        seen: set[str] = set()
+        wage = _dec(payload.wage)
+        max_invest = _dec(payload.maxInvest) if payload.maxInvest is not None else None
+        for tx in payload.transactions:
+            if tx.date in seen:
+                duplicates.append(_row(tx))
+                continue
+            seen.add(tx.date)
+            message = self.transaction_error(tx, wage, max_invest)
+            if message:
+                invalid.append({**_row(tx), "message": message})
+            else:
+                valid.append(_row(tx))
+        return {"valid": valid, "invalid": invalid, "duplicates": duplicates}
+
+    @staticmethod
+    def transaction_error(tx, wage: Decimal | None = None, max_invest: Decimal | None = None) -> str | None:
+        amount, ceiling, remanent = _dec(tx.amount), _dec(tx.ceiling), _dec(tx.remanent)
+        if amount < 0 or ceiling < 0 or remanent < 0:
+            return "amount, ceiling and remanent must be non-negative"
+        if amount >= Decimal("500000"):
+            return "amount must be less than 500000"
+        if ceiling < amount:
+            return "ceiling cannot be less than amount"
+        if (ceiling % Decimal("100")) != 0:
+            return "ceiling must be a multiple of 100"
+        if (ceiling - amount).quantize(Decimal("0.01")) != remanent.quantize(Decimal("0.01")):
+            return "remanent must equal ceiling - amount"
+        if wage is not None:
+            if wage <= 0 and remanent > 0:
+                return "wage must be greater than 0 when remanent exists"
+            if remanent > wage:
+                return "remanent cannot exceed wage"
+        if max_invest is not None and remanent > max_invest:
+            return "remanent cannot exceed maxInvest"
+        return None
+
+    def filter_temporal_constraints(self, payload) -> dict:
+        valid, invalid, dates = self._filter(payload)
+        return {"valid": _input_order(valid, len(dates)), "invalid": _input_order(invalid, len(dates))}
+
+    def _filter(self, payload) -> tuple[list, list, list[datetime]]:
+        """``(valid, invalid, dates)``: ``(input index, row)`` pairs in time order and the parsed input dates."""
+        dates = [_dt(tx.date) for tx in payload.transactions]
+        in_order = all(earlier <= later for earlier, later in zip(dates, dates[1:]))
+        if getattr(payload, "sorted", False) and not in_order:
+            raise ValueError("transactions are not in date order but sorted=true was declared")
+        low, high = (min(dates), max(dates)) if dates else (None, None)
+        for label in ("q", "p", "k"):
+            for index, period in enumerate(getattr(payload, label)):
+                start, end = _dt(period.start), _dt(period.end)
+                if start > end:
+                    raise ValueError(f"{label}[{index}] has start > end")
+                if low is not None and (start < low or end > high):
+                    raise ValueError(f"{label}[{index}] is outside transaction date bounds")
+
+        q_rules = sorted(
+            ((_dt(rule.start), index, _dt(rule.end), _dec(rule.fixed)) for index, rule in enumerate(payload.q)),
+            key=lambda item: (item[0], item[1]),
+        )
+        p_rules = sorted(((_dt(rule.start), _dt(rule.end), _dec(rule.extra)) for rule in payload.p), key=lambda r: r[0])
+        k_rules = sorted(((_dt(rule.start), _dt(rule.end)) for rule in payload.k), key=lambda r: r[0])
+        order = sorted(range(len(dates)), key=dates.__getitem__)
+
+        valid, invalid = [], []
+        q_ptr, q_heap = 0, []
+        p_ptr, p_heap, extra = 0, [], ZERO
+        k_ptr, k_heap = 0, []
+        for index in order:
+            tx, when = payload.transactions[index], dates[index]
+            message = self.transaction_error(tx)
+            if message:
+                invalid.append((index, {**_row(tx), "message": message}))
+                continue
+            while q_ptr < len(q_rules) and q_rules[q_ptr][0] <= when:
+                start, position, end, fixed = q_rules[q_ptr]
+                # Latest start wins; equal starts go to the earlier rule in the request list.
+                heapq.heappush(q_heap, (-(start - datetime.min).total_seconds(), position, end, fixed))
+                q_ptr += 1
+            while q_heap and q_heap[0][2] < when:
+                heapq.heappop(q_heap)
+            while p_ptr < len(p_rules) and p_rules[p_ptr][0] <= when:
+                heapq.heappush(p_heap, (p_rules[p_ptr][1], p_rules[p_ptr][2]))
+                extra += p_rules[p_ptr][2]
+                p_ptr += 1
+            while p_heap and p_heap[0][0] < when:
+                extra -= heapq.heappop(p_heap)[1]
+            while k_ptr < len(k_rules) and k_rules[k_ptr][0] <= when:
+                heapq.heappush(k_heap, k_rules[k_ptr][1])
+                k_ptr += 1
+            while k_heap and k_heap[0] < when:
+                heapq.heappop(k_heap)
+
+            remanent = max(ZERO, (q_heap[0][3] if q_heap else _dec(tx.remanent)) + extra)
+            if payload.kMode == "strict" and payload.k and not k_heap:
+                invalid.append((index, {**_row(tx), "message": "transaction does not fall within any k period"}))
+                continue
+            valid.append((index, {**_row(tx), "remanent": _money(remanent)}))
+        return valid, invalid, dates
+
+    def calculate_returns(self, payload, channel: str) -> dict:
+        windows, total_amount, total_ceiling = self.aggregate_windows(payload)
+        return self.returns_from_windows(payload, channel, windows, total_amount, total_ceiling)
+
+    def aggregate_windows(self, payload) -> tuple[list[tuple[object, Decimal]], Decimal, Decimal]:
+        valid, _, dates = self._filter(payload)
+        rows = [row for _, row in valid]
+        row_dates = [dates[index] for index, _ in valid]
+        buckets = None
+        if payload.kBuckets is not None:
+            spec = payload.kBuckets
+            start = _dt(spec.start) if spec.start else (row_dates[0] if row_dates else None)
+            end = _dt(spec.end) if spec.end else (row_dates[-1] if row_dates else None)
+            buckets = []
+            if start is not None and end is not None:
+                if start > end:
+                    raise ValueError("kBuckets has start > end")
+                buckets = _calendar_buckets(spec.unit, start, end)
+            if payload.kMode == "strict" and buckets:
+                left = bisect_left(row_dates, buckets[0].start_dt)
+                right = bisect_right(row_dates, buckets[-1].end_dt)
+                rows, row_dates = rows[left:right], row_dates[left:right]
+
+        prefix = [ZERO]
+        for row in rows:
+            prefix.append(prefix[-1] + _dec(row["remanent"]))
+        windows: list[tuple[object, Decimal]] = []
+        if buckets is not None:
+            windows = list(zip(buckets, _bucket_sums(row_dates, prefix, buckets)))
+        for period in payload.k:
+            start, end = _dt(period.start), _dt(period.end)
+            if start <= end:
+                windows.append((period, prefix[bisect_right(row_dates, end)] - prefix[bisect_left(row_dates, start)]))
+        total_amount = sum((_dec(row["amount"]) for row in rows), ZERO)
+        total_ceiling = sum((_dec(row["ceiling"]) for row in rows), ZERO)
+        return windows, total_amount, total_ceiling
+
+    def returns_from_windows(self, payload, channel, windows, total_amount, total_ceiling) -> dict:
+        plugin = self.registry.get(channel)
+        years = (60 - payload.age) if payload.age < 60 else 5
+        inflation = _dec(payload.inflation)
+        ctx = InvestmentContext(
+            principal=ZERO, years=years, annual_income=_dec(payload.wage) * Decimal("12"), inflation=inflation
+        )
+        deflator = (Decimal("1") + inflation) ** years
+        savings = []
+        for period, amount in windows:
+            window_ctx = replace(ctx, principal=amount)
+            nominal = plugin.compute_nominal_return(window_ctx)
+            real = nominal / deflator if years > 0 else nominal
+            savings.append(
+                {
+                    "start": period.start,
+                    "end": period.end,
+                    "amount": _money(amount),
+                    "profits": _money(real - amount),
+                    "taxBenefit": _money(plugin.compute_tax_benefit(window_ctx)),
+                }
+            )
+        return {
+            "channel": channel,
+            "transactionsTotalAmount": _money(total_amount),
+            "transactionsTotalCeiling": _money(total_ceiling),
+            "savingsByDates": savings,
+        }
@@ -0,0 +1,112 @@
+"""Summaries, field projections and cursor pages over engine row results.
+
+Results are ``RowStream`` lists, so a summary reads only the money columns, a
+projection builds only the kept fields, and a page builds only its own rows.
+Paged results stay in process memory until ``RESULT_CURSOR_TTL_SECONDS`` after
+they were produced, within ``RESULT_CURSOR_MAX_MB`` of estimated size. Later
+pages are read with their cursor from the same worker process.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.engine import to_money_float
+from app.services.rows import RowStream
+
+# Memory a held result keeps alive per row: its columns plus the request
+# models they reference (about 570 bytes measured for transactions:filter).
+ROW_BYTES = 600
+
+
+def summarize(result: dict[str, RowStream]) -> dict:
+    """Row count and money totals of every list in ``result``."""
+    summary = {}
+    for name, rows in result.items():
+        amount, ceiling, remanent = rows.totals()
+        summary[name] = {
+            "count": len(rows),
+            "totalAmount": to_money_float(amount),
+            "totalCeiling": to_money_float(ceiling),
+            "totalRemanent": to_money_float(remanent),
+        }
+    return summary
+
+
+def estimated_bytes(result: dict[str, RowStream]) -> int:
+    return sum(len(rows) for rows in result.values()) * ROW_BYTES
+
+
+class ResultCursors:
+    """Paged results held for ``ttl_seconds``.
+
+    The oldest are dropped once the held results are estimated above
+    ``max_bytes``; the newest result is always kept.
+    """
+
+    def __init__(self, ttl_seconds: float | None = None, max_bytes: int | None = None) -> None:
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None else float(os.getenv("RESULT_CURSOR_TTL_SECONDS", "300"))
+        )
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else int(float(os.getenv("RESULT_CURSOR_MAX_MB", "256")) * 1024 * 1024)
+        )
+        self.held_bytes = 0
+        self._results: OrderedDict[str, tuple[float, dict[str, RowStream], int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def first_page(self, result: dict[str, RowStream], page_size: int) -> dict:
+        token = secrets.token_urlsafe(16)
+        size = estimated_bytes(result)
+        with self._lock:
+            self._expire()
+            self._results[token] = (time.monotonic() + self.ttl_seconds, result, page_size, size)
+            self.held_bytes += size
+            while self.held_bytes > self.max_bytes and len(self._results) > 1:
+                self.held_bytes -= self._results.popitem(last=False)[1][3]
+        return self._page(token, result, page_size, 0)
+
+    def page(self, cursor: str) -> dict | None:
+        """The page ``cursor`` points at, or ``None`` when it is unknown or expired."""
+        token, _, offset = cursor.rpartition(".")
+        if not offset.isdigit():
+            return None
+        with self._lock:
+            self._expire()
+            entry = self._results.get(token)
+        if entry is None:
+            return None
+        _, result, page_size, _ = entry
+        return self._page(token, result, page_size, int(offset))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._results)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for token in [token for token, (expires, *_) in self._results.items() if expires <= now]:
+            self.held_bytes -= self._results.pop(token)[3]
+
+    def _page(self, token: str, result: dict[str, RowStream], page_size: int, offset: int) -> dict:
+        stop = offset + page_size
+        page: dict = {name: rows.slice(offset, stop) for name, rows in result.items()}
+        page["nextCursor"] = f"{token}.{stop}" if any(len(rows) > stop for rows in result.values()) else None
+        return page
+
+
+def apply_view(result: dict[str, RowStream], options, cursors: ResultCursors | None) -> dict:
+    """``result`` shaped by the ``fields``, ``summaryOnly`` and ``pageSize`` request options.
+
+    ``cursors`` may be ``None`` only when ``options`` cannot carry ``pageSize``.
+    """
+    if options.summaryOnly:
+        return {"summary": summarize(result)}
+    if options.fields is not None:
+        result = {name: rows.select(options.fields) for name, rows in result.items()}
+    if options.pageSize is not None:
+        return cursors.first_page(result, options.pageSize)
+    return result
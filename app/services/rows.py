@@ -0,0 +1,73 @@
+"""Result lists whose rows are built when they are read.
+
+The engine keeps large results as column data plus index arrays. A
+``RowStream`` turns a slice of those into row dicts on request, so a response
+can encode one chunk at a time, and the full list of dicts never exists at
+once. Slices, field projections and money totals are taken without building
+the rows that are not returned.
+"""
+
+from decimal import Decimal
+from typing import Callable, Iterator
+
+
+CHUNK_ROWS = 4096
+MONEY_FIELDS = ("amount", "ceiling", "remanent")
+
+
+class RowStream:
+    """``count`` rows, where ``build(start, stop)`` returns rows ``start`` to ``stop`` as dicts.
+
+    ``totals()`` returns the ``amount``, ``ceiling`` and ``remanent`` sums of
+    all rows.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        build: Callable[[int, int], list[dict]],
+        totals: Callable[[], tuple[Decimal, Decimal, Decimal]] | None = None,
+    ) -> None:
+        self.count = count
+        self.build = build
+        self.totals = totals or self._summed_totals
+
+    @classmethod
+    def from_list(cls, rows: list[dict]) -> "RowStream":
+        return cls(len(rows), lambda start, stop: rows[start:stop])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def chunks(self, size: int = CHUNK_ROWS) -> Iterator[list[dict]]:
+        for start in range(0, self.count, size):
+            yield self.build(start, min(start + size, self.count))
+
+    def __iter__(self) -> Iterator[dict]:
+        for chunk in self.chunks():
+            yield from chunk
+
+    def _summed_totals(self) -> tuple[Decimal, Decimal, Decimal]:
+        sums = [Decimal("0")] * len(MONEY_FIELDS)
+        for row in self:
+            sums = [total + Decimal(str(row[name])) for total, name in zip(sums, MONEY_FIELDS)]
+        return tuple(sums)
+
+    def slice(self, start: int, stop: int) -> "RowStream":
+        """Rows ``start`` to ``stop``; only those are ever built."""
+        start, stop = min(start, self.count), min(stop, self.count)
+        return RowStream(stop - start, lambda first, last: self.build(start + first, start + last))
+
+    def select(self, fields: list[str]) -> "RowStream":
+        """Rows holding only ``fields``, plus ``message`` where a row has one."""
+        keep = (*fields, "message")
+
+        def build(start: int, stop: int) -> list[dict]:
+            return [{name: row[name] for name in keep if name in row} for row in self.build(start, stop)]
+
+        return RowStream(self.count, build, self.totals)
+
+
+def materialize(result: dict) -> dict:
+    """``result`` with every ``RowStream`` value replaced by a plain list."""
+    return {key: list(value) if isinstance(value, RowStream) else value for key, value in result.items()}
@@ -0,0 +1,279 @@
+"""Scatter-gather of large filter and returns requests across peer instances.
+
+With ``SCATTER_PEERS`` set to the base URLs of other instances of this
+service, a request with at least ``SCATTER_MIN_ROWS`` transactions is split
+into one shard per peer. Each shard is a contiguous time range of the
+transactions sorted by date. A transaction's outcome depends only on its own
+fields and the rules active at its timestamp, so every shard is exact given
+the rules that overlap its range. Those rules are sent with their original
+starts and list order, so q tie-breaks and p overlap sums do not change. The
+``kStrict`` flag keeps strict k mode on for a shard that no k period reaches.
+The coordinator validates the rules against the full date range once. Peers
+only reject reversed rules, since a shard does not know the full range.
+
+Shards travel to ``POST /shards:filter`` as MessagePack columns of epoch
+seconds and cents. Filter shards return one adjusted remanent and message code
+per row, scattered back into input order. Returns shards only send back their
+k-window sums and valid amount and ceiling totals, which add up across shards.
+The plugin math then runs here on the summed windows.
+
+Peers only accept shards that carry ``SCATTER_SECRET`` in ``X-Scatter-Secret``.
+Each shard request is bounded by the request's remaining deadline, which is
+also forwarded as ``X-Request-Timeout-Ms``. A shard that fails (connection
+error, timeout or a non-200 answer) is retried on the next peer. Once every
+peer has failed it runs on this instance. Inputs the integer kernels cannot
+take exactly, kBuckets and simulations always run locally.
+"""
+
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import msgpack
+import numpy as np
+
+from app.core.cancellation import CancellationToken
+from app.core.profiling import stage
+from app.schemas.common import FilterShardRequest, FilterShardResponse
+from app.services import columnar
+from app.services.engine import SavingsEngine, _input_rows
+from app.services.rows import MONEY_FIELDS, RowStream
+
+SHARD_PATH = "/blackrock/challenge/v1/shards:filter"
+# How often the gather loop checks the request's cancellation token.
+GATHER_POLL_S = 0.05
+
+
+def _peers() -> list[str]:
+    return [peer.strip().rstrip("/") for peer in os.getenv("SCATTER_PEERS", "").split(",") if peer.strip()]
+
+
+def run_shard(payload: FilterShardRequest, cancel: CancellationToken | None = None) -> dict:
+    """Filter one shard: per-row results, or with ``windows`` the k-window sums and totals of the valid rows."""
+    epochs = np.asarray(payload.epochs, dtype=np.int64)
+    amount, ceiling, remanent = (np.asarray(getattr(payload, name), dtype=np.int64) for name in MONEY_FIELDS)
+    q, p, k = (
+        columnar.Periods.from_epochs(label, rules.starts, rules.ends, rules.values)
+        for label, rules in (("q", payload.q), ("p", payload.p), ("k", payload.k))
+    )
+    for periods in (q, p, k):
+        periods.validate(None, None)
+    with stage("sweep"):
+        plan = columnar.FilterPlan(q, p, k)
+        # k periods outside this shard still put the request in strict mode.
+        plan.strict_k = payload.kStrict
+        adjusted, codes = plan.apply(epochs, amount, ceiling, remanent)
+    if cancel:
+        cancel.checkpoint(len(epochs), len(epochs))
+    if not payload.windows:
+        return {"remanent": adjusted.tolist(), "codes": codes.tolist()}
+
+    with stage("aggregate"):
+        kept = codes == columnar.VALID
+        order = np.argsort(epochs[kept], kind="stable")
+        sums = columnar.window_sums(epochs[kept][order], adjusted[kept][order], k.starts, k.ends)
+    return {
+        "windowSums": sums.tolist(),
+        "totalAmount": int(amount[kept].sum()),
+        "totalCeiling": int(ceiling[kept].sum()),
+    }
+
+
+def _rules(periods: columnar.Periods, mask: np.ndarray) -> dict:
+    rules = {"starts": periods.starts[mask].tolist(), "ends": periods.ends[mask].tolist()}
+    if len(periods.values):
+        rules["values"] = periods.values[mask].tolist()
+    return rules
+
+
+def _complete(body: dict, result: dict) -> bool:
+    if body["windows"]:
+        return len(result.get("windowSums") or ()) == len(body["k"]["starts"]) and "totalAmount" in result
+    rows = len(body["epochs"])
+    return len(result.get("codes") or ()) == rows and len(result.get("remanent") or ()) == rows
+
+
+class ScatterCoordinator:
+    """Splits requests into shards, sends them to peers with retries, and merges the results."""
+
+    def __init__(self, peers: list[str] | None = None, min_rows: int | None = None) -> None:
+        self.peers = _peers() if peers is None else [peer.rstrip("/") for peer in peers]
+        self.min_rows = int(os.getenv("SCATTER_MIN_ROWS", "200000")) if min_rows is None else min_rows
+        self.timeout = float(os.getenv("SCATTER_TIMEOUT_S", "60"))
+        self.api_key = os.getenv("API_KEY", "")
+        self.secret = os.getenv("SCATTER_SECRET", "")
+        self._client = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "shards": 0, "retried": 0, "local": 0}
+        self.peer_failures = {peer: 0 for peer in self.peers}
+
+    def accepts(self, payload) -> bool:
+        return bool(self.peers) and len(payload.transactions) >= max(1, self.min_rows)
+
+    def filter_rows(
+        self,
+        engine: SavingsEngine,
+        payload,
+        cancel: CancellationToken | None = None,
+    ) -> dict[str, RowStream]:
+        """``engine.filter_temporal_rows``, scattered when the request is large enough."""
+        prepared = self._prepare(payload) if self.accepts(payload) else None
+        if prepared is None:
+            return engine.filter_temporal_rows(payload, cancel)
+        transactions = payload.transactions
+        epochs, columns, shards = prepared
+        adjusted = np.empty(len(epochs), dtype=np.int64)
+        codes = np.empty(len(epochs), dtype=np.int8)
+        results = self._gather([body for _, body, _ in shards], cancel)
+        with stage("merge"):
+            for (index, _, _), result in zip(shards, results):
+                adjusted[index] = result["remanent"]
+                codes[index] = result["codes"]
+            kept = codes == columnar.VALID
+        return {
+            "valid": _input_rows(transactions, kept, (*columns[:2], adjusted), adjusted=True),
+            "invalid": _input_rows(transactions, ~kept, tuple(columns), codes=codes),
+        }
+
+    def calculate_returns(
+        self,
+        engine: SavingsEngine,
+        payload,
+        channel: str,
+        cancel: CancellationToken | None = None,
+    ) -> dict:
+        """``engine.calculate_returns``, with the k-window sums scattered when the request is large enough."""
+        prepared = None
+        if payload.kBuckets is None and self.accepts(payload):
+            prepared = self._prepare(payload, windows=True)
+        if prepared is None:
+            return engine.calculate_returns(payload, channel=channel, cancel=cancel)
+        _, _, shards = prepared
+        results = self._gather([body for _, body, _ in shards], cancel)
+        with stage("merge"):
+            sums = np.zeros(len(payload.k), dtype=np.int64)
+            for (_, _, k_mask), result in zip(shards, results):
+                sums[k_mask] += np.asarray(result["windowSums"], dtype=np.int64)
+            money = columnar.decimal_from_cents
+            windows = [(period, money(cents)) for period, cents in zip(payload.k, sums.tolist())]
+            total_amount = money(sum(result["totalAmount"] for result in results))
+            total_ceiling = money(sum(result["totalCeiling"] for result in results))
+        return engine.returns_from_windows(payload, channel, windows, total_amount, total_ceiling, cancel)
+
+    def _prepare(self, payload, windows: bool = False):
+        """``(epochs, money columns, shards)``, or ``None`` for inputs the integer kernels cannot take exactly.
+
+        Each shard is ``(input indexes, request body, mask of the k periods sent)``.
+        """
+        transactions = payload.transactions
+        with stage("dates"):
+            try:
+                epochs = columnar.parse_epochs([tx.date for tx in transactions])
+            except ValueError:
+                return None
+            columns = [columnar.try_cents([getattr(tx, name) for tx in transactions]) for name in MONEY_FIELDS]
+            if any(column is None for column in columns) or not columnar.rules_exact(payload):
+                return None
+            if getattr(payload, "sorted", False) and (np.diff(epochs) < 0).any():
+                raise ValueError("transactions are not in date order but sorted=true was declared")
+
+        with stage("scatter"):
+            rules = {
+                "q": columnar.Periods.from_models("q", payload.q, "fixed"),
+                "p": columnar.Periods.from_models("p", payload.p, "extra"),
+                "k": columnar.Periods.from_models("k", payload.k),
+            }
+            for periods in rules.values():
+                periods.validate(int(epochs.min()), int(epochs.max()))
+            strict = payload.kMode == "strict" and len(payload.k) > 0
+            shards = []
+            for index in np.array_split(np.argsort(epochs, kind="stable"), len(self.peers)):
+                if not len(index):
+                    continue
+                low, high = int(epochs[index[0]]), int(epochs[index[-1]])
+                masks = {label: periods.overlapping(low, high) for label, periods in rules.items()}
+                body = {
+                    "epochs": epochs[index].tolist(),
+                    **{name: column[index].tolist() for name, column in zip(MONEY_FIELDS, columns)},
+                    **{label: _rules(periods, masks[label]) for label, periods in rules.items()},
+                    "kStrict": strict,
+                    "windows": windows,
+                }
+                shards.append((index, body, masks["k"]))
+        return epochs, columns, shards
+
+    def _gather(self, bodies: list[dict], cancel: CancellationToken | None) -> list[dict]:
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["shards"] += len(bodies)
+        pool = ThreadPoolExecutor(max_workers=len(bodies), thread_name_prefix="scatter")
+        try:
+            with stage("gather"):
+                futures = [pool.submit(self._send, number, body, cancel) for number, body in enumerate(bodies)]
+                pending = set(futures)
+                while pending:
+                    _, pending = wait(pending, timeout=GATHER_POLL_S, return_when=FIRST_COMPLETED)
+                    if cancel:
+                        cancel.checkpoint(len(futures) - len(pending), len(futures))
+                return [future.result() for future in futures]
+        finally:
+            # Shard posts still in flight end at the request deadline; do not wait for them here.
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _send(self, number: int, body: dict, cancel: CancellationToken | None = None) -> dict:
+        """Runs shard ``number`` on its peer, then on each other peer in turn, then locally."""
+        content = msgpack.packb(body, use_bin_type=True)
+        for attempt in range(len(self.peers)):
+            if cancel:
+                cancel.check()
+            peer = self.peers[(number + attempt) % len(self.peers)]
+            result = self._post(peer, content, cancel.remaining() if cancel else None)
+            if result is not None and _complete(body, result):
+                if attempt:
+                    with self._lock:
+                        self.stats["retried"] += 1
+                return result
+            with self._lock:
+                self.peer_failures[peer] += 1
+        with self._lock:
+            self.stats["local"] += 1
+        return run_shard(FilterShardRequest.model_validate(body), cancel)
+
+    def _post(self, peer: str, content: bytes, remaining: float | None = None) -> dict | None:
+        import httpx  # only instances with peers configured need the HTTP client
+
+        headers = {"content-type": "application/msgpack", "accept": "application/msgpack"}
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+        if self.secret:
+            headers["x-scatter-secret"] = self.secret
+        timeout = self.timeout
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+            headers["x-request-timeout-ms"] = str(max(1, int(remaining * 1000)))
+        try:
+            response = self._http_client().post(peer + SHARD_PATH, content=content, headers=headers, timeout=timeout)
+            if response.status_code != 200:
+                return None
+            result = FilterShardResponse.model_validate(msgpack.unpackb(response.content, raw=False))
+        except (httpx.HTTPError, ValueError):
+            return None
+        return result.model_dump(exclude_none=True)
+
+    def _http_client(self):
+        import httpx
+
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout)
+            return self._client
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "peers": len(self.peers), "peerFailures": dict(self.peer_failures)}
@@ -0,0 +1,84 @@
+"""Monte Carlo distributions of ``returns:*`` profits.
+
+Each plugin declares a ``ReturnDistribution`` for its yearly returns. A seeded
+numpy generator draws ``paths x years`` yearly log-returns, one chunk of
+``SIMULATION_CHUNK_PATHS`` paths at a time, and sums each path into its total
+growth over the investment horizon. Memory stays at one chunk plus one float
+per path.
+
+Every k window is invested in the same market for the same years, so a path
+scales all windows by the same growth factor ``g``. A window's profit on that
+path is ``amount * g / deflator - amount``, increasing and affine in ``g``.
+Its mean and percentiles are therefore those of ``g`` mapped through the same
+formula. The ``paths x windows`` matrix is never built, and hundreds of
+windows cost no more than one. The amounts, deflator and tax benefits are the
+deterministic ``returns:*`` ones. Draws do not depend on the chunk size, so a
+seed always reproduces the same result.
+"""
+
+import os
+import secrets
+
+import numpy as np
+
+from app.core.cancellation import CancellationToken
+from app.core.profiling import stage
+from app.plugins.base import ReturnDistribution
+from app.services.engine import SavingsEngine
+from app.services.sweep import _round_cents
+
+
+def _chunk_paths() -> int:
+    return int(os.getenv("SIMULATION_CHUNK_PATHS", "16384"))
+
+
+def simulate_growth(
+    distribution: ReturnDistribution,
+    paths: int,
+    years: int,
+    rng: np.random.Generator,
+    cancel: CancellationToken | None = None,
+) -> np.ndarray:
+    """Total growth factor over ``years`` for each of ``paths`` simulated paths."""
+    growth = np.empty(paths)
+    chunk = _chunk_paths()
+    for start in range(0, paths, chunk):
+        if cancel:
+            cancel.checkpoint(start, paths)
+        stop = min(start + chunk, paths)
+        growth[start:stop] = np.exp(distribution.log_growth(rng, (stop - start, years)).sum(axis=1))
+    return growth
+
+
+def _label(percentile: float) -> str:
+    return f"p{percentile:g}"
+
+
+def simulate_returns(engine: SavingsEngine, payload, channel: str, cancel: CancellationToken | None = None) -> dict:
+    """``calculate_returns`` plus a simulated ``profitsDistribution`` per window."""
+    windows, total_amount, total_ceiling = engine.aggregate_windows(payload, cancel)
+    result = engine.returns_from_windows(payload, channel, windows, total_amount, total_ceiling, cancel)
+    options = payload.simulation
+    distribution = engine.registry.get(channel).return_distribution()
+    years = (60 - payload.age) if payload.age < 60 else 5
+    seed = options.seed if options.seed is not None else secrets.randbits(63)
+
+    with stage("simulate"):
+        growth = simulate_growth(distribution, options.paths, years, np.random.default_rng(seed), cancel)
+        deflator = (1 + payload.inflation) ** years
+        mean_factor = growth.mean() / deflator - 1
+        band_factors = np.percentile(growth, options.percentiles) / deflator - 1
+        amounts = np.array([float(amount) for _, amount in windows])
+        means = _round_cents(amounts * mean_factor).tolist()
+        bands = _round_cents(amounts[:, None] * band_factors[None, :]).tolist()
+
+    labels = [_label(percentile) for percentile in options.percentiles]
+    for row, mean, band in zip(result["savingsByDates"], means, bands):
+        row["profitsDistribution"] = {"mean": mean, "percentiles": dict(zip(labels, band))}
+    result["simulation"] = {
+        "paths": options.paths,
+        "seed": seed,
+        "years": years,
+        "distribution": {"kind": distribution.kind, "mean": distribution.mean, "volatility": distribution.volatility},
+    }
+    return result
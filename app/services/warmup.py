@@ -0,0 +1,138 @@
+"""Start-up warm-up for the engine routes.
+
+Before a new worker takes traffic, it runs one small request per engine route.
+Each request goes through three steps:
+- the route's request schema validates it;
+- the shared engine runs it;
+- the response schema validates and encodes the result.
+
+First-call costs are paid here rather than by the first client. These include
+the numpy kernels, the Decimal quantize paths, the date caches and the pydantic
+serializers.
+"""
+
+import os
+import time
+from typing import Callable
+
+from pydantic import BaseModel
+
+from app.schemas.common import (
+    ParseRequest,
+    ParseResponse,
+    PipelineRequest,
+    PipelineResponse,
+    ReturnsRequest,
+    ReturnsResponse,
+    ScenarioSweepRequest,
+    ScenarioSweepResponse,
+    TemporalFilterRequest,
+    TemporalFilterResponse,
+    TransactionValidationRequest,
+    TransactionValidationResponse,
+)
+from app.services.engine import SavingsEngine
+from app.services.pipeline import run_pipeline
+from app.services.rows import materialize
+from app.services.sweep import sweep_returns
+
+
+WARMUP_ROWS = 64
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("STARTUP_WARMUP", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _transactions() -> list[dict]:
+    rows = []
+    for index in range(WARMUP_ROWS):
+        cents = 1999 + index * 7919 % 250000
+        ceiling = -(-cents // 10000) * 10000
+        rows.append(
+            {
+                "date": f"2023-01-{1 + index * 11 // 24:02d} {index * 11 % 24:02d}:00:00",
+                "amount": cents / 100,
+                "ceiling": ceiling / 100,
+                "remanent": (ceiling - cents) / 100,
+            }
+        )
+    return rows
+
+
+def _payloads() -> dict[str, dict]:
+    transactions = _transactions()
+    expenses = [{"date": row["date"], "amount": row["amount"]} for row in transactions]
+    periods = {
+        "q": [{"fixed": 0, "start": "2023-01-03 00:00:00", "end": "2023-01-05 23:59:59"}],
+        "p": [{"extra": 25, "start": "2023-01-04 00:00:00", "end": "2023-01-10 23:59:59"}],
+        "k": [
+            {"start": "2023-01-01 00:00:00", "end": "2023-01-29 00:00:00"},
+            {"start": "2023-01-10 00:00:00", "end": "2023-01-20 23:59:59"},
+        ],
+    }
+    returns = {**periods, "age": 29, "wage": 50000, "inflation": 0.055, "transactions": transactions}
+    return {
+        "transactions:parse": {"expenses": expenses},
+        "transactions:validator": {"wage": 50000, "transactions": transactions},
+        "transactions:filter": {**periods, "transactions": transactions},
+        "returns:nps": returns,
+        "returns:index": returns,
+        "returns:sweep": {
+            **periods,
+            "wage": 50000,
+            "ages": [29, 45],
+            "inflations": [0.055],
+            "channels": ["nps", "index"],
+            "transactions": transactions,
+        },
+        "pipeline": {
+            **periods,
+            "wage": 50000,
+            "age": 29,
+            "inflation": 0.055,
+            "expenses": expenses,
+            "outputs": ["parse", "validator", "filter", "returns"],
+        },
+    }
+
+
+Operation = Callable[[SavingsEngine, BaseModel], dict]
+
+WARMUP_ROUTES: dict[str, tuple[type[BaseModel], type[BaseModel], Operation]] = {
+    "transactions:parse": (ParseRequest, ParseResponse, lambda engine, payload: engine.parse_transactions(payload)),
+    "transactions:validator": (
+        TransactionValidationRequest,
+        TransactionValidationResponse,
+        lambda engine, payload: materialize(engine.validate_transaction_rows(payload)),
+    ),
+    "transactions:filter": (
+        TemporalFilterRequest,
+        TemporalFilterResponse,
+        lambda engine, payload: materialize(engine.filter_temporal_rows(payload)),
+    ),
+    "returns:nps": (
+        ReturnsRequest,
+        ReturnsResponse,
+        lambda engine, payload: engine.calculate_returns(payload, channel="nps"),
+    ),
+    "returns:index": (
+        ReturnsRequest,
+        ReturnsResponse,
+        lambda engine, payload: engine.calculate_returns(payload, channel="index"),
+    ),
+    "returns:sweep": (ScenarioSweepRequest, ScenarioSweepResponse, sweep_returns),
+    "pipeline": (PipelineRequest, PipelineResponse, run_pipeline),
+}
+
+
+def warm_up(engine: SavingsEngine) -> dict[str, float]:
+    """Runs every ``WARMUP_ROUTES`` entry once; returns milliseconds per endpoint."""
+    timings = {}
+    for endpoint, payload in _payloads().items():
+        request_model, response_model, operation = WARMUP_ROUTES[endpoint]
+        started = time.perf_counter()
+        result = operation(engine, request_model.model_validate(payload))
+        response_model.model_validate(result).model_dump_json(by_alias=True)
+        timings[endpoint] = round((time.perf_counter() - started) * 1000, 3)
+    return timings
@@ -0,0 +1,123 @@
+"""Benchmark suite CLI.
+
+    python -m benchmarks run --sizes 1000,100000 --output current.json
+    python -m benchmarks run --sizes 1000,100000,1000000 --only engine.filter
+    python -m benchmarks compare benchmarks/baseline.json current.json --threshold 0.25
+    python -m benchmarks transport --rows 100000
+    python -m benchmarks fuzz --cases 500 --seed 1
+
+``compare`` exits with status 1 when any shared case regressed beyond the threshold,
+and ``fuzz`` when any optimized path disagreed with the reference engine.
+"""
+
+import argparse
+import json
+import platform
+import sys
+
+from benchmarks.fuzz import run_fuzz
+from benchmarks.suite import compare, run_suite
+from benchmarks.transport import run_transport
+
+
+BASELINE_PATH = "benchmarks/baseline.json"
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)["results"]
+
+
+def _print_comparison(rows: list[dict]) -> bool:
+    regressed = False
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else "ok"
+        regressed = regressed or row["regressed"]
+        print(
+            f"{flag:<10} {row['case']}: {row['baselineMs']} -> {row['currentMs']} ms "
+            f"(time x{row['timeRatio']}, memory x{row['memoryRatio']})"
+        )
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="SavingsEngine benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite")
+    run.add_argument("--sizes", default="1000,100000,1000000", help="comma-separated row counts")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--only", default="", help="comma-separated case name prefixes")
+    run.add_argument("--output", default="", help="write results to this JSON file")
+    run.add_argument("--compare", default="", help="baseline file to compare against after the run")
+    run.add_argument("--threshold", type=float, default=0.25)
+
+    cmp = commands.add_parser("compare", help="compare two result files")
+    cmp.add_argument("baseline", nargs="?", default=BASELINE_PATH)
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.25, help="allowed relative growth, 0.25 = +25%%")
+
+    transport = commands.add_parser("transport", help="JSON vs MessagePack encode/decode time and bytes")
+    transport.add_argument("--rows", type=int, default=100000)
+    transport.add_argument("--repeat", type=int, default=3)
+
+    fuzz = commands.add_parser("fuzz", help="compare the optimized engine paths with the reference engine")
+    fuzz.add_argument("--cases", type=int, default=200)
+    fuzz.add_argument("--seed", type=int, default=0)
+    fuzz.add_argument("--max-rows", type=int, default=2000, help="largest generated transaction list")
+    fuzz.add_argument("--only", default="", help="comma-separated path names")
+    fuzz.add_argument("--replay", default="", help="rerun one case by its 'seed:number' id")
+    fuzz.add_argument("--dump", default="", help="write failing cases and their payloads to this JSON file")
+
+    args = parser.parse_args()
+
+    if args.command == "fuzz":
+        selected = [item for item in args.only.split(",") if item] or None
+        report = run_fuzz(args.cases, args.seed, args.max_rows, selected, args.replay or None)
+        print(f"{'path':<10} {'cases':>6} {'errors':>6} {'skipped':>7} {'mismatches':>10} "
+              f"{'reference ms':>13} {'optimized ms':>13} {'speed-up':>8}")
+        for name, row in report["paths"].items():
+            print(
+                f"{name:<10} {row['cases']:>6} {row['errors']:>6} {row['skipped']:>7} {row['mismatches']:>10} "
+                f"{row['referenceMs']:>13} {row['optimizedMs']:>13} {row['speedup'] or '-':>8}"
+            )
+        for failure in report["failures"]:
+            print(f"MISMATCH {failure['path']} case {failure['case']}: {failure['difference']}")
+        if args.dump and report["failures"]:
+            with open(args.dump, "w", encoding="utf-8") as handle:
+                json.dump(report["failures"], handle, indent=2)
+        return 1 if report["failures"] else 0
+
+    if args.command == "transport":
+        for row in run_transport(args.rows, args.repeat):
+            print(
+                f"{row['format']:<16} request {row['requestBytes']:>11,} B  response {row['responseBytes']:>11,} B  "
+                f"decode {row['decodeMs']:>9} ms  encode {row['encodeMs']:>9} ms"
+            )
+        return 0
+
+    if args.command == "compare":
+        return 1 if _print_comparison(compare(_load(args.baseline), _load(args.current), args.threshold)) else 0
+
+    sizes = [int(item) for item in args.sizes.split(",") if item]
+    selected = [item for item in args.only.split(",") if item] or None
+    results = run_suite(sizes, args.repeat, selected)
+    if args.output:
+        document = {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "sizes": sizes,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(document, handle, indent=2, sort_keys=True)
+    if args.compare:
+        return 1 if _print_comparison(compare(_load(args.compare), results, args.threshold)) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
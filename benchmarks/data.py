@@ -0,0 +1,73 @@
+"""Deterministic data generators shared by the benchmark suites.
+
+Every generator takes an explicit ``random.Random`` so a given seed always
+produces byte-identical payloads across runs and machines.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+START = datetime(2023, 1, 1)
+STEP_SECONDS = 37
+
+
+def date_at(offset_seconds: int) -> str:
+    return (START + timedelta(seconds=offset_seconds)).strftime(TIMESTAMP_FORMAT)
+
+
+def expenses(rows: int, rng: random.Random) -> list[dict]:
+    return [{"date": date_at(index * STEP_SECONDS), "amount": round(rng.uniform(1, 5000), 2)} for index in range(rows)]
+
+
+def transactions(rows: int, rng: random.Random, shuffle: bool = False) -> list[dict]:
+    rows_out = []
+    for index in range(rows):
+        amount = round(rng.uniform(1, 5000), 2)
+        ceiling = math.ceil(amount / 100) * 100
+        rows_out.append(
+            {
+                "date": date_at(index * STEP_SECONDS),
+                "amount": amount,
+                "ceiling": ceiling,
+                "remanent": round(ceiling - amount, 2),
+            }
+        )
+    if shuffle:
+        rng.shuffle(rows_out)
+    return rows_out
+
+
+def periods(count: int, rows: int, rng: random.Random, value_key: str | None = None, max_width: int | None = None) -> list[dict]:
+    """Random periods inside the generated transaction span.
+
+    ``max_width`` bounds the period length in seconds; ``None`` allows periods
+    up to the full span, which produces heavy overlap.
+    """
+    span = max(0, rows - 1) * STEP_SECONDS
+    out = []
+    for _ in range(count):
+        start = rng.randint(0, span)
+        limit = span if max_width is None else min(span, start + max_width)
+        end = rng.randint(start, limit)
+        period = {"start": date_at(start), "end": date_at(end)}
+        if value_key:
+            period[value_key] = round(rng.uniform(0, 100), 2)
+        out.append(period)
+    return out
+
+
+def rule_set(density: str, rows: int, rng: random.Random) -> dict:
+    """``sparse``: a handful of narrow rules. ``dense``: one rule per ~100 rows, wide and overlapping."""
+    if density == "sparse":
+        count, width = 3, 30 * 24 * 3600
+    elif density == "dense":
+        count, width = max(3, rows // 100), None
+    else:
+        raise ValueError(f"unknown rule density '{density}'")
+    return {
+        "q": periods(count, rows, rng, "fixed", width),
+        "p": periods(count, rows, rng, "extra", width),
+        "k": periods(count, rows, rng, None, width),
+    }
@@ -0,0 +1,514 @@
+"""Differential fuzzing of the optimized engine paths against ``ReferenceEngine``.
+
+    python -m benchmarks fuzz --cases 500 --seed 1
+    python -m benchmarks fuzz --cases 20 --max-rows 200000 --only filter,returns
+    python -m benchmarks fuzz --replay 1:137 --dump failing.json
+
+Case ``n`` of a run with seed ``s`` is drawn from ``random.Random("s:n")``, so
+``--replay s:n`` regenerates exactly that case. Cases are adversarial rather
+than realistic:
+- rule boundaries on, or one second off, transaction dates;
+- nested, touching and equal-start rules;
+- zero remanents, zero and near-limit amounts, and corrupted rows;
+- duplicate dates, unsorted input with ``sorted`` declared, and out-of-bounds
+  or reversed rules;
+- kBuckets;
+- sub-cent values, float-noise remanents and unpadded dates, which send the
+  fast paths to their Decimal fallbacks.
+
+The stored path writes a case's valid rows to a temporary sqlite customer
+store and compares ``customers.stored_returns`` with the reference returns
+over the same rows.
+
+Both sides get the same validated payload. Their results must be equal, or
+both must raise ``ValueError`` with the same message. The report gives each
+path's case count, mismatches and time on each side; the time ratio is the
+speed-up of the optimized path.
+"""
+
+import csv
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Callable
+
+import numpy as np
+
+from app.repositories.sqlite_repo import SqliteTransactionRepository
+from app.schemas.common import (
+    ParseRequest,
+    PipelineRequest,
+    ReturnsRequest,
+    ScenarioSweepRequest,
+    StoredReturnsRequest,
+    TemporalFilterRequest,
+    TransactionValidationRequest,
+)
+from app.services import columnar, customers, ingest
+from app.services.engine import SavingsEngine
+from app.services.pipeline import run_pipeline
+from app.services.reference import ReferenceEngine
+from app.services.sweep import sweep_returns
+from benchmarks import data
+
+
+CHANNELS = ("nps", "index")
+STEPS = (1, 37, 3600, 86400)
+BUCKET_UNITS = ("day", "week", "month", "quarter", "year")
+
+
+# --- case generation ---------------------------------------------------------------------------
+
+
+def _size(rng: random.Random, max_rows: int) -> int:
+    roll = rng.random()
+    if roll < 0.45:
+        return min(max_rows, rng.randint(0, 8))
+    if roll < 0.8:
+        return min(max_rows, rng.randint(9, 200))
+    return rng.randint(0, max_rows)
+
+
+def _amount(rng: random.Random, sub_cent: bool) -> float:
+    roll = rng.random()
+    if roll < 0.2:
+        return float(rng.randint(0, 40) * 100)  # whole hundreds: zero remanent
+    if roll < 0.25:
+        return round(rng.uniform(499_900, 499_999.99), 2)
+    if roll < 0.3:
+        return round(rng.uniform(0, 1), 2)
+    if sub_cent and roll < 0.45:
+        return round(rng.uniform(0, 5000), 3)
+    return round(rng.uniform(0, 5000), 2)
+
+
+def _transaction(rng: random.Random, date: str, amount: float, noisy: bool = False) -> dict:
+    ceiling = math.ceil(Decimal(str(amount)) / 100) * 100
+    # A noisy remanent is float subtraction, e.g. 0.30000000000000426, as a client computing it in floats sends.
+    remanent = ceiling - amount if noisy else float(ceiling - Decimal(str(amount)))
+    roll = rng.random()
+    if roll < 0.02:
+        remanent = round(remanent + 0.01, 2)
+    elif roll < 0.04:
+        ceiling += 50
+    elif roll < 0.06 and ceiling >= 100:
+        ceiling -= 100
+        remanent = 0.0
+    return {"date": date, "amount": amount, "ceiling": float(ceiling), "remanent": remanent}
+
+
+def _loose(date: str) -> str:
+    """The same instant without zero padding, e.g. ``2023-1-5 3:4:5``."""
+    when = datetime.strptime(date, data.TIMESTAMP_FORMAT)
+    return f"{when.year}-{when.month}-{when.day} {when.hour}:{when.minute}:{when.second}"
+
+
+def _boundary(rng: random.Random, offsets: list[int], span: int) -> int:
+    roll = rng.random()
+    if not offsets or roll < 0.3:
+        return rng.randint(0, span)
+    if roll < 0.45:
+        return rng.choice((0, span))
+    if roll < 0.6:
+        return min(span, max(0, rng.choice(offsets) + rng.choice((-1, 1))))
+    return rng.choice(offsets)  # exactly on a transaction
+
+
+def _periods(rng: random.Random, offsets: list[int], span: int, value_key: str | None, sub_cent: bool) -> list[dict]:
+    bounds: list[tuple[int, int]] = []
+    for _ in range(rng.choice((0, 0, 1, 2, 3, 5, 12))):
+        shape = rng.random()
+        if bounds and shape < 0.2:
+            start, end = rng.choice(bounds)  # equal start: list order decides
+            end = rng.randint(start, span)
+        elif bounds and shape < 0.35:
+            outer = rng.choice(bounds)
+            start = rng.randint(*outer)
+            end = rng.randint(start, outer[1])  # nested
+        elif bounds and shape < 0.45:
+            start = rng.choice(bounds)[1]
+            end = rng.randint(start, span)  # touching
+        else:
+            start, end = sorted((_boundary(rng, offsets, span), _boundary(rng, offsets, span)))
+        bounds.append((start, end))
+
+    periods = []
+    for start, end in bounds:
+        period = {"start": data.date_at(start), "end": data.date_at(end)}
+        if value_key:
+            roll = rng.random()
+            if roll < 0.25:
+                period[value_key] = 0.0
+            elif sub_cent and roll < 0.4:
+                period[value_key] = round(rng.uniform(0, 500), 3)
+            else:
+                period[value_key] = round(rng.uniform(0, 500), 2)
+        periods.append(period)
+    return periods
+
+
+def _bad_rule(rng: random.Random, rules: dict, span: int) -> None:
+    label = rng.choice(("q", "p", "k"))
+    period = {"start": data.date_at(span), "end": data.date_at(0)}  # start > end once span > 0
+    if rng.random() < 0.5:
+        period = {"start": data.date_at(0), "end": data.date_at(span + rng.randint(1, 3600))}
+    if label != "k":
+        period["fixed" if label == "q" else "extra"] = 1.0
+    rules[label].insert(rng.randint(0, len(rules[label])), period)
+
+
+def case(rng: random.Random, max_rows: int) -> dict:
+    """One adversarial raw payload carrying the fields of every request type."""
+    rows = _size(rng, max_rows)
+    step = rng.choice(STEPS)
+    offsets = [index * step for index in range(rows)]
+    if rows > 1 and rng.random() < 0.15:
+        for _ in range(rng.randint(1, 3)):
+            offsets[rng.randrange(rows)] = offsets[rng.randrange(rows)]
+    span = max(offsets, default=0)
+    inexact = rng.choice(("amounts", "dates", "rules", "noise")) if rng.random() < 0.15 else ""
+
+    dates = [data.date_at(offset) for offset in offsets]
+    if inexact == "dates" and rows:
+        for index in rng.sample(range(rows), k=min(rows, 3)):
+            dates[index] = _loose(dates[index])
+    transactions = [
+        _transaction(rng, date, _amount(rng, inexact == "amounts"), inexact == "noise") for date in dates
+    ]
+    declared_sorted = rng.random() < 0.3
+    if rng.random() < 0.6:
+        rng.shuffle(transactions)
+
+    rules = {
+        "q": _periods(rng, offsets, span, "fixed", inexact == "rules"),
+        "p": _periods(rng, offsets, span, "extra", inexact == "rules"),
+        "k": _periods(rng, offsets, span, None, False),
+    }
+    if rows and rng.random() < 0.05:
+        _bad_rule(rng, rules, span)
+    if inexact == "rules" and rules["k"]:
+        rules["k"][0]["start"] = _loose(rules["k"][0]["start"])
+
+    buckets = None
+    if rng.random() < 0.25:
+        buckets = {"unit": rng.choice(BUCKET_UNITS)}
+        if rng.random() < 0.5:
+            buckets["start"] = data.date_at(_boundary(rng, offsets, span))
+        if rng.random() < 0.5:
+            buckets["end"] = data.date_at(_boundary(rng, offsets, span))
+
+    max_invest = rng.choice((None, 0, 75, round(rng.uniform(0, 1000), 2)))
+    if inexact == "noise" and transactions:
+        # The cap a noisy remanent rounds to: only the remanent's exact value decides which side it falls on.
+        max_invest = round(rng.choice(transactions)["remanent"], 2)
+
+    return {
+        **rules,
+        "kMode": rng.choice(("grouping", "strict")),
+        "kBuckets": buckets,
+        "sorted": declared_sorted,
+        "transactions": transactions,
+        "expenses": [{"date": tx["date"], "amount": tx["amount"]} for tx in transactions],
+        "wage": rng.choice((0, 50, *(round(rng.uniform(1000, 200000), 2) for _ in range(4)))),
+        "maxInvest": max_invest,
+        "age": rng.randint(0, 90),
+        "inflation": rng.choice((0, 0.055, round(rng.uniform(0, 0.2), 4))),
+        "inexact": inexact,
+    }
+
+
+# --- paths: (optimized, reference) over the same payload -----------------------------------------
+
+
+def _rules(raw: dict) -> dict:
+    return {key: raw[key] for key in ("q", "p", "k", "kMode")}
+
+
+def _parse(raw: dict):
+    payload = ParseRequest.model_validate({"expenses": raw["expenses"]})
+    return lambda engine: engine.parse_transactions(payload), lambda ref: ref.parse_transactions(payload)
+
+
+def _validator(raw: dict):
+    payload = TransactionValidationRequest.model_validate(
+        {key: raw[key] for key in ("wage", "maxInvest", "transactions")}
+    )
+    return lambda engine: engine.validate_transactions(payload), lambda ref: ref.validate_transactions(payload)
+
+
+def _filter(raw: dict):
+    payload = TemporalFilterRequest.model_validate(
+        {**_rules(raw), "sorted": raw["sorted"], "transactions": raw["transactions"]}
+    )
+    return (
+        lambda engine: engine.filter_temporal_constraints(payload),
+        lambda ref: ref.filter_temporal_constraints(payload),
+    )
+
+
+def _returns_payload(raw: dict) -> dict:
+    """Returns requests take k or kBuckets, not both; kBuckets wins when the case has one."""
+    keys = ("age", "wage", "inflation", "kBuckets", "sorted", "transactions")
+    payload = {**_rules(raw), **{key: raw[key] for key in keys}}
+    if raw["kBuckets"] is not None:
+        payload["k"] = []
+    return payload
+
+
+def _returns(raw: dict):
+    payload = ReturnsRequest.model_validate(_returns_payload(raw))
+    return (
+        lambda engine: [engine.calculate_returns(payload, channel) for channel in CHANNELS],
+        lambda ref: [ref.calculate_returns(payload, channel) for channel in CHANNELS],
+    )
+
+
+def _reference_sweep(ref: ReferenceEngine, payload) -> dict:
+    windows, total_amount, total_ceiling = ref.aggregate_windows(payload)
+    cube = [
+        [
+            [
+                ref.returns_from_windows(
+                    SimpleNamespace(age=age, wage=payload.wage, inflation=inflation),
+                    channel,
+                    windows,
+                    total_amount,
+                    total_ceiling,
+                )
+                for inflation in payload.inflations
+            ]
+            for age in payload.ages
+        ]
+        for channel in payload.channels
+    ]
+    first = [grid[0][0] for grid in cube]
+    return {
+        "channels": list(payload.channels),
+        "ages": list(payload.ages),
+        "inflations": list(payload.inflations),
+        "rates": {channel: float(ref.registry.get(channel).annual_rate) for channel in payload.channels},
+        "transactionsTotalAmount": first[0]["transactionsTotalAmount"],
+        "transactionsTotalCeiling": first[0]["transactionsTotalCeiling"],
+        "windows": [
+            {key: row[key] for key in ("start", "end", "amount")} for row in first[0]["savingsByDates"]
+        ],
+        "profits": [
+            [[[row["profits"] for row in cell["savingsByDates"]] for cell in ages] for ages in grid] for grid in cube
+        ],
+        "taxBenefit": [[row["taxBenefit"] for row in result["savingsByDates"]] for result in first],
+    }
+
+
+def _sweep(raw: dict):
+    returns = _returns_payload(raw)
+    ages = sorted({raw["age"], (raw["age"] * 7 + 13) % 91, 60})
+    inflations = sorted({raw["inflation"], 0, 0.12})
+    payload = ScenarioSweepRequest.model_validate(
+        {key: value for key, value in returns.items() if key not in ("age", "inflation")}
+        | {"ages": ages, "inflations": inflations, "channels": list(CHANNELS)}
+    )
+    return lambda engine: sweep_returns(engine, payload), lambda ref: _reference_sweep(ref, payload)
+
+
+def _reference_pipeline(ref: ReferenceEngine, payload) -> dict:
+    parsed = ref.parse_transactions(payload)
+    validated = ref.validate_transactions(
+        TransactionValidationRequest(
+            wage=payload.wage, maxInvest=payload.maxInvest, transactions=parsed["transactions"]
+        )
+    )
+    rules = {"q": payload.q, "p": payload.p, "k": payload.k, "kMode": payload.kMode}
+    filtered = ref.filter_temporal_constraints(TemporalFilterRequest(**rules, transactions=validated["valid"]))
+    returns_payload = ReturnsRequest(
+        age=payload.age, wage=payload.wage, inflation=payload.inflation, **rules, transactions=validated["valid"]
+    )
+    returns = [ref.calculate_returns(returns_payload, channel) for channel in payload.channels]
+    return {"parse": parsed, "validator": validated, "filter": filtered, "returns": returns}
+
+
+def _pipeline(raw: dict):
+    keys = ("expenses", "wage", "maxInvest", "age", "inflation")
+    payload = PipelineRequest.model_validate(
+        {**_rules(raw), **{key: raw[key] for key in keys}, "outputs": ["parse", "validator", "filter", "returns"]}
+    )
+    return lambda engine: run_pipeline(engine, payload), lambda ref: _reference_pipeline(ref, payload)
+
+
+def _ingest_filter(raw: dict, payload, directory: str) -> list[dict]:
+    source, target = os.path.join(directory, "input.csv"), os.path.join(directory, "output.csv")
+    with open(source, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=["date", "amount", "ceiling", "remanent"])
+        writer.writeheader()
+        writer.writerows(raw["transactions"])
+    ingest.ingest_filter(source, target, payload)
+    with open(target, encoding="utf-8", newline="") as handle:
+        return [
+            {
+                "date": row["date"],
+                "remanent": float(row["remanent"]),
+                "valid": row["valid"] == "true",
+                "message": row["message"] or None,
+            }
+            for row in csv.DictReader(handle)
+        ]
+
+
+def _reference_ingest_filter(ref: ReferenceEngine, payload) -> list[dict]:
+    valid, invalid, dates = ref._filter(payload)
+    rows: list[dict | None] = [None] * len(dates)
+    for index, row in valid:
+        rows[index] = {"date": row["date"], "remanent": row["remanent"], "valid": True, "message": None}
+    for index, row in invalid:
+        rows[index] = {"date": row["date"], "remanent": row["remanent"], "valid": False, "message": row["message"]}
+    return rows
+
+
+def _ingest(raw: dict):
+    """File-to-file filter over CSV. Ingest only takes canonical dates and cents, so inexact cases are skipped."""
+    if raw["inexact"]:
+        return None
+    payload = TemporalFilterRequest.model_validate({**_rules(raw), "transactions": raw["transactions"]})
+
+    def optimized(engine: SavingsEngine) -> list[dict]:
+        with tempfile.TemporaryDirectory() as directory:
+            return _ingest_filter(raw, payload, directory)
+
+    return optimized, lambda ref: _reference_ingest_filter(ref, payload)
+
+
+def _stored_rows(raw: dict) -> list[tuple[int, int, int, int]]:
+    """The case's valid transactions as stored cent rows, the first one kept for each date."""
+    transactions = raw["transactions"]
+    epochs = columnar.parse_epochs([tx["date"] for tx in transactions])
+    amount, ceiling, remanent = (
+        columnar.to_cents([tx[name] for tx in transactions], name) for name in ("amount", "ceiling", "remanent")
+    )
+    _, first = np.unique(epochs, return_index=True)
+    kept = np.zeros(len(epochs), dtype=bool)
+    kept[first] = True
+    kept &= columnar.validation_codes(amount, ceiling, remanent) == 0
+    return sorted(zip(epochs[kept].tolist(), amount[kept].tolist(), ceiling[kept].tolist(), remanent[kept].tolist()))
+
+
+def _stored(raw: dict):
+    """Returns for a customer stored in a temporary sqlite file; the store only takes canonical dates and cents."""
+    if raw["inexact"] in ("amounts", "dates", "noise"):
+        return None
+    rows = _stored_rows(raw)
+    if not rows:
+        return None  # an unknown customer is a 404, not a result
+    keys = ("age", "wage", "inflation")
+    payload = StoredReturnsRequest.model_validate({**_rules(raw), **{key: raw[key] for key in keys}})
+    stored = [
+        {"date": date, "amount": amount, "ceiling": ceiling, "remanent": remanent}
+        for date, amount, ceiling, remanent in customers._columns(rows)
+    ]
+    reference = ReturnsRequest.model_validate({**payload.model_dump(), "sorted": True, "transactions": stored})
+
+    def optimized(engine: SavingsEngine) -> list[dict]:
+        with tempfile.TemporaryDirectory() as directory:
+            store = SqliteTransactionRepository(os.path.join(directory, "fuzz.db"))
+            store.initialize()
+            store.upsert_transactions("fuzz", rows)
+            summary = store.get_summary("fuzz")
+            return [customers.stored_returns(engine, store, "fuzz", summary, payload, channel) for channel in CHANNELS]
+
+    return optimized, lambda ref: [ref.calculate_returns(reference, channel) for channel in CHANNELS]
+
+
+PATHS: dict[str, Callable] = {
+    "parse": _parse,
+    "validator": _validator,
+    "filter": _filter,
+    "returns": _returns,
+    "sweep": _sweep,
+    "pipeline": _pipeline,
+    "ingest": _ingest,
+    "stored": _stored,
+}
+
+
+# --- comparison ----------------------------------------------------------------------------------
+
+
+def _outcome(run: Callable, target) -> tuple[tuple[str, object], float]:
+    started = time.perf_counter()
+    try:
+        outcome = ("result", run(target))
+    except ValueError as exc:
+        outcome = ("error", str(exc))
+    return outcome, time.perf_counter() - started
+
+
+def first_difference(actual, expected, where: str = "") -> str | None:
+    """Location and values of the first difference between two results, or ``None``."""
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        if list(actual) != list(expected):
+            return f"{where or 'result'} keys: {list(actual)} != {list(expected)}"
+        for key in actual:
+            found = first_difference(actual[key], expected[key], f"{where}.{key}" if where else str(key))
+            if found:
+                return found
+        return None
+    if isinstance(actual, (list, tuple)) and isinstance(expected, (list, tuple)):
+        if len(actual) != len(expected):
+            return f"{where or 'result'} length: {len(actual)} != {len(expected)}"
+        for index, (left, right) in enumerate(zip(actual, expected)):
+            found = first_difference(left, right, f"{where}[{index}]")
+            if found:
+                return found
+        return None
+    if actual != expected:
+        return f"{where or 'result'}: {actual!r} != {expected!r}"
+    return None
+
+
+def run_fuzz(
+    cases: int,
+    seed: int = 0,
+    max_rows: int = 2000,
+    only: list[str] | None = None,
+    replay: str | None = None,
+) -> dict:
+    """Runs ``cases`` cases (or the single ``replay`` case) through every selected path."""
+    engine, ref = SavingsEngine(), ReferenceEngine()
+    selected = [name for name in PATHS if not only or name in only]
+    report = {
+        name: {"cases": 0, "errors": 0, "skipped": 0, "mismatches": 0, "referenceMs": 0.0, "optimizedMs": 0.0}
+        for name in selected
+    }
+    failures = []
+    case_ids = [replay] if replay else [f"{seed}:{number}" for number in range(cases)]
+    for case_id in case_ids:
+        raw = case(random.Random(case_id), max_rows)
+        for name in selected:
+            stats = report[name]
+            try:
+                sides = PATHS[name](raw)
+            except ValueError:  # the request model rejects the payload, so neither side would see it
+                sides = None
+            if sides is None:
+                stats["skipped"] += 1
+                continue
+            optimized, reference = sides
+            actual, optimized_s = _outcome(optimized, engine)
+            expected, reference_s = _outcome(reference, ref)
+            stats["cases"] += 1
+            stats["errors"] += expected[0] == "error"
+            stats["optimizedMs"] += optimized_s * 1000
+            stats["referenceMs"] += reference_s * 1000
+            difference = first_difference(actual, expected)
+            if difference:
+                stats["mismatches"] += 1
+                failures.append({"case": case_id, "path": name, "difference": difference, "payload": raw})
+
+    for stats in report.values():
+        stats["optimizedMs"] = round(stats["optimizedMs"], 3)
+        stats["referenceMs"] = round(stats["referenceMs"], 3)
+        stats["speedup"] = round(stats["referenceMs"] / stats["optimizedMs"], 2) if stats["optimizedMs"] else None
+    return {"paths": report, "failures": failures}
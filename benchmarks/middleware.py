@@ -0,0 +1,168 @@
+"""Per-request overhead of the security middleware stack.
+
+Drives a trivial endpoint directly through ASGI (no sockets) with the pure-ASGI
+middleware from ``app.core.security`` and with the previous ``BaseHTTPMiddleware``
+implementation, and prints the mean/p50/p99 latency per request for both.
+
+Usage: python -m benchmarks.middleware [--requests 5000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.security import ApiKeyMiddleware, RateLimitMiddleware, SecurityHeadersMiddleware
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["Referrer-Policy"] = "no-referrer"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+
+class LegacyApiKeyMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.enabled = os.getenv("REQUIRE_API_KEY", "false").strip().lower() == "true"
+        self.api_key = os.getenv("API_KEY", "")
+        self.exempt_paths = {"/docs", "/redoc", "/openapi.json"}
+
+    async def dispatch(self, request: Request, call_next):
+        if not self.enabled or request.url.path in self.exempt_paths:
+            return await call_next(request)
+        provided = request.headers.get("x-api-key", "")
+        if not self.api_key or provided != self.api_key:
+            return JSONResponse(status_code=401, content={"detail": "Unauthorized"})
+        return await call_next(request)
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.limit = int(os.getenv("RATE_LIMIT_PER_MIN", "120"))
+        self.window_seconds = 60
+        self.hits = defaultdict(deque)
+        self.lock = threading.Lock()
+
+    async def dispatch(self, request: Request, call_next):
+        client = request.client.host if request.client else "unknown"
+        now = time.time()
+        with self.lock:
+            bucket = self.hits[client]
+            while bucket and (now - bucket[0]) > self.window_seconds:
+                bucket.popleft()
+            if len(bucket) >= self.limit:
+                return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+            bucket.append(now)
+        return await call_next(request)
+
+
+async def _endpoint(request: Request) -> JSONResponse:
+    return JSONResponse({"ok": True})
+
+
+def build_app(middleware: tuple) -> Starlette:
+    app = Starlette(routes=[Route("/ping", _endpoint, methods=["POST"])])
+    for cls in middleware:
+        app.add_middleware(cls)
+    return app
+
+
+async def _call(app, scope: dict) -> int:
+    status = 0
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"{}", "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app, requests: int) -> list[float]:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", b"2")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 5477),
+    }
+    for _ in range(200):
+        await _call(app, dict(scope))
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        status = await _call(app, dict(scope))
+        samples.append((time.perf_counter() - started) * 1_000_000)
+        if status != 200:
+            raise RuntimeError(f"unexpected status {status}")
+    return samples
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "meanUs": round(statistics.fmean(ordered), 2),
+        "p50Us": round(ordered[len(ordered) // 2], 2),
+        "p99Us": round(ordered[int(len(ordered) * 0.99) - 1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    # The limiter must never trip during the run.
+    os.environ["RATE_LIMIT_PER_MIN"] = str(args.requests * 10)
+
+    stacks = {
+        "none": (),
+        "baseHttpMiddleware": (LegacySecurityHeadersMiddleware, LegacyRateLimitMiddleware, LegacyApiKeyMiddleware),
+        "pureAsgi": (SecurityHeadersMiddleware, RateLimitMiddleware, ApiKeyMiddleware),
+    }
+    report = {}
+    for name, middleware in stacks.items():
+        samples = asyncio.run(measure(build_app(middleware), args.requests))
+        report[name] = summarize(samples)
+
+    baseline = report["none"]["meanUs"]
+    for name in ("baseHttpMiddleware", "pureAsgi"):
+        report[name]["overheadUs"] = round(report[name]["meanUs"] - baseline, 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Engine, plugin and schema microbenchmarks.
+
+Each case is a ``(name, size, density)`` key with a setup function that builds
+its inputs outside the timed region and returns a zero-argument callable.
+Wall time is the median of several runs; peak memory comes from a separate
+tracemalloc run so tracing overhead never leaks into the timings.
+"""
+
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Callable
+
+from app.plugins.base import InvestmentContext
+from app.plugins.registry import PluginRegistry
+from app.schemas.common import (
+    ParseRequest,
+    ReturnsRequest,
+    TemporalFilterRequest,
+    TemporalFilterResponse,
+    TransactionValidationRequest,
+)
+from app.services.engine import SavingsEngine
+from benchmarks import data
+
+
+SEED = 20240101
+
+
+def _rng(name: str, size: int, density: str) -> random.Random:
+    return random.Random(f"{SEED}:{name}:{size}:{density}")
+
+
+def _filter_payload(size: int, density: str, rng: random.Random) -> dict:
+    return {**data.rule_set(density, size, rng), "transactions": data.transactions(size, rng, shuffle=True)}
+
+
+def setup_parse(size: int, density: str, rng: random.Random) -> Callable:
+    engine = SavingsEngine()
+    payload = ParseRequest.model_validate({"expenses": data.expenses(size, rng)})
+    return lambda: engine.parse_transactions(payload)
+
+
+def setup_validate(size: int, density: str, rng: random.Random) -> Callable:
+    engine = SavingsEngine()
+    payload = TransactionValidationRequest.model_validate(
+        {"wage": 50000, "maxInvest": 5000, "transactions": data.transactions(size, rng, shuffle=True)}
+    )
+    return lambda: engine.validate_transactions(payload)
+
+
+def setup_filter(size: int, density: str, rng: random.Random) -> Callable:
+    engine = SavingsEngine()
+    payload = TemporalFilterRequest.model_validate(_filter_payload(size, density, rng))
+    return lambda: engine.filter_temporal_constraints(payload)
+
+
+def _setup_returns(channel: str) -> Callable:
+    def setup(size: int, density: str, rng: random.Random) -> Callable:
+        engine = SavingsEngine()
+        payload = ReturnsRequest.model_validate(
+            {"age": 29, "wage": 50000, "inflation": 0.055, **_filter_payload(size, density, rng)}
+        )
+        return lambda: engine.calculate_returns(payload, channel=channel)
+
+    return setup
+
+
+def _setup_plugin(channel: str) -> Callable:
+    def setup(size: int, density: str, rng: random.Random) -> Callable:
+        plugin = PluginRegistry().get(channel)
+        contexts = [
+            InvestmentContext(
+                principal=Decimal(str(round(rng.uniform(0, 100000), 2))),
+                years=rng.randint(1, 60),
+                annual_income=Decimal(str(rng.randint(0, 5_000_000))),
+                inflation=Decimal("0.055"),
+            )
+            for _ in range(size)
+        ]
+
+        def run() -> None:
+            for ctx in contexts:
+                plugin.compute_nominal_return(ctx)
+                plugin.compute_tax_benefit(ctx)
+
+        return run
+
+    return setup
+
+
+def setup_schema_validate(size: int, density: str, rng: random.Random) -> Callable:
+    raw = _filter_payload(size, density, rng)
+    return lambda: TemporalFilterRequest.model_validate(raw)
+
+
+def setup_schema_serialize(size: int, density: str, rng: random.Random) -> Callable:
+    result = SavingsEngine().filter_temporal_constraints(
+        TemporalFilterRequest.model_validate(_filter_payload(size, density, rng))
+    )
+    return lambda: TemporalFilterResponse.model_validate(result).model_dump_json()
+
+
+# name -> (setup, densities). Rule density only matters where q/p/k are used.
+CASES: dict[str, tuple[Callable, tuple[str, ...]]] = {
+    "engine.parse_transactions": (setup_parse, ("none",)),
+    "engine.validate_transactions": (setup_validate, ("none",)),
+    "engine.filter_temporal_constraints": (setup_filter, ("sparse", "dense")),
+    "engine.calculate_returns.nps": (_setup_returns("nps"), ("sparse", "dense")),
+    "engine.calculate_returns.index": (_setup_returns("index"), ("sparse", "dense")),
+    "plugin.nps": (_setup_plugin("nps"), ("none",)),
+    "plugin.index": (_setup_plugin("index"), ("none",)),
+    "schema.filter_request.validate": (setup_schema_validate, ("sparse",)),
+    "schema.filter_response.serialize": (setup_schema_serialize, ("sparse",)),
+}
+
+
+def case_key(name: str, size: int, density: str) -> str:
+    return f"{name}[size={size},rules={density}]"
+
+
+def measure(run: Callable, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "medianMs": round(statistics.median(timings) * 1000, 3),
+        "minMs": round(min(timings) * 1000, 3),
+        "repeat": repeat,
+        "peakMemoryBytes": peak,
+    }
+
+
+def run_suite(sizes: list[int], repeat: int, selected: list[str] | None = None, log: Callable = print) -> dict:
+    results = {}
+    for name, (setup, densities) in CASES.items():
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        for size in sizes:
+            for density in densities:
+                key = case_key(name, size, density)
+                run = setup(size, density, _rng(name, size, density))
+                results[key] = measure(run, repeat)
+                log(f"{key}: {results[key]['medianMs']} ms, peak {results[key]['peakMemoryBytes'] / 1048576:.1f} MiB")
+                del run
+    return results
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    """Returns one entry per case present in both runs; ``regressed`` marks time or memory growth beyond threshold."""
+    rows = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        time_ratio = now["medianMs"] / before["medianMs"] if before["medianMs"] else 1.0
+        memory_ratio = now["peakMemoryBytes"] / before["peakMemoryBytes"] if before["peakMemoryBytes"] else 1.0
+        rows.append(
+            {
+                "case": key,
+                "baselineMs": before["medianMs"],
+                "currentMs": now["medianMs"],
+                "timeRatio": round(time_ratio, 3),
+                "memoryRatio": round(memory_ratio, 3),
+                "regressed": time_ratio > 1 + threshold or memory_ratio > 1 + threshold,
+            }
+        )
+    return rows
@@ -0,0 +1,68 @@
+"""JSON vs MessagePack transport cost for filter requests and responses.
+
+Decode cases cover body bytes -> validated request model, the work FastAPI
+does before the handler runs. Encode cases cover engine result -> body bytes,
+including response model validation.
+"""
+
+import json
+import random
+import statistics
+import time
+from typing import Callable
+
+from app.api.negotiation import pack, unpack
+from app.schemas.common import TemporalFilterRequest, TemporalFilterResponse
+from app.services.engine import SavingsEngine
+from benchmarks import data
+
+
+FORMATS = ("json", "msgpack", "msgpack-compact")
+
+
+def _timed(run: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def _encode(fmt: str, value: dict) -> bytes:
+    if fmt == "json":
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return pack(value, "compact" if fmt == "msgpack-compact" else "plain")
+
+
+def _decode(fmt: str, body: bytes):
+    if fmt == "json":
+        return json.loads(body)
+    return unpack(body, "compact" if fmt == "msgpack-compact" else "plain")
+
+
+def run_transport(rows: int, repeat: int = 3) -> list[dict]:
+    raw = {"q": [], "p": [], "k": [], **data.rule_set("sparse", rows, random.Random(rows))}
+    raw["transactions"] = data.transactions(rows, random.Random(rows), shuffle=True)
+    result = SavingsEngine().filter_temporal_constraints(TemporalFilterRequest.model_validate(raw))
+
+    report = []
+    for fmt in FORMATS:
+        request_body = _encode(fmt, raw)
+        response_body = _encode(fmt, TemporalFilterResponse.model_validate(result).model_dump(by_alias=True))
+        report.append(
+            {
+                "format": fmt,
+                "rows": rows,
+                "requestBytes": len(request_body),
+                "responseBytes": len(response_body),
+                "decodeMs": _timed(
+                    lambda: TemporalFilterRequest.model_validate(_decode(fmt, request_body)), repeat
+                ),
+                "encodeMs": _timed(
+                    lambda: _encode(fmt, TemporalFilterResponse.model_validate(result).model_dump(by_alias=True)),
+                    repeat,
+                ),
+            }
+        )
+    return report
@@ -1,50 +1,264 @@
+"""Asyncio load harness for every challenge endpoint.
+
+Uses one keep-alive ``httpx.AsyncClient`` so the numbers measure the service,
+not TCP/TLS setup. Payloads come from the ``benchmarks.data`` generators the
+engine suite uses, seeded per scenario and serialized once, then replayed.
+
+Examples:
+
+    # closed loop: 20 concurrent clients, 200 requests per scenario
+    python scripts/load_test.py --endpoints parse --requests 200 --concurrency 20
+
+    # open loop: fixed arrival rate of 50 req/s for 10 s
+    python scripts/load_test.py --mode open --rate 50 --duration 10
+
+    # size sweep over rows and q/p/k counts, saved for later comparison
+    python scripts/load_test.py --endpoints filter,index --rows 10,1000,100000,999999 \\
+        --rules 0,10,1000 --output load_report.json
+
+    # diff a new run against a saved report
+    python scripts/load_test.py --compare load_report.json
+"""
+
+import argparse
+import asyncio
 import json
+import random
+import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib import request
-from urllib.error import HTTPError
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks import data  # noqa: E402  (needs the repository root on sys.path)
+
 
+BASE_URL = "http://127.0.0.1:5477/blackrock/challenge/v1"
 
-BASE_URL = "http://127.0.0.1:5477/blackrock/challenge/v1/transactions:parse"
+ENDPOINTS = {
+    "parse": ("POST", "/transactions:parse"),
+    "validator": ("POST", "/transactions:validator"),
+    "filter": ("POST", "/transactions:filter"),
+    "nps": ("POST", "/returns:nps"),
+    "index": ("POST", "/returns:index"),
+    "performance": ("GET", "/performance"),
+}
 
 
-def call_once() -> int:
+def build_payload(endpoint: str, rows: int, rules: int, seed: int) -> dict | None:
+    rng = random.Random(seed)
+    if endpoint == "parse":
+        return {"expenses": data.expenses(rows, rng)}
+    if endpoint == "validator":
+        return {"wage": 50000, "maxInvest": 5000, "transactions": data.transactions(rows, rng)}
+    if endpoint == "performance":
+        return None
+
+    transactions = data.transactions(max(rows, 1), rng)
     payload = {
-        "expenses": [
-            {"date": "2023-10-12 20:15:00", "amount": 250},
-            {"date": "2023-02-28 15:49:00", "amount": 375},
-            {"date": "2023-07-01 21:59:00", "amount": 620},
-            {"date": "2023-12-17 08:09:00", "amount": 480},
-        ]
+        "q": data.periods(rules, len(transactions), rng, "fixed"),
+        "p": data.periods(rules, len(transactions), rng, "extra"),
+        "k": data.periods(max(rules, 1), len(transactions), rng),
+        "transactions": transactions,
     }
-    data = json.dumps(payload).encode("utf-8")
-    req = request.Request(BASE_URL, data=data, method="POST", headers={"Content-Type": "application/json"})
+    if endpoint in ("nps", "index"):
+        payload.update({"age": 29, "wage": 50000, "inflation": 0.055})
+    return payload
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies_ms: list[float] = []
+        self.statuses: dict[int, int] = {}
+        self.transport_errors = 0
+
+    def record(self, status: int | None, latency_ms: float) -> None:
+        if status is None:
+            self.transport_errors += 1
+            return
+        self.latencies_ms.append(latency_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        total = len(self.latencies_ms) + self.transport_errors
+        ok = sum(count for status, count in self.statuses.items() if 200 <= status < 300)
+        throttled = self.statuses.get(429, 0)
+        errors = total - ok - throttled
+        ordered = sorted(self.latencies_ms)
+        return {
+            "requests": total,
+            "ok": ok,
+            "throttled": throttled,
+            "errors": errors,
+            "statusCounts": {str(status): count for status, count in sorted(self.statuses.items())},
+            "elapsedSec": round(elapsed, 3),
+            "throughputRps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            "errorRate": round(errors / total, 4) if total else 0.0,
+            "throttleRate": round(throttled / total, 4) if total else 0.0,
+            "latencyMs": {
+                "p50": round(percentile(ordered, 0.50), 3),
+                "p95": round(percentile(ordered, 0.95), 3),
+                "p99": round(percentile(ordered, 0.99), 3),
+                "max": round(ordered[-1], 3) if ordered else 0.0,
+            },
+        }
+
+
+async def call_once(client: httpx.AsyncClient, method: str, url: str, body: bytes | None, recorder: Recorder) -> None:
+    started = time.perf_counter()
     try:
-        with request.urlopen(req, timeout=10) as response:
-            return response.status
-    except HTTPError as exc:
-        return exc.code
+        response = await client.request(method, url, content=body)
+        await response.aread()
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    recorder.record(status, (time.perf_counter() - started) * 1000)
 
 
-def main(total_requests: int = 200, workers: int = 20) -> None:
+async def run_closed_loop(client, method, url, body, requests: int, concurrency: int) -> Recorder:
+    recorder = Recorder()
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await call_once(client, method, url, body, recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder
+
+
+async def run_open_loop(client, method, url, body, rate: float, duration: float) -> Recorder:
+    """Fires requests on a fixed schedule regardless of how fast responses come back."""
+    recorder = Recorder()
+    tasks = []
+    interval = 1.0 / rate
     started = time.perf_counter()
-    statuses = []
-    with ThreadPoolExecutor(max_workers=workers) as pool:
-        futures = [pool.submit(call_once) for _ in range(total_requests)]
-        for future in as_completed(futures):
-            statuses.append(future.result())
+    sent = 0
+    while sent * interval < duration:
+        delay = started + sent * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(call_once(client, method, url, body, recorder)))
+        sent += 1
+    await asyncio.gather(*tasks)
+    return recorder
+
+
+async def run_scenario(client: httpx.AsyncClient, args, endpoint: str, rows: int, rules: int) -> dict:
+    method, path = ENDPOINTS[endpoint]
+    payload = build_payload(endpoint, rows, rules, args.seed)
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8") if payload is not None else None
+    url = args.base_url + path
 
+    started = time.perf_counter()
+    if args.mode == "open":
+        recorder = await run_open_loop(client, method, url, body, args.rate, args.duration)
+    else:
+        recorder = await run_closed_loop(client, method, url, body, args.requests, args.concurrency)
     elapsed = time.perf_counter() - started
-    ok = sum(1 for status in statuses if status == 200)
-    throttled = sum(1 for status in statuses if status == 429)
-    errors = len(statuses) - ok - throttled
-    print(f"total_requests={total_requests}")
-    print(f"workers={workers}")
-    print(f"ok={ok}")
-    print(f"throttled={throttled}")
-    print(f"errors={errors}")
-    print(f"elapsed_sec={elapsed:.3f}")
-    print(f"throughput_rps={total_requests / elapsed:.2f}")
+
+    scenario = {"endpoint": endpoint, "rows": rows, "rules": rules, "payloadBytes": len(body or b"")}
+    return {**scenario, **recorder.report(elapsed)}
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+async def main_async(args) -> dict:
+    endpoints = [item for item in args.endpoints.split(",") if item]
+    unknown = [item for item in endpoints if item not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"unknown endpoints: {', '.join(unknown)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Content-Type": "application/json"}
+    if args.api_key:
+        headers["x-api-key"] = args.api_key
+
+    scenarios = []
+    async with httpx.AsyncClient(limits=limits, headers=headers, timeout=args.timeout) as client:
+        for endpoint in endpoints:
+            rows_sweep = [0] if endpoint == "performance" else args.rows
+            rules_sweep = [0] if endpoint in ("parse", "validator", "performance") else args.rules
+            for rows in rows_sweep:
+                for rules in rules_sweep:
+                    result = await run_scenario(client, args, endpoint, rows, rules)
+                    print(json.dumps(result))
+                    scenarios.append(result)
+
+    config = {
+        "baseUrl": args.base_url,
+        "mode": args.mode,
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+    }
+    if args.mode == "open":
+        config.update({"rate": args.rate, "duration": args.duration})
+    else:
+        config["requestsPerScenario"] = args.requests
+    return {"config": config, "scenarios": scenarios}
+
+
+def compare_reports(previous: dict, current: dict) -> list[dict]:
+    """Pairs scenarios by endpoint/rows/rules and reports relative latency and throughput changes."""
+    key = lambda item: (item["endpoint"], item["rows"], item["rules"])
+    before = {key(item): item for item in previous.get("scenarios", [])}
+    deltas = []
+    for item in current["scenarios"]:
+        old = before.get(key(item))
+        if not old:
+            continue
+        delta = {"endpoint": item["endpoint"], "rows": item["rows"], "rules": item["rules"]}
+        for name in ("p50", "p95", "p99"):
+            old_ms = old["latencyMs"][name]
+            delta[f"{name}Change"] = round((item["latencyMs"][name] - old_ms) / old_ms, 4) if old_ms else None
+        old_rps = old["throughputRps"]
+        delta["throughputChange"] = round((item["throughputRps"] - old_rps) / old_rps, 4) if old_rps else None
+        delta["errorRateDelta"] = round(item["errorRate"] - old["errorRate"], 4)
+        deltas.append(delta)
+    return deltas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Async load harness for the challenge API")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--endpoints", default="parse,validator,filter,nps,index")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--requests", type=int, default=200, help="closed loop: requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="closed loop workers / connection pool size")
+    parser.add_argument("--rate", type=float, default=50.0, help="open loop: arrivals per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="open loop: seconds per scenario")
+    parser.add_argument("--rows", type=_int_list, default=[4], help="comma-separated row counts to sweep")
+    parser.add_argument("--rules", type=_int_list, default=[1], help="comma-separated q/p/k counts to sweep")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--api-key", default="")
+    parser.add_argument("--output", default="", help="write the JSON report to this file")
+    parser.add_argument("--compare", default="", help="previous JSON report to diff this run against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            report["comparison"] = compare_reports(json.load(handle), report)
+        print(json.dumps(report["comparison"], indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+# Test type: Admission control unit/integration test
+# Validation: memory estimates from headers, FIFO budget admission woken on release, 503 + Retry-After rejection, and per-endpoint peak memory stats
+# Command: pytest -q test/test_admission.py
+
+import anyio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.admission import AdmissionController, AdmissionMiddleware
+
+
+def _controller(monkeypatch, budget_mb: str = "1", timeout: str = "0.05") -> AdmissionController:
+    monkeypatch.setenv("MEMORY_BUDGET_MB", budget_mb)
+    monkeypatch.setenv("ADMISSION_QUEUE_TIMEOUT_S", timeout)
+    monkeypatch.setenv("ADMISSION_RETRY_AFTER_S", "7")
+    return AdmissionController()
+
+
+def test_estimate_uses_content_length_and_row_hint(monkeypatch):
+    controller = _controller(monkeypatch)
+    scope = {"headers": [(b"content-length", b"6400")]}
+    assert controller.estimate(scope) == 6400 * 2 + 100 * controller.bytes_per_row
+    scope["headers"].append((b"x-row-count", b"10"))
+    assert controller.estimate(scope) == 6400 * 2 + 100 * controller.bytes_per_row
+    scope["headers"][-1] = (b"x-row-count", b"500")
+    assert controller.estimate(scope) == 6400 * 2 + 500 * controller.bytes_per_row
+    scope["headers"][-1] = (b"x-row-count", b"9" * 12)
+    assert controller.estimate(scope) == 6400 * 2 + 1_000_000 * controller.bytes_per_row
+
+
+def test_estimate_assumes_a_size_for_bodies_without_length(monkeypatch):
+    monkeypatch.setenv("ADMISSION_UNKNOWN_BODY_MB", "1")
+    controller = _controller(monkeypatch)
+    chunked = {"method": "POST", "headers": [(b"transfer-encoding", b"chunked")]}
+    assert controller.estimate(chunked) == 2 * 1048576 + 1048576 // 64 * controller.bytes_per_row
+    assert controller.estimate({"method": "GET", "headers": []}) == 0
+
+
+def test_release_wakes_the_next_waiter(monkeypatch):
+    controller = _controller(monkeypatch, timeout="5")
+    admitted = []
+
+    async def wait(estimate):
+        admitted.append((estimate, await controller.acquire(estimate), anyio.current_time()))
+
+    async def scenario():
+        assert await controller.acquire(controller.budget_bytes)
+        async with anyio.create_task_group() as group:
+            group.start_soon(wait, 2)
+            group.start_soon(wait, 3)
+            await anyio.sleep(0.05)
+            assert admitted == [] and len(controller.waiters) == 2
+            released = anyio.current_time()
+            controller.release(controller.budget_bytes)
+        return released
+
+    released = anyio.run(scenario)
+    assert [(estimate, ok) for estimate, ok, _ in admitted] == [(2, True), (3, True)]
+    assert all(at - released < 0.05 for _, _, at in admitted)
+    assert controller.in_flight == 2 and not controller.waiters
+
+
+def test_oversized_request_runs_alone_and_others_time_out(monkeypatch):
+    controller = _controller(monkeypatch)
+    oversized = 10 * controller.budget_bytes
+
+    async def scenario():
+        assert await controller.acquire(oversized)
+        assert not await controller.acquire(1024)
+        controller.release(oversized)
+        assert await controller.acquire(1024)
+
+    anyio.run(scenario)
+    assert controller.stats == {"admitted": 2, "queued": 1, "rejected": 1}
+
+
+def test_middleware_rejects_with_503_and_retry_after(monkeypatch):
+    controller = _controller(monkeypatch)
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    with TestClient(app) as test_client:
+        assert test_client.post("/echo", json={"a": 1}).status_code == 200
+        anyio.run(controller.acquire, controller.budget_bytes)
+        response = test_client.post("/echo", json={"a": 1})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+
+
+def test_performance_reports_peak_memory_and_admission(client):
+    client.post(
+        "/blackrock/challenge/v1/transactions:parse",
+        json={"expenses": [{"date": "2023-10-12 20:15:00", "amount": 250}]},
+    )
+    body = client.get("/blackrock/challenge/v1/performance").json()
+    parse_stats = next(row for row in body["endpointStats"] if row["endpoint"] == "transactions:parse")
+    assert "avgPeakMemoryMb" in parse_stats
+    assert "maxPeakMemoryMb" in parse_stats
+    assert body["admission"]["admitted"] >= 1
+    assert body["admission"]["inFlight"] >= 1
@@ -0,0 +1,41 @@
+# Test type: Benchmark tooling unit test
+# Validation: deterministic generators and regression flagging of the benchmark compare step
+# Command: pytest -q test/test_benchmarks.py
+
+import random
+
+from benchmarks import data
+from benchmarks.suite import CASES, compare, measure
+
+
+def test_generators_are_deterministic():
+    first = data.rule_set("dense", 500, random.Random(3)), data.transactions(500, random.Random(3), shuffle=True)
+    second = data.rule_set("dense", 500, random.Random(3)), data.transactions(500, random.Random(3), shuffle=True)
+    assert first == second
+
+
+def test_every_case_runs_at_small_size():
+    for name, (setup, densities) in CASES.items():
+        for density in densities:
+            result = measure(setup(50, density, random.Random(name)), repeat=1)
+            assert result["medianMs"] >= 0
+            assert result["peakMemoryBytes"] >= 0
+
+
+def test_compare_flags_time_and_memory_regressions():
+    baseline = {
+        "a": {"medianMs": 10.0, "peakMemoryBytes": 1000},
+        "b": {"medianMs": 10.0, "peakMemoryBytes": 1000},
+        "c": {"medianMs": 10.0, "peakMemoryBytes": 1000},
+    }
+    current = {
+        "a": {"medianMs": 11.0, "peakMemoryBytes": 1100},
+        "b": {"medianMs": 30.0, "peakMemoryBytes": 1000},
+        "c": {"medianMs": 10.0, "peakMemoryBytes": 5000},
+        "new": {"medianMs": 1.0, "peakMemoryBytes": 1},
+    }
+    rows = {row["case"]: row for row in compare(baseline, current, threshold=0.25)}
+    assert set(rows) == {"a", "b", "c"}
+    assert not rows["a"]["regressed"]
+    assert rows["b"]["regressed"]
+    assert rows["c"]["regressed"]
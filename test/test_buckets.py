@@ -0,0 +1,114 @@
+# Test type: Engine unit and API integration test
+# Validation: calendar bucket boundaries, kBuckets returns equal the same windows sent as explicit k, strict range handling, batch plugin math parity
+# Command: pytest -q test/test_buckets.py
+
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.plugins.base import InvestmentContext
+from app.plugins.registry import PluginRegistry
+from app.schemas.common import ReturnsRequest
+from app.services.buckets import calendar_buckets
+from app.services.engine import SavingsEngine
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _transactions(rows: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1).timestamp()
+    out = []
+    for epoch in sorted(rng.sample(range(int(start), int(start) + 400 * 86400, 600), rows)):
+        amount = round(rng.uniform(1, 900), 2)
+        ceiling = -(-amount // 100) * 100
+        out.append(
+            {
+                "date": datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S"),
+                "amount": amount,
+                "ceiling": ceiling,
+                "remanent": round(ceiling - amount, 2),
+            }
+        )
+    rng.shuffle(out)
+    return out
+
+
+def test_calendar_bucket_boundaries():
+    quarters = calendar_buckets("quarter", datetime(2023, 2, 15, 12), datetime(2023, 11, 2))
+    assert [(bucket.start, bucket.end) for bucket in quarters] == [
+        ("2023-02-15 12:00:00", "2023-03-31 23:59:59"),
+        ("2023-04-01 00:00:00", "2023-06-30 23:59:59"),
+        ("2023-07-01 00:00:00", "2023-09-30 23:59:59"),
+        ("2023-10-01 00:00:00", "2023-11-02 00:00:00"),
+    ]
+    weeks = calendar_buckets("week", datetime(2023, 1, 1), datetime(2023, 1, 10))
+    assert [bucket.start for bucket in weeks] == ["2023-01-01 00:00:00", "2023-01-02 00:00:00", "2023-01-09 00:00:00"]
+    assert calendar_buckets("year", datetime(2023, 12, 31), datetime(2024, 1, 1))[1].start == "2024-01-01 00:00:00"
+
+
+@pytest.mark.parametrize("unit", ["day", "week", "month", "quarter", "year"])
+def test_buckets_match_explicit_k(client, unit):
+    transactions = _transactions(600, seed=len(unit))
+    base = {
+        "age": 31,
+        "wage": 90000,
+        "inflation": 0.05,
+        "p": [{"extra": 10, "start": "2023-03-01 00:00:00", "end": "2023-05-01 00:00:00"}],
+        "transactions": transactions,
+    }
+    bucketed = client.post(f"{BASE}/returns:nps", json={**base, "kBuckets": {"unit": unit}})
+    assert bucketed.status_code == 200
+    windows = [{"start": item["start"], "end": item["end"]} for item in bucketed.json()["savingsByDates"]]
+    explicit = client.post(f"{BASE}/returns:nps", json={**base, "k": windows}).json()
+    assert bucketed.json() == explicit
+    total = sum(item["amount"] for item in explicit["savingsByDates"])
+    assert total == pytest.approx(sum(tx["remanent"] for tx in transactions) + 10 * sum(
+        "2023-03-01" <= tx["date"] <= "2023-05-01" for tx in transactions
+    ))
+
+
+def test_strict_buckets_drop_rows_outside_range():
+    transactions = _transactions(200, seed=3)
+    payload = {
+        "age": 40,
+        "wage": 50000,
+        "inflation": 0.05,
+        "kMode": "strict",
+        "kBuckets": {"unit": "month", "start": "2023-03-01 00:00:00", "end": "2023-05-31 23:59:59"},
+        "transactions": transactions,
+    }
+    result = SavingsEngine().calculate_returns(ReturnsRequest.model_validate(payload), channel="index")
+    inside = [tx for tx in transactions if "2023-03-01" <= tx["date"] < "2023-06-01"]
+    assert len(result["savingsByDates"]) == 3
+    assert result["transactionsTotalAmount"] == pytest.approx(sum(tx["amount"] for tx in inside))
+
+
+def test_k_and_buckets_are_exclusive(client):
+    response = client.post(
+        f"{BASE}/returns:index",
+        json={
+            "age": 30,
+            "wage": 1000,
+            "inflation": 0.05,
+            "k": [{"start": "2023-01-01 00:00:00", "end": "2023-01-02 00:00:00"}],
+            "kBuckets": {"unit": "day"},
+        },
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("channel", ["nps", "index"])
+def test_batch_plugin_math_matches_single(channel):
+    plugin = PluginRegistry().get(channel)
+    ctx = InvestmentContext(principal=Decimal("0"), years=27, annual_income=Decimal("1500000"), inflation=Decimal("0.055"))
+    principals = [Decimal(str(value)) for value in (0, 12.5, 150000, 150000.25, 250000, 999999.99)]
+    singles = [
+        InvestmentContext(principal=principal, years=27, annual_income=ctx.annual_income, inflation=ctx.inflation)
+        for principal in principals
+    ]
+    assert plugin.compute_nominal_returns(principals, ctx) == [plugin.compute_nominal_return(item) for item in singles]
+    assert plugin.compute_tax_benefits(principals, ctx) == [plugin.compute_tax_benefit(item) for item in singles]
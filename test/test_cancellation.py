@@ -0,0 +1,89 @@
+# Test type: Cancellation unit/integration test
+# Validation: token deadlines, engine checkpoints raising mid-operation, and 504 + "cancelled" metrics for expired requests
+# Command: pytest -q test/test_cancellation.py
+
+import random
+import time
+
+import pytest
+
+from app.core.cancellation import CHECK_EVERY, CancellationToken, OperationCancelled
+from app.schemas.common import ParseRequest, TemporalFilterRequest
+from app.services.engine import SavingsEngine
+from benchmarks import data
+
+
+def test_token_deadline_and_explicit_cancel():
+    token = CancellationToken.with_timeout(None)
+    token.check()
+    assert not token.cancelled
+
+    expired = CancellationToken(deadline=time.monotonic() - 1)
+    with pytest.raises(OperationCancelled) as exc:
+        expired.check()
+    assert exc.value.reason == "deadline"
+
+    token.cancel("disconnected")
+    token.cancel("deadline")
+    with pytest.raises(OperationCancelled) as exc:
+        token.checkpoint(0, 1)
+    assert exc.value.reason == "disconnected"
+
+
+class _CancelAfter(CancellationToken):
+    def __init__(self, checks: int) -> None:
+        super().__init__()
+        self.remaining = checks
+        self.seen: list[int] = []
+
+    def checkpoint(self, done: int, total: int) -> None:
+        self.seen.append(done)
+        self.remaining -= 1
+        if self.remaining < 0:
+            self.cancel("test")
+        super().checkpoint(done, total)
+
+
+def test_engine_stops_at_chunk_boundary():
+    expenses = data.expenses(CHECK_EVERY * 2 + 1, random.Random(7))
+    token = _CancelAfter(checks=2)
+    with pytest.raises(OperationCancelled):
+        SavingsEngine().parse_transactions(ParseRequest.model_validate({"expenses": expenses}), token)
+    assert token.seen == [0, CHECK_EVERY, CHECK_EVERY * 2]
+
+
+def test_filter_without_token_is_unchanged():
+    payload = TemporalFilterRequest.model_validate(
+        {"q": [], "p": [], "k": [], "transactions": [{"date": "2023-10-12 20:15:00", "amount": 250, "ceiling": 300, "remanent": 50}]}
+    )
+    assert SavingsEngine().filter_temporal_constraints(payload) == SavingsEngine().filter_temporal_constraints(
+        payload, CancellationToken()
+    )
+
+
+def _cancelled_count(client) -> int:
+    body = client.get("/blackrock/challenge/v1/performance").json()
+    stats = {row["endpoint"]: row for row in body["endpointStats"]}
+    return stats.get("transactions:parse", {}).get("cancelledCount", 0)
+
+
+def test_expired_request_deadline_returns_504_and_records_cancelled(client):
+    before = _cancelled_count(client)
+    response = client.post(
+        "/blackrock/challenge/v1/transactions:parse",
+        json={"expenses": [{"date": "2023-10-12 20:15:00", "amount": 250}]},
+        headers={"X-Request-Timeout-Ms": "0.001"},
+    )
+    assert response.status_code == 504
+
+    assert _cancelled_count(client) == before + 1
+    assert client.get("/blackrock/challenge/v1/performance").json()["live"]["cancelled"] >= 1
+
+
+def test_request_timeout_env_applies_without_header(client, monkeypatch):
+    monkeypatch.setenv("REQUEST_TIMEOUT_MS", "0.001")
+    response = client.post(
+        "/blackrock/challenge/v1/transactions:parse",
+        json={"expenses": [{"date": "2023-10-12 20:15:00", "amount": 250}]},
+    )
+    assert response.status_code == 504
@@ -0,0 +1,134 @@
+# Test type: Compressed transport integration test
+# Validation: gzip/zstd request decoding, decoded-size limit, bad encodings, threshold compression, streamed flushes
+# Command: pytest -q test/test_compression.py
+
+import gzip
+import json
+import random
+import zlib
+
+import anyio
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding, supported_encodings
+from benchmarks import data
+
+
+FILTER_URL = "/blackrock/challenge/v1/transactions:filter"
+
+
+def _filter_payload(rows: int) -> dict:
+    return {"q": [], "p": [], "k": [], "transactions": data.transactions(rows, random.Random(3))}
+
+
+def _echo_app() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.post("/echo")
+    async def echo(request: Request) -> dict:
+        body = await request.body()
+        return {"bytes": len(body), "decoded": request.state.body_bytes}
+
+    @app.get("/blob")
+    async def blob(size: int) -> dict:
+        return {"data": "x" * size}
+
+    return TestClient(app)
+
+
+def test_gzip_request_body_matches_plain_request(client):
+    payload = _filter_payload(200)
+    plain = client.post(FILTER_URL, json=payload)
+    compressed = client.post(
+        FILTER_URL,
+        content=gzip.compress(json.dumps(payload).encode()),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert compressed.status_code == 200
+    assert compressed.json() == plain.json()
+
+
+def test_zstd_request_body_when_available(client):
+    zstandard = pytest.importorskip("zstandard")
+    payload = _filter_payload(50)
+    response = client.post(
+        FILTER_URL,
+        content=zstandard.ZstdCompressor().compress(json.dumps(payload).encode()),
+        headers={"Content-Type": "application/json", "Content-Encoding": "zstd"},
+    )
+    assert response.status_code == 200
+    assert len(response.json()["valid"]) == 50
+
+
+def test_decoded_size_limit_rejects_zip_bombs(monkeypatch):
+    monkeypatch.setenv("MAX_DECOMPRESSED_BYTES", "100000")
+    with _echo_app() as client:
+        ok = client.post("/echo", content=gzip.compress(b"a" * 50000), headers={"Content-Encoding": "gzip"})
+        assert ok.json() == {"bytes": 50000, "decoded": 50000}
+
+        bomb = gzip.compress(b"\0" * 50_000_000)
+        response = client.post("/echo", content=bomb, headers={"Content-Encoding": "gzip"})
+        assert response.status_code == 413
+
+
+def test_malformed_and_unsupported_encodings():
+    with _echo_app() as client:
+        truncated = gzip.compress(b"a" * 5000)[:-10]
+        assert client.post("/echo", content=truncated, headers={"Content-Encoding": "gzip"}).status_code == 400
+        response = client.post("/echo", content=b"abc", headers={"Content-Encoding": "br"})
+        assert response.status_code == 415
+        assert "gzip" in response.headers["accept-encoding"]
+
+
+def test_responses_compressed_above_threshold_only():
+    with _echo_app() as client:
+        large = client.get("/blob", params={"size": 5000}, headers={"Accept-Encoding": "gzip"})
+        assert large.headers["content-encoding"] == "gzip"
+        assert large.headers["vary"] == "Accept-Encoding"
+        assert large.json()["data"] == "x" * 5000
+
+        small = client.get("/blob", params={"size": 10}, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+
+        identity = client.get("/blob", params={"size": 5000}, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in identity.headers
+
+
+def test_streamed_chunks_are_flushed_as_they_arrive():
+    parts = [b"x" * 2000, b"y" * 10, b"z" * 10]
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for number, part in enumerate(parts):
+            await send({"type": "http.response.body", "body": part, "more_body": number < len(parts) - 1})
+
+    encodings = ["gzip", *(["zstd"] if "zstd" in supported_encodings() else [])]
+    for encoding in encodings:
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())]}
+        anyio.run(CompressionMiddleware(streaming_app), scope, None, send)
+        chunks = [message["body"] for message in sent[1:]]
+        assert len(chunks) == len(parts)
+        if encoding == "gzip":
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            import zstandard
+
+            decoder = zstandard.ZstdDecompressor().decompressobj()
+        # Each chunk decodes to its own part without waiting for the next one.
+        assert [decoder.decompress(chunk) for chunk in chunks] == parts
+
+
+def test_choose_encoding_respects_q_zero():
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("deflate, gzip") == "gzip"
+    assert choose_encoding("") is None
+    assert choose_encoding("gzip;q=0.5, *;q=0") == "gzip"
+    assert choose_encoding("gzip;q=0, *") == ("zstd" if "zstd" in supported_encodings() else None)
@@ -71,4 +71,6 @@ def test_performance_contract(client):
     response = client.get("/blackrock/challenge/v1/performance")
     assert response.status_code == 200
     body = response.json()
-    assert set(body.keys()) == {"time", "memory", "threads", "requestsServed", "endpointStats"}
+    assert set(body.keys()) == {"time", "memory", "threads", "requestsServed", "endpointStats", "live", "admission", "scheduler", "jobs", "startup", "scatter"}
+    assert set(body["startup"]) == {"stagesMs", "warmupMs", "readyMs"}
+    assert set(body["scatter"]) == {"requests", "shards", "retried", "local", "peers", "peerFailures"}
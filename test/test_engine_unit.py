@@ -1,7 +1,12 @@
 # Test type: Engine unit test
-# Validation: temporal rule tie-breaks, additive overlaps, k enforcement, and return horizon calculations
+# Validation: rule tie-breaks, overlaps, k enforcement, return horizons, presorted parity, columnar parity and float-noise fallback
 # Command: pytest -q test/test_engine_unit.py
 
+import random
+from decimal import Decimal
+
+import pytest
+
 from app.schemas.common import (
     EvalPeriod,
     ExtraPeriod,
@@ -13,6 +18,7 @@ from app.schemas.common import (
     TransactionValidationRequest,
 )
 from app.services.engine import SavingsEngine
+from benchmarks import data
 
 
 def test_q_latest_start_wins_with_same_timestamp_tie_by_order():
@@ -111,3 +117,119 @@ def test_returns_uses_five_year_horizon_for_age_60_or_more():
     response = engine.calculate_returns(req, channel="nps")
     assert response["savingsByDates"][0]["amount"] == 50.0
     assert response["savingsByDates"][0]["profits"] > 0
+
+
+def test_presorted_and_shuffled_inputs_give_input_ordered_results():
+    engine = SavingsEngine()
+    rng = random.Random(8)
+    rules = {"kMode": "strict", **data.rule_set("dense", 600, rng)}
+    ordered = data.transactions(600, rng)
+    ordered[10]["remanent"] += 1  # one invalid row
+    shuffled = ordered[:]
+    rng.shuffle(shuffled)
+
+    in_order = engine.filter_temporal_constraints(
+        TemporalFilterRequest.model_validate({**rules, "sorted": True, "transactions": ordered})
+    )
+    out_of_order = engine.filter_temporal_constraints(
+        TemporalFilterRequest.model_validate({**rules, "transactions": shuffled})
+    )
+    position = {tx["date"]: index for index, tx in enumerate(shuffled)}
+    for result in (in_order, out_of_order):
+        assert result["invalid"]
+    assert [row["date"] for row in in_order["valid"]] == sorted(row["date"] for row in in_order["valid"])
+    assert [position[row["date"]] for row in out_of_order["valid"]] == sorted(
+        position[row["date"]] for row in out_of_order["valid"]
+    )
+    assert sorted(in_order["valid"], key=lambda row: row["date"]) == sorted(
+        out_of_order["valid"], key=lambda row: row["date"]
+    )
+
+    returns = {"age": 30, "wage": 50000, "inflation": 0.05, **rules}
+    assert engine.calculate_returns(
+        ReturnsRequest.model_validate({**returns, "transactions": ordered}), channel="index"
+    ) == engine.calculate_returns(ReturnsRequest.model_validate({**returns, "transactions": shuffled}), channel="index")
+
+
+def test_declared_sorted_flag_rejects_out_of_order_input():
+    engine = SavingsEngine()
+    transactions = data.transactions(3, random.Random(1))[::-1]
+    with pytest.raises(ValueError, match="not in date order"):
+        engine.filter_temporal_constraints(
+            TemporalFilterRequest.model_validate({"sorted": True, "transactions": transactions})
+        )
+
+
+@pytest.mark.parametrize("wage,max_invest", [(0, None), (99.99, 50.5), (100.005, 0), (5000, 80.004)])
+def test_columnar_validator_matches_decimal_path(wage, max_invest, monkeypatch):
+    rng = random.Random(int(wage))
+    transactions = data.transactions(300, rng)
+    for tx in transactions:
+        roll = rng.random()
+        if roll < 0.05:
+            tx["remanent"] = round(tx["remanent"] + 0.01, 2)
+        elif roll < 0.1:
+            tx["ceiling"] += 50
+        elif roll < 0.15:
+            tx["date"] = transactions[rng.randrange(len(transactions))]["date"]
+        elif roll < 0.2:
+            tx["amount"] = tx["ceiling"] + 1
+        elif roll < 0.25:
+            tx["remanent"] = rng.choice([0, 1000, 3000.5])
+    payload = TransactionValidationRequest.model_validate(
+        {"wage": wage, "maxInvest": max_invest, "transactions": transactions}
+    )
+
+    engine = SavingsEngine()
+    columnar_result = engine.validate_transactions(payload)
+    monkeypatch.setattr(engine, "_validate_columnar", lambda *args: None)
+    assert columnar_result == engine.validate_transactions(payload)
+    assert columnar_result["invalid"] and columnar_result["duplicates"]
+
+
+def test_columnar_validator_falls_back_for_sub_cent_values():
+    payload = TransactionValidationRequest(
+        wage=1000,
+        transactions=[Transaction(date="2023-01-01 00:00:00", amount=99.995, ceiling=100, remanent=0.005)],
+    )
+    engine = SavingsEngine()
+    assert engine._validate_columnar(payload, Decimal("1000"), None) is None
+    assert engine.validate_transactions(payload)["valid"][0]["remanent"] == 0.005
+
+
+@pytest.mark.parametrize(
+    "wage,transaction,message",
+    [
+        # 0.1 + 0.2 is 0.30000000000000004: more than a wage of 0.3, though it rounds to 30 cents.
+        (0.3, {"amount": 99.7, "ceiling": 100, "remanent": 0.1 + 0.2}, "remanent cannot exceed wage"),
+        # Rounds to 50,000,000 cents, which is past the amount limit the exact value stays under.
+        (5000, {"amount": 499999.999999999, "ceiling": 500000, "remanent": 0.000000001}, None),
+    ],
+)
+def test_float_noise_is_not_rounded_onto_the_columnar_path(wage, transaction, message, monkeypatch):
+    payload = TransactionValidationRequest.model_validate(
+        {"wage": wage, "transactions": [{"date": "2023-01-01 00:00:00", **transaction}]}
+    )
+    engine = SavingsEngine()
+    assert engine._validate_columnar(payload, Decimal(str(wage)), None) is None
+    result = engine.validate_transactions(payload)
+    assert [row["message"] for row in result["invalid"]] == ([message] if message else [])
+    monkeypatch.setattr(engine, "_validate_columnar", lambda *args: None)
+    assert result == engine.validate_transactions(payload)
+
+
+@pytest.mark.parametrize("density,k_mode", [("sparse", "grouping"), ("dense", "strict"), ("dense", "grouping")])
+def test_columnar_filter_matches_decimal_sweep(density, k_mode, monkeypatch):
+    rng = random.Random(len(density))
+    transactions = data.transactions(500, rng, shuffle=True)
+    for tx in rng.sample(transactions, 25):
+        tx["remanent"] = round(tx["remanent"] + 0.01, 2)
+    payload = TemporalFilterRequest.model_validate(
+        {**data.rule_set(density, 500, rng), "kMode": k_mode, "transactions": transactions}
+    )
+
+    engine = SavingsEngine()
+    columnar_result = engine.filter_temporal_constraints(payload)
+    monkeypatch.setattr(engine, "_filter_columnar", lambda *args: None)
+    assert columnar_result == engine.filter_temporal_constraints(payload)
+    assert columnar_result["invalid"]
@@ -0,0 +1,51 @@
+# Test type: Differential test
+# Validation: optimized and stored paths agree with the frozen reference engine on seeded cases, replay, sub-cent fallback
+# Command: pytest -q test/test_fuzz.py
+
+import random
+
+from app.schemas.common import PipelineRequest, TemporalFilterRequest
+from app.services.engine import SavingsEngine
+from app.services.pipeline import run_pipeline
+from app.services.reference import ReferenceEngine
+from benchmarks import data
+from benchmarks.fuzz import PATHS, case, first_difference, run_fuzz
+
+
+def test_optimized_paths_match_reference():
+    report = run_fuzz(cases=80, seed=49, max_rows=150)
+    assert [(item["case"], item["path"], item["difference"]) for item in report["failures"]] == []
+    assert set(report["paths"]) == set(PATHS)
+    for name, stats in report["paths"].items():
+        assert stats["cases"] > 0, name
+        assert stats["cases"] > stats["errors"], name
+
+
+def test_replay_regenerates_the_same_case():
+    assert case(random.Random("49:17"), 150) == case(random.Random("49:17"), 150)
+    report = run_fuzz(cases=0, max_rows=150, only=["filter"], replay="49:17")
+    assert report["paths"]["filter"]["cases"] == 1 and report["failures"] == []
+
+
+def test_first_difference_names_the_location():
+    expected = {"valid": [{"remanent": 1.0}, {"remanent": 2.0}], "invalid": []}
+    assert first_difference(expected, expected) is None
+    changed = {"valid": [{"remanent": 1.0}, {"remanent": 2.01}], "invalid": []}
+    assert first_difference(changed, expected) == "valid[1].remanent: 2.01 != 2.0"
+    assert first_difference(("error", "q[0] has start > end"), ("result", {})) == "[0]: 'error' != 'result'"
+
+
+def test_sub_cent_rule_values_fall_back_to_decimal():
+    rng = random.Random(5)
+    transactions = data.transactions(50, rng)
+    q = [{"start": transactions[0]["date"], "end": transactions[9]["date"], "fixed": 10.005}]
+    rules = {"q": q, "p": [], "k": []}
+    payload = TemporalFilterRequest.model_validate({**rules, "transactions": transactions})
+    result = SavingsEngine().filter_temporal_constraints(payload)
+    assert result == ReferenceEngine().filter_temporal_constraints(payload)
+    assert result["valid"][0]["remanent"] == 10.01
+
+    pipeline = PipelineRequest.model_validate(
+        {**rules, "expenses": data.expenses(50, random.Random(5)), "wage": 50000, "outputs": ["filter"]}
+    )
+    assert run_pipeline(SavingsEngine(), pipeline)["filter"]["valid"][0]["remanent"] == 10.01
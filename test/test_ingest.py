@@ -0,0 +1,161 @@
+# Test type: File ingest integration test
+# Validation: CSV/Arrow parse and filter outputs match the engine, chunked reads, stdlib CSV fallback, duplicate rejection without partial output, INGEST_ROOT sandboxing, CLI
+# Command: pytest -q test/test_ingest.py
+
+import csv
+import json
+import random
+
+import pytest
+
+from app.cli import main as cli_main
+from app.schemas.common import IngestFilterRequest, TemporalFilterRequest, ParseRequest
+from app.services import ingest
+from app.services.engine import SavingsEngine
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _write_csv(path, rows, columns):
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as handle:
+        return list(csv.DictReader(handle))
+
+
+def _filter_case(rows=400, seed=7):
+    rng = random.Random(seed)
+    transactions = data.transactions(rows, rng, shuffle=True)
+    rules = {"kMode": "strict", **data.rule_set("dense", rows, rng)}
+    return transactions, rules
+
+
+def _expected_filter(transactions, rules):
+    result = SavingsEngine().filter_temporal_constraints(
+        TemporalFilterRequest.model_validate({**rules, "transactions": transactions})
+    )
+    expected = {row["date"]: (True, row["remanent"], None) for row in result["valid"]}
+    expected.update({row["date"]: (False, row["remanent"], row["message"]) for row in result["invalid"]})
+    return expected
+
+
+def _assert_filter_output(rows, transactions, expected):
+    assert [row["date"] for row in rows] == [item["date"] for item in transactions]
+    for row in rows:
+        valid, remanent, message = expected[row["date"]]
+        assert row["valid"] == ("true" if valid else "false")
+        assert float(row["remanent"]) == pytest.approx(remanent)
+        assert (row["message"] or None) == message
+
+
+def test_parse_csv_matches_engine(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_CHUNK_ROWS", "64")
+    expenses = data.expenses(500, random.Random(3))
+    _write_csv(tmp_path / "expenses.csv", expenses, ["date", "amount"])
+
+    summary = ingest.ingest_parse(str(tmp_path / "expenses.csv"), str(tmp_path / "parsed.csv"))
+    expected = SavingsEngine().parse_transactions(ParseRequest.model_validate({"expenses": expenses}))
+
+    assert summary["rows"] == 500
+    assert summary["chunks"] == 8
+    assert summary["totals"]["totalRemanent"] == pytest.approx(expected["totals"]["totalRemanent"])
+    rows = _read_csv(tmp_path / "parsed.csv")
+    assert [(row["date"], float(row["remanent"])) for row in rows] == [
+        (item["date"], pytest.approx(item["remanent"])) for item in expected["transactions"]
+    ]
+
+
+def test_filter_csv_matches_engine_with_and_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setenv("INGEST_CHUNK_ROWS", "50")
+    transactions, rules = _filter_case()
+    _write_csv(tmp_path / "in.csv", transactions, ["date", "amount", "ceiling", "remanent"])
+    payload = IngestFilterRequest.model_validate({**rules, "input": "in.csv", "output": "out.csv"})
+    expected = _expected_filter(transactions, rules)
+
+    summary = ingest.ingest_filter(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), payload)
+    assert summary["validRows"] + summary["invalidRows"] == len(transactions)
+    _assert_filter_output(_read_csv(tmp_path / "out.csv"), transactions, expected)
+
+    monkeypatch.setattr(ingest, "pyarrow", None)
+    ingest.ingest_filter(str(tmp_path / "in.csv"), str(tmp_path / "stdlib.csv"), payload)
+    assert (tmp_path / "stdlib.csv").read_bytes() == (tmp_path / "out.csv").read_bytes()
+
+
+def test_filter_arrow_round_trip(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.feather
+
+    transactions, rules = _filter_case(seed=11)
+    columns = {name: [row[name] for row in transactions] for name in ("date", "amount", "ceiling", "remanent")}
+    pyarrow.feather.write_feather(pyarrow.table(columns), str(tmp_path / "in.arrow"))
+    payload = IngestFilterRequest.model_validate({**rules, "input": "in.arrow", "output": "out.arrow"})
+
+    ingest.ingest_filter(str(tmp_path / "in.arrow"), str(tmp_path / "out.arrow"), payload)
+    table = pyarrow.ipc.open_file(str(tmp_path / "out.arrow")).read_all().to_pylist()
+    rows = [
+        {
+            "date": row["date"].strftime(data.TIMESTAMP_FORMAT),
+            "valid": "true" if row["valid"] else "false",
+            "remanent": row["remanent"],
+            "message": row["message"],
+        }
+        for row in table
+    ]
+    _assert_filter_output(rows, transactions, _expected_filter(transactions, rules))
+
+
+def test_duplicate_dates_leave_no_output(tmp_path):
+    expenses = data.expenses(10, random.Random(1))
+    expenses[7]["date"] = expenses[2]["date"]
+    _write_csv(tmp_path / "expenses.csv", expenses, ["date", "amount"])
+
+    with pytest.raises(ValueError, match="duplicate transaction date"):
+        ingest.ingest_parse(str(tmp_path / "expenses.csv"), str(tmp_path / "parsed.csv"))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["expenses.csv"]
+
+
+def test_ingest_endpoints_stay_inside_ingest_root(client, tmp_path, monkeypatch):
+    _write_csv(tmp_path / "expenses.csv", data.expenses(20, random.Random(5)), ["date", "amount"])
+
+    monkeypatch.delenv("INGEST_ROOT", raising=False)
+    disabled = client.post(f"{BASE}/ingest/transactions:parse", json={"input": "expenses.csv", "output": "o.csv"})
+    assert disabled.status_code == 403
+
+    monkeypatch.setenv("INGEST_ROOT", str(tmp_path))
+    escaped = client.post(f"{BASE}/ingest/transactions:parse", json={"input": "../x.csv", "output": "o.csv"})
+    assert escaped.status_code == 403
+    missing = client.post(f"{BASE}/ingest/transactions:parse", json={"input": "nope.csv", "output": "o.csv"})
+    assert missing.status_code == 404
+
+    response = client.post(f"{BASE}/ingest/transactions:parse", json={"input": "expenses.csv", "output": "o.csv"})
+    assert response.status_code == 200
+    assert response.json()["rows"] == 20
+    assert response.json()["output"] == "o.csv"
+    assert len(_read_csv(tmp_path / "o.csv")) == 20
+
+    bad_rules = client.post(
+        f"{BASE}/ingest/transactions:filter",
+        json={"input": "o.csv", "output": "f.csv", "k": [{"start": "2020-01-01 00:00:00", "end": "2020-01-02 00:00:00"}]},
+    )
+    assert bad_rules.status_code == 422
+    assert "outside transaction date bounds" in bad_rules.json()["detail"]
+
+
+def test_cli_filter(tmp_path, capsys):
+    transactions, rules = _filter_case(rows=100, seed=2)
+    _write_csv(tmp_path / "in.csv", transactions, ["date", "amount", "ceiling", "remanent"])
+    (tmp_path / "rules.json").write_text(json.dumps(rules), encoding="utf-8")
+
+    code = cli_main(
+        ["ingest", "filter", str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), "--rules", str(tmp_path / "rules.json")]
+    )
+    assert code == 0
+    assert json.loads(capsys.readouterr().out)["rows"] == 100
+    _assert_filter_output(_read_csv(tmp_path / "out.csv"), transactions, _expected_filter(transactions, rules))
@@ -0,0 +1,197 @@
+# Test type: Async job API integration test
+# Validation: submit/poll/download for filter, returns and batch jobs, filter job result views, gzip result download, queue bound, expiry, cancel, restart and /performance job stats
+# Command: pytest -q test/test_jobs.py
+
+import gzip
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.repositories.sqlite_repo import SqliteJobRepository
+from app.schemas.common import TemporalFilterRequest
+from app.services.jobs import JOB_OPERATIONS, JobManager
+
+
+BASE = "/blackrock/challenge/v1"
+
+FILTER_PAYLOAD = {
+    "q": [{"fixed": 0, "start": "2023-07-01 00:00:00", "end": "2023-07-31 23:59:59"}],
+    "p": [{"extra": 25, "start": "2023-10-01 08:00:00", "end": "2023-12-17 08:09:00"}],
+    "k": [{"start": "2023-02-28 15:49:00", "end": "2023-12-17 08:09:00"}],
+    "transactions": [
+        {"date": "2023-10-12 20:15:00", "amount": 250, "ceiling": 300, "remanent": 50},
+        {"date": "2023-02-28 15:49:00", "amount": 375, "ceiling": 400, "remanent": 25},
+        {"date": "2023-07-01 21:59:00", "amount": 620, "ceiling": 700, "remanent": 80},
+        {"date": "2023-12-17 08:09:00", "amount": 480, "ceiling": 500, "remanent": 20},
+    ],
+}
+RETURNS_PAYLOAD = {"age": 29, "wage": 50000, "inflation": 0.055, **FILTER_PAYLOAD}
+
+
+def _wait(client: TestClient, job_id: str) -> dict:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(f"{BASE}/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_filter_job_result_matches_sync_endpoint(client):
+    submitted = client.post(f"{BASE}/jobs/transactions:filter", json=FILTER_PAYLOAD)
+    assert submitted.status_code == 202
+    job_id = submitted.json()["id"]
+    assert submitted.headers["location"].endswith(f"/jobs/{job_id}")
+
+    job = _wait(client, job_id)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["resultBytes"] > 0
+
+    result = client.get(f"{BASE}/jobs/{job_id}/result")
+    assert result.headers["content-encoding"] == "gzip"
+    assert result.json() == client.post(f"{BASE}/transactions:filter", json=FILTER_PAYLOAD).json()
+
+    for refused in ("identity", "gzip;q=0, identity", "gzip; q=0.0, *"):
+        plain = client.get(f"{BASE}/jobs/{job_id}/result", headers={"Accept-Encoding": refused})
+        assert "content-encoding" not in plain.headers
+        assert plain.json() == result.json()
+
+
+def test_batch_job_runs_each_item(client):
+    submitted = client.post(
+        f"{BASE}/jobs/batch",
+        json={
+            "items": [
+                {"operation": "transactions:filter", "payload": FILTER_PAYLOAD},
+                {"operation": "returns:nps", "payload": RETURNS_PAYLOAD},
+            ]
+        },
+    )
+    job = _wait(client, submitted.json()["id"])
+    assert job["status"] == "succeeded"
+    results = client.get(f"{BASE}/jobs/{job['id']}/result").json()["results"]
+    assert results[1] == client.post(f"{BASE}/returns:nps", json=RETURNS_PAYLOAD).json()
+
+
+def test_invalid_job_payload_is_rejected_before_queueing(client):
+    response = client.post(f"{BASE}/jobs/batch", json={"items": [{"operation": "nope", "payload": {}}]})
+    assert response.status_code == 422
+
+
+def test_failed_job_reports_error(client):
+    payload = {**FILTER_PAYLOAD, "q": [{"fixed": 0, "start": "2023-08-01 00:00:00", "end": "2023-07-01 00:00:00"}]}
+    job = _wait(client, client.post(f"{BASE}/jobs/transactions:filter", json=payload).json()["id"])
+    assert job["status"] == "failed"
+    assert job["error"]
+    assert client.get(f"{BASE}/jobs/{job['id']}/result").status_code == 409
+
+
+def test_queue_bound_and_result_expiry(monkeypatch):
+    monkeypatch.setenv("JOB_MAX_QUEUED", "0")
+    with TestClient(app) as client:
+        response = client.post(f"{BASE}/jobs/transactions:filter", json=FILTER_PAYLOAD)
+        assert response.status_code == 503
+        assert "retry-after" in response.headers
+
+    monkeypatch.setenv("JOB_MAX_QUEUED", "4")
+    monkeypatch.setenv("JOB_RESULT_TTL_SECONDS", "0.2")
+    with TestClient(app) as client:
+        job = _wait(client, client.post(f"{BASE}/jobs/transactions:filter", json=FILTER_PAYLOAD).json()["id"])
+        assert job["status"] == "succeeded"
+        time.sleep(0.3)
+        assert client.get(f"{BASE}/jobs/{job['id']}").json()["status"] == "expired"
+        assert client.get(f"{BASE}/jobs/{job['id']}/result").status_code == 410
+
+
+def test_performance_reports_job_stats(client):
+    _wait(client, client.post(f"{BASE}/jobs/returns:index", json=RETURNS_PAYLOAD).json()["id"])
+    jobs = client.get(f"{BASE}/performance").json()["jobs"]
+    assert jobs["succeeded"] >= 1
+    assert jobs["throughputPerMin"] >= 1
+    assert {"queued", "running", "avgQueueMs", "p99QueueMs", "avgRunMs"} <= set(jobs)
+
+
+def test_job_manager_stores_gzip_results(tmp_path):
+    manager = JobManager(SqliteJobRepository(str(tmp_path / "jobs.db")))
+    manager.initialize()
+    job = manager.submit("transactions:filter", TemporalFilterRequest.model_validate(FILTER_PAYLOAD))
+    deadline = time.monotonic() + 10
+    while manager.get(job["id"])["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.02)
+    manager.shutdown()
+    assert manager.get(job["id"])["status"] == "succeeded"
+    assert json.loads(gzip.decompress(manager.result(job["id"])))["valid"]
+
+
+def test_cancel_reports_the_current_status(client):
+    elsewhere = uuid.uuid4().hex
+    app.state.jobs.repo.create_job(elsewhere, "transactions:filter", time.time())
+    assert client.delete(f"{BASE}/jobs/{elsewhere}").status_code == 409
+
+    blocker = threading.Event()
+    started = threading.Event()
+
+    def slow(engine, payload, cancel):
+        started.set()
+        blocker.wait(5)
+        cancel.check()
+        return "{}"
+
+    with patch.dict(JOB_OPERATIONS, {"transactions:filter": slow}):
+        job_id = client.post(f"{BASE}/jobs/transactions:filter", json=FILTER_PAYLOAD).json()["id"]
+        assert started.wait(5)
+        assert client.delete(f"{BASE}/jobs/{job_id}").json()["status"] == "running"
+        blocker.set()
+        assert _wait(client, job_id)["status"] == "cancelled"
+
+
+def test_restart_fails_unfinished_jobs_and_rolls_back_failed_submits(tmp_path, monkeypatch):
+    repo = SqliteJobRepository(str(tmp_path / "jobs.db"))
+    repo.initialize()
+    repo.create_job("stale", "returns:nps", time.time() - 5)
+    repo.start_job("stale", time.time() - 4)
+    manager = JobManager(repo)
+    manager.initialize()
+    stale = manager.get("stale")
+    assert stale["status"] == "failed" and stale["error"] == "server restarted before the job finished"
+    assert stale["expiresAt"] > time.time()
+
+    def broken(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(repo, "create_job", broken)
+    with pytest.raises(sqlite3.OperationalError):
+        manager.submit("transactions:filter", TemporalFilterRequest.model_validate(FILTER_PAYLOAD))
+    assert manager.queued == 0 and manager.stats["submitted"] == 0
+    manager.shutdown()
+
+
+@pytest.mark.parametrize("view", [{"fields": ["date", "remanent"]}, {"summaryOnly": True}])
+def test_filter_job_applies_the_result_view(client, view):
+    payload = {**FILTER_PAYLOAD, **view}
+    job = _wait(client, client.post(f"{BASE}/jobs/transactions:filter", json=payload).json()["id"])
+    assert job["status"] == "succeeded"
+    expected = client.post(f"{BASE}/transactions:filter", json=payload).json()
+    assert client.get(f"{BASE}/jobs/{job['id']}/result").json() == expected
+
+    batch = {"items": [{"operation": "transactions:filter", "payload": payload}]}
+    job = _wait(client, client.post(f"{BASE}/jobs/batch", json=batch).json()["id"])
+    assert client.get(f"{BASE}/jobs/{job['id']}/result").json() == {"results": [expected]}
+
+
+def test_filter_job_rejects_page_size(client):
+    payload = {**FILTER_PAYLOAD, "pageSize": 2}
+    response = client.post(f"{BASE}/jobs/transactions:filter", json=payload)
+    assert response.status_code == 422
+    assert "pageSize" in response.text
+    batch = {"items": [{"operation": "transactions:filter", "payload": payload}]}
+    assert client.post(f"{BASE}/jobs/batch", json=batch).status_code == 422
@@ -0,0 +1,120 @@
+# Test type: API integration and multiprocess test
+# Validation: /metrics request, scheduler, job, thread, rate-limit, cache and process series; worker file aggregation
+# Command: pytest -q test/test_metrics.py
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Metrics, MetricsMiddleware
+from app.core.security import RateLimitMiddleware
+
+
+BASE = "/blackrock/challenge/v1"
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _samples(text: str) -> dict[str, float]:
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics_endpoint_reports_requests_and_process_stats(client):
+    route = f"{BASE}/transactions:parse"
+    before = _samples(client.get("/metrics").text)
+    key = f'app_requests_total{{route="{route}",method="POST",status="200"}}'
+    for _ in range(3):
+        client.post(route, json={"expenses": [{"date": "2023-01-01 00:00:00", "amount": 5}]})
+    client.post(route, json={"expenses": "nope"})
+
+    response = client.get("/metrics", headers={"Accept": "application/openmetrics-text"})
+    assert response.headers["content-type"].startswith("application/openmetrics-text")
+    assert response.text.endswith("# EOF\n")
+    samples = _samples(response.text)
+    assert samples[key] - before.get(key, 0) == 3
+    assert samples[f'app_requests_total{{route="{route}",method="POST",status="422"}}'] >= 1
+    labels = f'route="{route}",method="POST",status="200"'
+    assert samples[f'app_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == samples[key]
+    assert samples[f"app_request_duration_seconds_count{{{labels}}}"] == samples[key]
+    prefix = f"app_request_duration_seconds_bucket{{{labels}"
+    buckets = [value for name, value in samples.items() if name.startswith(prefix)]
+    assert buckets == sorted(buckets)
+
+    assert samples['app_scheduler_queue_depth{lane="small"}'] == 0
+    assert samples['app_scheduler_completed_total{lane="small"}'] >= 3
+    pid = os.getpid()
+    assert samples[f'process_resident_memory_bytes{{pid="{pid}"}}'] > 0
+    assert f'python_gc_collections_total{{pid="{pid}",generation="0"}}' in samples
+    assert f'app_cache_hits_total{{cache="day_epoch",pid="{pid}"}}' in samples
+    assert samples["app_jobs_queued"] == samples["app_jobs_running"] == 0
+    assert samples["app_threads_limit"] >= 1 and 0 <= samples["app_threads_busy"] <= samples["app_threads_limit"]
+
+    plain = client.get("/metrics")
+    assert plain.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE app_requests_total counter" in plain.text and "# EOF" not in plain.text
+
+
+def test_rate_limit_rejections_are_counted(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_PER_MIN", "2")
+    metrics = Metrics()
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, metrics=metrics)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    with TestClient(app) as test_client:
+        statuses = [test_client.get("/ping").status_code for _ in range(4)]
+    assert statuses == [200, 200, 429, 429]
+    samples = _samples(metrics.render())
+    assert samples["app_rate_limited_total"] == 2
+    assert samples['app_requests_total{route="other",method="GET",status="429"}'] == 2
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc("app_cache_hits_total", cache='a"b\\c\nd')
+    assert 'app_cache_hits_total{cache="a\\"b\\\\c\\nd"} 1' in metrics.render()
+
+
+WORKER = """
+import sys
+from app.core.metrics import Metrics
+metrics = Metrics(sys.argv[1])
+for _ in range(int(sys.argv[2])):
+    metrics.inc("app_requests_total", route="/x", method="GET", status="200")
+    metrics.observe("app_request_duration_seconds", 0.02, route="/x", method="GET", status="200")
+metrics.set("app_scheduler_queue_depth", 7, lane="small")
+metrics.collect()
+"""
+
+
+def test_worker_files_are_aggregated(tmp_path):
+    for count in (5, 1200):
+        subprocess.run([sys.executable, "-c", WORKER, str(tmp_path), str(count)], cwd=ROOT, check=True)
+    metrics = Metrics(str(tmp_path))
+    metrics.inc("app_requests_total", route="/x", method="GET", status="200")
+    metrics.set("app_scheduler_queue_depth", 2, lane="small")
+
+    text = metrics.render()
+    samples = _samples(text)
+    labels = 'route="/x",method="GET",status="200"'
+    assert samples[f"app_requests_total{{{labels}}}"] == 1206
+    assert samples[f'app_request_duration_seconds_bucket{{{labels},le="0.025"}}'] == 1205
+    assert samples[f"app_request_duration_seconds_sum{{{labels}}}"] == pytest.approx(1205 * 0.02)
+    # The two worker processes have exited: their gauges and per-process series are gone.
+    assert samples['app_scheduler_queue_depth{lane="small"}'] == 2
+    assert set(re.findall(r'process_resident_memory_bytes\{pid="(\d+)"\}', text)) == {str(os.getpid())}
+    assert len(list(tmp_path.glob("metrics_*.db"))) == 3
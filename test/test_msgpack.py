@@ -0,0 +1,117 @@
+# Test type: Content negotiation integration test
+# Validation: MessagePack request/response parity with JSON, compact profile (epoch seconds + cents, summaries included), identical 422s, transport benchmark
+# Command: pytest -q test/test_msgpack.py
+
+import msgpack
+
+from app.api.negotiation import from_compact, to_compact
+from benchmarks.transport import run_transport
+
+
+BASE = "/blackrock/challenge/v1"
+RETURNS_PAYLOAD = {
+    "age": 29,
+    "wage": 50000,
+    "inflation": 0.055,
+    "q": [{"fixed": 0, "start": "2023-07-01 00:00:00", "end": "2023-07-31 23:59:59"}],
+    "p": [{"extra": 25, "start": "2023-10-01 08:00:00", "end": "2023-12-17 08:09:00"}],
+    "k": [{"start": "2023-02-28 15:49:00", "end": "2023-12-17 08:09:00"}],
+    "transactions": [
+        {"date": "2023-10-12 20:15:00", "amount": 250, "ceiling": 300, "remanent": 50},
+        {"date": "2023-02-28 15:49:00", "amount": 375.5, "ceiling": 400, "remanent": 24.5},
+        {"date": "2023-07-01 21:59:00", "amount": 620, "ceiling": 700, "remanent": 80},
+        {"date": "2023-12-17 08:09:00", "amount": 480, "ceiling": 500, "remanent": 20},
+    ],
+}
+
+
+def test_plain_msgpack_matches_json(client):
+    expected = client.post(f"{BASE}/returns:nps", json=RETURNS_PAYLOAD).json()
+    response = client.post(
+        f"{BASE}/returns:nps",
+        content=msgpack.packb(RETURNS_PAYLOAD),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == expected
+
+
+def test_compact_profile_uses_epoch_seconds_and_cents(client):
+    expected = client.post(f"{BASE}/transactions:filter", json=RETURNS_PAYLOAD).json()
+    compact = to_compact(RETURNS_PAYLOAD)
+    assert compact["transactions"][1] == {"date": 1677599340, "amount": 37550, "ceiling": 40000, "remanent": 2450}
+
+    media_type = "application/msgpack; profile=compact"
+    response = client.post(
+        f"{BASE}/transactions:filter",
+        content=msgpack.packb(compact),
+        headers={"Content-Type": media_type, "Accept": media_type},
+    )
+    assert response.status_code == 200
+    body = msgpack.unpackb(response.content)
+    assert isinstance(body["valid"][0]["date"], int)
+    assert isinstance(body["valid"][0]["remanent"], int)
+    assert from_compact(body) == expected
+
+
+def test_compact_response_for_dates_without_zero_padding(client):
+    payload = {"transactions": [{"date": "2023-2-28 15:49:0", "amount": 375.5, "ceiling": 400, "remanent": 24.5}]}
+    assert client.post(f"{BASE}/transactions:filter", json=payload).status_code == 200
+    response = client.post(
+        f"{BASE}/transactions:filter", json=payload, headers={"Accept": "application/msgpack; profile=compact"}
+    )
+    assert response.status_code == 200
+    assert msgpack.unpackb(response.content)["valid"][0]["date"] == 1677599340
+    assert to_compact({"start": "2023-1-5 3:4:5"}) == to_compact({"start": "2023-01-05 03:04:05"})
+
+
+def _compact_post(client, endpoint, payload):
+    media_type = "application/msgpack; profile=compact"
+    response = client.post(
+        f"{BASE}/{endpoint}",
+        content=msgpack.packb(to_compact(payload)),
+        headers={"Content-Type": media_type, "Accept": media_type},
+    )
+    assert response.status_code == 200
+    return msgpack.unpackb(response.content, strict_map_key=False)
+
+
+def test_compact_summary_totals_are_cents(client):
+    payload = {**RETURNS_PAYLOAD, "summaryOnly": True}
+    expected = client.post(f"{BASE}/transactions:filter", json=payload).json()
+    body = _compact_post(client, "transactions:filter", payload)
+    assert body["summary"]["valid"]["totalAmount"] == round(expected["summary"]["valid"]["totalAmount"] * 100)
+    assert all(isinstance(value, int) for value in body["summary"]["valid"].values())
+    assert from_compact(body) == expected
+
+
+def test_validation_errors_match_json_path(client):
+    bad = {"expenses": [{"date": "2023-13-40 00:00:00", "amount": -5}]}
+    as_json = client.post(f"{BASE}/transactions:parse", json=bad)
+    as_msgpack = client.post(
+        f"{BASE}/transactions:parse", content=msgpack.packb(bad), headers={"Content-Type": "application/msgpack"}
+    )
+    assert as_json.status_code == as_msgpack.status_code == 422
+    assert [error["loc"] for error in as_json.json()["detail"]] == [
+        error["loc"] for error in as_msgpack.json()["detail"]
+    ]
+
+
+def test_malformed_msgpack_is_422(client):
+    response = client.post(
+        f"{BASE}/transactions:parse", content=b"\xc1\xc1", headers={"Content-Type": "application/msgpack"}
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "msgpack_invalid"
+
+
+def test_json_remains_default(client):
+    response = client.post(f"{BASE}/returns:index", json=RETURNS_PAYLOAD, headers={"Accept": "application/json"})
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_transport_benchmark_reports_each_format():
+    report = run_transport(50, repeat=1)
+    assert [row["format"] for row in report] == ["json", "msgpack", "msgpack-compact"]
+    assert report[2]["requestBytes"] < report[0]["requestBytes"]
@@ -0,0 +1,104 @@
+# Test type: API integration test
+# Validation: pipeline outputs equal the four chained single-stage endpoints, output subsets, Decimal fallback, errors
+# Command: pytest -q test/test_pipeline.py
+
+import random
+
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _payload(rows: int = 600, **overrides):
+    rng = random.Random(43)
+    expenses = data.expenses(rows, rng)
+    # Whole-hundred amounts at both ends keep the validator from dropping the date bounds the rules use.
+    expenses[0]["amount"] = 300
+    expenses[-1]["amount"] = 1200
+    rng.shuffle(expenses)
+    payload = {
+        "expenses": expenses,
+        "wage": 75,
+        "maxInvest": 60,
+        "age": 29,
+        "inflation": 0.055,
+        "channels": ["nps", "index"],
+        "kMode": "strict",
+        "outputs": ["parse", "validator", "filter", "returns"],
+        **data.rule_set("dense", rows, rng),
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _chained(client, payload):
+    rules = {key: payload[key] for key in ("q", "p", "k", "kMode")}
+    parsed = client.post(f"{BASE}/transactions:parse", json={"expenses": payload["expenses"]}).json()
+    validated = client.post(
+        f"{BASE}/transactions:validator",
+        json={"wage": payload["wage"], "maxInvest": payload["maxInvest"], "transactions": parsed["transactions"]},
+    ).json()
+    filtered = client.post(f"{BASE}/transactions:filter", json={**rules, "transactions": validated["valid"]}).json()
+    returns = [
+        client.post(
+            f"{BASE}/returns:{channel}",
+            json={
+                "age": payload["age"],
+                "wage": payload["wage"],
+                "inflation": payload["inflation"],
+                **rules,
+                "transactions": validated["valid"],
+            },
+        ).json()
+        for channel in payload["channels"]
+    ]
+    return {"parse": parsed, "validator": validated, "filter": filtered, "returns": returns}
+
+
+def test_pipeline_matches_chained_endpoints(client):
+    payload = _payload()
+    response = client.post(f"{BASE}/pipeline", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    expected = _chained(client, payload)
+    assert body == expected
+    assert body["validator"]["invalid"] and body["filter"]["invalid"]
+
+
+def test_non_canonical_inputs_use_the_decimal_stages(client):
+    payload = _payload(rows=200)
+    payload["expenses"][5]["amount"] = 10.005
+    response = client.post(f"{BASE}/pipeline", json=payload)
+    assert response.status_code == 200
+    assert response.json() == _chained(client, payload)
+
+    short_date = _payload(rows=200)
+    period = short_date["k"][0]
+    short_date["k"].append({"start": period["start"], "end": period["end"].replace("-01-", "-1-", 1)})
+    assert short_date["k"][-1]["end"] != period["end"]
+    response = client.post(f"{BASE}/pipeline", json=short_date)
+    assert response.status_code == 200
+    assert response.json() == _chained(client, short_date)
+
+
+def test_only_requested_outputs_are_returned(client):
+    payload = _payload(rows=200, outputs=["validator"], age=None, inflation=None)
+    body = client.post(f"{BASE}/pipeline", json=payload).json()
+    assert body["parse"] is None and body["filter"] is None and body["returns"] is None
+    assert len(body["validator"]["valid"]) + len(body["validator"]["invalid"]) == 200
+
+    returns_only = client.post(f"{BASE}/pipeline", json=_payload(rows=200, outputs=["returns"])).json()
+    assert returns_only["parse"] is None and [item["channel"] for item in returns_only["returns"]] == ["nps", "index"]
+
+
+def test_pipeline_errors(client):
+    duplicate = _payload(rows=50)
+    duplicate["expenses"].append(dict(duplicate["expenses"][0]))
+    response = client.post(f"{BASE}/pipeline", json=duplicate)
+    assert response.status_code == 422
+    assert response.json()["detail"] == "duplicate transaction date found in expenses"
+
+    assert client.post(f"{BASE}/pipeline", json=_payload(rows=50, age=None)).status_code == 422
+    assert client.post(f"{BASE}/pipeline", json=_payload(rows=50, channels=["bonds"])).status_code == 422
+    assert client.post(f"{BASE}/pipeline", json=_payload(rows=50, outputs=[])).status_code == 422
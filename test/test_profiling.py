@@ -0,0 +1,84 @@
+# Test type: Observability integration test
+# Validation: Server-Timing stage breakdown, stage persistence in request_metrics, and admin-only request profiling
+# Command: pytest -q test/test_profiling.py
+
+import json
+import marshal
+import sqlite3
+
+FILTER_PAYLOAD = {
+    "q": [{"fixed": 0, "start": "2023-07-01 00:00:00", "end": "2023-07-31 23:59:59"}],
+    "p": [{"extra": 25, "start": "2023-10-01 08:00:00", "end": "2023-12-17 08:09:00"}],
+    "k": [{"start": "2023-03-01 00:00:00", "end": "2023-11-30 23:59:59"}],
+    "transactions": [
+        {"date": "2023-10-12 20:15:00", "amount": 250, "ceiling": 300, "remanent": 50},
+        {"date": "2023-02-28 15:49:00", "amount": 375, "ceiling": 400, "remanent": 25},
+        {"date": "2023-07-01 21:59:00", "amount": 620, "ceiling": 700, "remanent": 80},
+        {"date": "2023-12-17 08:09:00", "amount": 480, "ceiling": 500, "remanent": 20},
+    ],
+}
+
+
+def _server_timing(response) -> dict:
+    stages = {}
+    for part in response.headers["server-timing"].split(","):
+        name, duration = part.strip().split(";dur=")
+        stages[name] = float(duration)
+    return stages
+
+
+def test_returns_emits_stage_breakdown(client):
+    payload = {"age": 29, "wage": 50000, "inflation": 0.055, **FILTER_PAYLOAD}
+    response = client.post("/blackrock/challenge/v1/returns:nps", json=payload)
+    assert response.status_code == 200
+    stages = _server_timing(response)
+    for name in ("validation", "dates", "rules", "sort", "sweep", "aggregate", "plugin", "serialize", "total"):
+        assert name in stages
+    assert stages["total"] >= stages["sweep"]
+
+
+def test_stages_are_stored_with_metrics_row(client):
+    response = client.post("/blackrock/challenge/v1/transactions:filter", json=FILTER_PAYLOAD)
+    assert response.status_code == 200
+    with sqlite3.connect(client.app.state.metrics_repo.db_path) as conn:
+        endpoint, stages = conn.execute(
+            "SELECT endpoint, stages FROM request_metrics ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    assert endpoint == "transactions:filter"
+    stored = json.loads(stages)
+    assert {"validation", "sweep", "serialize"} <= set(stored)
+
+
+def test_profiling_requires_admin_key(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_API_KEY", "admin-secret")
+    response = client.post(
+        "/blackrock/challenge/v1/transactions:filter",
+        json=FILTER_PAYLOAD,
+        headers={"X-Profile": "1", "X-Admin-Key": "wrong"},
+    )
+    assert response.status_code == 403
+
+
+def test_profiled_request_can_be_downloaded(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_API_KEY", "admin-secret")
+    admin = {"X-Admin-Key": "admin-secret"}
+    response = client.post(
+        "/blackrock/challenge/v1/transactions:filter",
+        json=FILTER_PAYLOAD,
+        headers={"X-Profile": "1", **admin},
+    )
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    summary = client.get(f"/blackrock/challenge/v1/profiles/{profile_id}", headers=admin)
+    assert summary.status_code == 200
+    assert "filter_temporal_rows" in summary.text
+    assert "tracemalloc" in summary.text
+
+    raw = client.get(f"/blackrock/challenge/v1/profiles/{profile_id}?format=pstats", headers=admin)
+    assert raw.status_code == 200
+    stats = marshal.loads(raw.content)
+    assert any(func[2] == "filter_temporal_rows" for func in stats)
+
+    assert client.get(f"/blackrock/challenge/v1/profiles/{profile_id}").status_code == 403
+    assert client.get("/blackrock/challenge/v1/profiles/missing", headers=admin).status_code == 404
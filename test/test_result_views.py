@@ -0,0 +1,122 @@
+# Test type: API integration test
+# Validation: summary totals, field projection and cursor pages equal the full filter/validator results; cursor expiry and byte budget
+# Command: pytest -q test/test_result_views.py
+
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+from app.services.results import ROW_BYTES, ResultCursors
+from app.services.rows import RowStream
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _requests(sub_cent: bool = False) -> dict:
+    rng = random.Random(45)
+    transactions = data.transactions(300, rng, shuffle=True)
+    for tx in rng.sample(transactions, 20):
+        tx["remanent"] = round(tx["remanent"] + 0.01, 2)
+    if sub_cent:
+        transactions[3]["amount"] = round(transactions[3]["amount"] - 0.005, 3)
+        transactions[3]["remanent"] = round(transactions[3]["remanent"] + 0.005, 3)
+    return {
+        "transactions:filter": {**data.rule_set("dense", 300, rng), "kMode": "strict", "transactions": transactions},
+        "transactions:validator": {"wage": 60, "transactions": transactions},
+    }
+
+
+def _total(rows: list[dict], name: str) -> float:
+    total = sum((Decimal(str(row[name])) for row in rows), Decimal("0"))
+    return float(total.quantize(Decimal("0.01"), ROUND_HALF_UP))
+
+
+@pytest.mark.parametrize("sub_cent", [False, True])
+def test_summary_only_matches_full_result(client, sub_cent):
+    for endpoint, payload in _requests(sub_cent).items():
+        full = client.post(f"{BASE}/{endpoint}", json=payload).json()
+        response = client.post(f"{BASE}/{endpoint}", json={**payload, "summaryOnly": True})
+        assert response.status_code == 200
+        summary = response.json()["summary"]
+        assert set(summary) == set(full)
+        for name, rows in full.items():
+            assert summary[name] == {
+                "count": len(rows),
+                "totalAmount": _total(rows, "amount"),
+                "totalCeiling": _total(rows, "ceiling"),
+                "totalRemanent": _total(rows, "remanent"),
+            }
+
+
+def test_projection_keeps_requested_fields_and_messages(client):
+    for endpoint, payload in _requests().items():
+        full = client.post(f"{BASE}/{endpoint}", json=payload).json()
+        projected = client.post(f"{BASE}/{endpoint}", json={**payload, "fields": ["date", "remanent"]}).json()
+        assert projected["valid"] == [{"date": row["date"], "remanent": row["remanent"]} for row in full["valid"]]
+        assert projected["invalid"] == [
+            {"date": row["date"], "remanent": row["remanent"], "message": row["message"]} for row in full["invalid"]
+        ]
+
+
+@pytest.mark.parametrize("min_rows", ["1", "10000"])
+def test_cursor_pages_cover_the_full_result(client, monkeypatch, min_rows):
+    monkeypatch.setenv("STREAM_MIN_ROWS", min_rows)
+    for endpoint, payload in _requests().items():
+        full = client.post(f"{BASE}/{endpoint}", json=payload).json()
+        page = client.post(f"{BASE}/{endpoint}", json={**payload, "pageSize": 70, "fields": ["date"]}).json()
+        collected = {name: [] for name in full}
+        pages = 0
+        while True:
+            pages += 1
+            for name in full:
+                assert len(page[name]) <= 70
+                collected[name].extend(page[name])
+            if page["nextCursor"] is None:
+                break
+            page = client.get(f"{BASE}/results/{page['nextCursor']}").json()
+        assert pages == -(-max(len(rows) for rows in full.values()) // 70)
+        expected = {
+            name: [{key: row[key] for key in ("date", "message") if key in row} for row in rows]
+            for name, rows in full.items()
+        }
+        assert collected == expected
+
+
+def test_view_options_are_validated_and_cursors_expire(client):
+    payload = _requests()["transactions:filter"]
+    combined = {**payload, "summaryOnly": True, "pageSize": 5}
+    assert client.post(f"{BASE}/transactions:filter", json=combined).status_code == 422
+    assert client.post(f"{BASE}/transactions:filter", json={**payload, "fields": ["message"]}).status_code == 422
+    assert client.get(f"{BASE}/results/unknown.10").status_code == 404
+
+    cursors = ResultCursors(ttl_seconds=0)
+    first = cursors.first_page({"valid": RowStream.from_list([{"date": "x"}] * 3)}, 1)
+    assert cursors.page(first["nextCursor"]) is None and len(cursors) == 0
+
+
+def test_pages_build_only_their_rows():
+    built = []
+
+    def build(start, stop):
+        built.append((start, stop))
+        return [{"index": i} for i in range(start, stop)]
+
+    cursors = ResultCursors(ttl_seconds=60)
+    page = cursors.first_page({"valid": RowStream(1000, build)}, 10)
+    second = cursors.page(page["nextCursor"])
+    assert list(second["valid"]) == [{"index": i} for i in range(10, 20)]
+    assert built == [(10, 20)]
+
+
+def test_cursors_drop_the_oldest_results_beyond_the_byte_budget():
+    cursors = ResultCursors(ttl_seconds=60, max_bytes=250 * ROW_BYTES)
+    rows = RowStream.from_list([{"date": "x"}] * 100)
+    first, second = (cursors.first_page({"valid": rows, "invalid": rows}, 1) for _ in range(2))
+    assert cursors.page(first["nextCursor"]) is None and cursors.page(second["nextCursor"]) is not None
+    assert cursors.held_bytes == 200 * ROW_BYTES
+
+    oversized = cursors.first_page({"valid": RowStream.from_list([{"date": "x"}] * 1000)}, 1)
+    assert cursors.page(oversized["nextCursor"]) is not None and len(cursors) == 1
@@ -0,0 +1,181 @@
+# Test type: Multi-process integration test
+# Validation: scattered filter/returns equal one instance; retries, local fallback, deadlines, shard checks
+# Command: pytest -q test/test_scatter.py
+
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.core.cancellation import CancellationToken, OperationCancelled
+from app.main import app
+from app.schemas.common import ReturnsRequest, TemporalFilterRequest
+from app.services.engine import SavingsEngine
+from app.services.rows import materialize
+from app.services.scatter import ScatterCoordinator
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+ROOT = Path(__file__).resolve().parents[1]
+SECRET = "peer-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def peers(tmp_path_factory):
+    patch = pytest.MonkeyPatch()
+    patch.setenv("SCATTER_SECRET", SECRET)
+    processes, urls = [], []
+    for number in range(2):
+        port = _free_port()
+        env = {
+            **os.environ,
+            "DB_PATH": str(tmp_path_factory.mktemp("peer") / "app.db"),
+            "STARTUP_WARMUP": "0",
+            "SCATTER_PEERS": "",
+        }
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+        processes.append(subprocess.Popen(command, cwd=ROOT, env=env))
+        urls.append(f"http://127.0.0.1:{port}")
+    try:
+        deadline = time.monotonic() + 30
+        for url in urls:
+            while True:
+                try:
+                    if httpx.get(f"{url}{BASE}/performance").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                assert time.monotonic() < deadline, "peer did not start"
+                time.sleep(0.1)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+        patch.undo()
+
+
+def _payload(rows=3000, seed=50, **overrides):
+    rng = random.Random(seed)
+    payload = {
+        "age": 30,
+        "wage": 80000,
+        "inflation": 0.055,
+        **data.rule_set("dense", rows, rng),
+        "kMode": "strict",
+        "transactions": data.transactions(rows, rng, shuffle=True),
+    }
+    # Equal starts across shard boundaries: the earlier rule in the list must still win.
+    payload["q"].append({**payload["q"][0], "fixed": 1.23})
+    payload.update(overrides)
+    return payload
+
+
+def _filter(engine_or_coordinator, payload):
+    request = TemporalFilterRequest.model_validate({key: value for key, value in payload.items() if key != "age"})
+    if isinstance(engine_or_coordinator, ScatterCoordinator):
+        return materialize(engine_or_coordinator.filter_rows(SavingsEngine(), request))
+    return engine_or_coordinator.filter_temporal_constraints(request)
+
+
+def test_scattered_filter_and_returns_match_one_instance(peers):
+    coordinator = ScatterCoordinator(peers, min_rows=1)
+    for payload in (_payload(), _payload(kMode="grouping"), _payload(k=_payload()["k"][:1])):
+        assert _filter(coordinator, payload) == _filter(SavingsEngine(), payload)
+        returns = ReturnsRequest.model_validate(payload)
+        for channel in ("nps", "index"):
+            expected = SavingsEngine().calculate_returns(returns, channel)
+            assert coordinator.calculate_returns(SavingsEngine(), returns, channel) == expected
+    stats = coordinator.snapshot()
+    assert stats["requests"] == 9 and stats["shards"] == 18
+    assert stats["retried"] == stats["local"] == 0
+
+
+def test_failed_shards_retry_on_another_peer_then_run_locally(peers):
+    dead = f"http://127.0.0.1:{_free_port()}"
+    coordinator = ScatterCoordinator([dead, *peers], min_rows=1)
+    payload = _payload()
+    assert _filter(coordinator, payload) == _filter(SavingsEngine(), payload)
+    stats = coordinator.snapshot()
+    assert stats["shards"] == 3 and stats["retried"] == 1 and stats["local"] == 0
+    assert stats["peerFailures"] == {dead: 1, peers[0]: 0, peers[1]: 0}
+
+    offline = ScatterCoordinator([dead], min_rows=1)
+    returns = ReturnsRequest.model_validate(payload)
+    expected = SavingsEngine().calculate_returns(returns, "nps")
+    assert offline.calculate_returns(SavingsEngine(), returns, "nps") == expected
+    assert offline.snapshot()["local"] == 1
+
+
+def test_rule_errors_and_local_only_inputs(peers):
+    coordinator = ScatterCoordinator(peers, min_rows=1)
+    outside = _payload(p=[{"start": "2022-12-31 00:00:00", "end": "2023-01-01 00:00:00", "extra": 1}])
+    with pytest.raises(ValueError, match=r"p\[0\] is outside transaction date bounds"):
+        _filter(coordinator, outside)
+    sub_cent = _payload()
+    sub_cent["transactions"][0] = {**sub_cent["transactions"][0], "amount": 1.005, "ceiling": 100, "remanent": 98.995}
+    assert _filter(coordinator, sub_cent) == _filter(SavingsEngine(), sub_cent)
+    assert coordinator.snapshot()["requests"] == 0
+
+
+def test_api_routes_scatter_to_peers(client, peers, monkeypatch):
+    monkeypatch.setattr(app.state, "coordinator", ScatterCoordinator(peers, min_rows=1000))
+    payload = _payload()
+    single = ScatterCoordinator([], min_rows=1)
+    filtered = client.post(f"{BASE}/transactions:filter", json=payload)
+    assert filtered.status_code == 200
+    assert filtered.json() == _filter(single, payload)
+    returns = client.post(f"{BASE}/returns:index", json=payload).json()
+    assert returns == SavingsEngine().calculate_returns(ReturnsRequest.model_validate(payload), "index")
+    small = client.post(f"{BASE}/transactions:filter", json=_payload(rows=50)).json()
+    assert small == _filter(SavingsEngine(), _payload(rows=50))
+
+    scatter = client.get(f"{BASE}/performance").json()["scatter"]
+    assert scatter["peers"] == 2 and scatter["requests"] == 2 and scatter["shards"] == 4
+    uneven = {"epochs": [0], "amount": [1], "ceiling": [], "remanent": [1]}
+    assert client.post(f"{BASE}/shards:filter", json=uneven).status_code == 403
+
+
+def test_shard_endpoint_requires_the_secret_and_checks_its_input(client, peers):
+    shard = {"epochs": [0], "amount": [25000], "ceiling": [30000], "remanent": [5000]}
+    assert client.post(f"{BASE}/shards:filter", json=shard).status_code == 403
+    wrong = client.post(f"{BASE}/shards:filter", json=shard, headers={"x-scatter-secret": "nope"})
+    assert wrong.status_code == 403
+    headers = {"x-scatter-secret": SECRET}
+    accepted = client.post(f"{BASE}/shards:filter", json=shard, headers=headers)
+    assert accepted.json() == {"remanent": [5000], "codes": [0]}
+
+    reversed_q = {**shard, "q": {"starts": [10], "ends": [5], "values": [0]}}
+    response = client.post(f"{BASE}/shards:filter", json=reversed_q, headers=headers)
+    assert response.status_code == 422 and response.json()["detail"] == "q[0] has start > end"
+    for bad in ({**shard, "epochs": [2**63]}, {**shard, "p": {"starts": [0], "ends": [2**64], "values": [1]}}):
+        assert client.post(f"{BASE}/shards:filter", json=bad, headers=headers).status_code == 422
+    many = {name: [0] * 1_000_000 for name in ("epochs", "amount", "ceiling", "remanent")}
+    assert client.post(f"{BASE}/shards:filter", json=many, headers=headers).status_code == 422
+
+
+def test_shards_stop_at_the_request_deadline():
+    # A peer that accepts connections but never answers.
+    with socket.socket() as silent:
+        silent.bind(("127.0.0.1", 0))
+        silent.listen()
+        coordinator = ScatterCoordinator([f"http://127.0.0.1:{silent.getsockname()[1]}"], min_rows=1)
+        request = TemporalFilterRequest.model_validate({"transactions": _payload(rows=20)["transactions"]})
+        started = time.monotonic()
+        with pytest.raises(OperationCancelled):
+            coordinator.filter_rows(SavingsEngine(), request, CancellationToken.with_timeout(300))
+        assert time.monotonic() - started < 2
+        coordinator.close()
@@ -0,0 +1,62 @@
+# Test type: Scheduler unit/integration test
+# Validation: size/endpoint classification, lane isolation between large and small work, and per-lane queue metrics
+# Command: pytest -q test/test_scheduler.py
+
+import threading
+import time
+
+import anyio
+
+from app.core.scheduler import Scheduler
+
+
+def _scheduler(monkeypatch) -> Scheduler:
+    monkeypatch.setenv("SCHEDULER_LARGE_BYTES", "1000")
+    monkeypatch.setenv("SCHEDULER_LARGE_ENDPOINTS", "returns:index")
+    monkeypatch.setenv("SCHEDULER_SMALL_CONCURRENCY", "2")
+    monkeypatch.setenv("SCHEDULER_LARGE_CONCURRENCY", "1")
+    return Scheduler()
+
+
+def test_classify_by_size_and_endpoint(monkeypatch):
+    scheduler = _scheduler(monkeypatch)
+    assert scheduler.classify("transactions:parse", 10).name == "small"
+    assert scheduler.classify("transactions:parse", 1000).name == "large"
+    assert scheduler.classify("returns:index", 10).name == "large"
+
+
+def test_small_work_is_not_blocked_by_saturated_large_lane(monkeypatch):
+    scheduler = _scheduler(monkeypatch)
+    large = scheduler.classes["large"]
+    small = scheduler.classes["small"]
+    release = threading.Event()
+    small_latency = {}
+
+    async def scenario():
+        async with anyio.create_task_group() as group:
+            group.start_soon(scheduler.run, large, release.wait)
+            group.start_soon(scheduler.run, large, release.wait)
+            await anyio.sleep(0.05)
+            assert large.snapshot()["queueDepth"] == 1
+
+            started = time.perf_counter()
+            assert await scheduler.run(small, lambda: 42) == 42
+            small_latency["ms"] = (time.perf_counter() - started) * 1000
+            release.set()
+
+    anyio.run(scenario)
+    assert small_latency["ms"] < 500
+    assert large.snapshot()["completed"] == 2
+    assert large.snapshot()["maxWaitMs"] >= 40
+    assert small.snapshot()["completed"] == 1
+
+
+def test_performance_reports_scheduler_lanes(client):
+    client.post(
+        "/blackrock/challenge/v1/transactions:parse",
+        json={"expenses": [{"date": "2023-10-12 20:15:00", "amount": 250}]},
+    )
+    body = client.get("/blackrock/challenge/v1/performance").json()
+    assert set(body["scheduler"]) == {"small", "large"}
+    assert body["scheduler"]["small"]["completed"] >= 1
+    assert {"queueDepth", "avgWaitMs", "p99WaitMs", "concurrency"} <= set(body["scheduler"]["small"])
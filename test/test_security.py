@@ -0,0 +1,67 @@
+# Test type: Middleware integration test
+# Validation: security headers, API key enforcement, rate limiting and streaming pass-through of the ASGI middleware stack
+# Command: pytest -q test/test_security.py
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.security import ApiKeyMiddleware, RateLimitMiddleware, SecurityHeadersMiddleware
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                yield f"chunk-{index};".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(ApiKeyMiddleware)
+    return app
+
+
+def test_security_headers_are_injected(client):
+    response = client.get("/blackrock/challenge/v1/performance")
+    assert response.status_code == 200
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["x-frame-options"] == "DENY"
+    assert response.headers["referrer-policy"] == "no-referrer"
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_streaming_body_passes_through_with_headers():
+    with TestClient(_build_app()) as test_client:
+        response = test_client.get("/stream")
+    assert response.status_code == 200
+    assert response.text == "chunk-0;chunk-1;chunk-2;"
+    assert response.headers["x-frame-options"] == "DENY"
+
+
+def test_api_key_required_when_enabled(monkeypatch):
+    monkeypatch.setenv("REQUIRE_API_KEY", "true")
+    monkeypatch.setenv("API_KEY", "secret")
+    with TestClient(_build_app()) as test_client:
+        assert test_client.get("/ping").status_code == 401
+        assert test_client.get("/ping", headers={"x-api-key": "wrong"}).status_code == 401
+        assert test_client.get("/ping", headers={"x-api-key": "secret"}).status_code == 200
+        assert test_client.get("/openapi.json").status_code == 200
+
+
+def test_rate_limit_returns_429_after_limit(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_PER_MIN", "2")
+    with TestClient(_build_app()) as test_client:
+        assert test_client.get("/ping").status_code == 200
+        assert test_client.get("/ping").status_code == 200
+        response = test_client.get("/ping")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
@@ -0,0 +1,78 @@
+# Test type: Shared state unit test
+# Validation: rate-limit slots (pruned for all clients) and batched live counters are shared by every worker using the same sqlite state file
+# Command: pytest -q test/test_shared_state.py
+
+import time
+
+from app.core.shared_state import MemorySharedState, SqliteSharedState
+
+
+def test_sqlite_rate_limit_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = SqliteSharedState(path)
+    worker_b = SqliteSharedState(path)
+
+    assert worker_a.hit("10.0.0.1", limit=3, window_seconds=60)
+    assert worker_b.hit("10.0.0.1", limit=3, window_seconds=60)
+    assert worker_a.hit("10.0.0.1", limit=3, window_seconds=60)
+    assert not worker_b.hit("10.0.0.1", limit=3, window_seconds=60)
+    assert worker_b.hit("10.0.0.2", limit=3, window_seconds=60)
+
+
+def test_sqlite_counters_are_summed_across_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = SqliteSharedState(path)
+    worker_b = SqliteSharedState(path)
+    worker_b.pid = worker_a.pid + 1
+
+    worker_a.incr("served", 2)
+    worker_b.incr("served", 3)
+    worker_b.incr("inFlight")
+    assert worker_a.counters()["served"] == 2
+    worker_b.flush()
+
+    counters = worker_a.counters()
+    assert counters["served"] == 5
+    assert counters["inFlight"] == 1
+    assert counters["workers"] == 2
+
+
+def test_sqlite_prunes_expired_slots_of_every_client(tmp_path, monkeypatch):
+    state = SqliteSharedState(str(tmp_path / "state.db"))
+    now = 1_700_000_000
+    monkeypatch.setattr(time, "time", lambda: now)
+    for client in ("a", "b", "c"):
+        assert state.hit(client, limit=1, window_seconds=60)
+    now += 61
+    assert state.hit("d", limit=1, window_seconds=60)
+    assert state._conn().execute("SELECT client FROM rate_limit_slots").fetchall() == [("d",)]
+
+
+def test_sqlite_counters_flush_in_the_background(tmp_path):
+    path = str(tmp_path / "state.db")
+    writer = SqliteSharedState(path, flush_interval=0.02)
+    reader = SqliteSharedState(path)
+    reader.pid = writer.pid + 1
+    writer.incr("served", 4)
+    deadline = time.monotonic() + 5
+    while reader.counters().get("served") != 4:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_memory_state_limits_per_client():
+    state = MemorySharedState()
+    assert state.hit("a", limit=1, window_seconds=60)
+    assert not state.hit("a", limit=1, window_seconds=60)
+    assert state.hit("b", limit=1, window_seconds=60)
+
+
+def test_performance_reports_live_counters(client):
+    client.post(
+        "/blackrock/challenge/v1/transactions:parse",
+        json={"expenses": [{"date": "2023-10-12 20:15:00", "amount": 250}]},
+    )
+    body = client.get("/blackrock/challenge/v1/performance").json()
+    assert body["live"]["served"] >= 1
+    assert body["live"]["inFlight"] == 0
+    assert body["live"]["workers"] == 1
@@ -0,0 +1,111 @@
+# Test type: API integration test
+# Validation: simulated profit bands vs per-window brute force and deterministic returns; compact cents, seeding, chunking, limits
+# Command: pytest -q test/test_simulation.py
+
+import json
+import random
+from decimal import Decimal
+
+import msgpack
+import numpy as np
+import pytest
+
+from app.api.negotiation import from_compact, to_compact
+from app.core.cancellation import CancellationToken
+from app.main import app
+from app.plugins.index import IndexPlugin
+from app.plugins.nps import NpsPlugin
+from app.schemas.common import ReturnsRequest
+from app.services.jobs import JOB_OPERATIONS
+from app.services.simulation import simulate_growth
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _payload(**simulation):
+    rng = random.Random(48)
+    return {
+        "age": 35,
+        "wage": 90000,
+        "inflation": 0.05,
+        **data.rule_set("dense", 300, rng),
+        "transactions": data.transactions(300, rng, shuffle=True),
+        "simulation": simulation,
+    }
+
+
+@pytest.mark.parametrize("channel", ["nps", "index"])
+def test_bands_match_brute_force_over_every_window(client, channel):
+    payload = _payload(paths=20000, seed=7, percentiles=[2.5, 50, 90])
+    body = client.post(f"{BASE}/returns:{channel}", json=payload).json()
+    deterministic = client.post(f"{BASE}/returns:{channel}", json={**payload, "simulation": None}).json()
+    assert body["simulation"]["years"] == 25 and body["simulation"]["seed"] == 7
+
+    plugin = {"nps": NpsPlugin, "index": IndexPlugin}[channel]()
+    growth = simulate_growth(plugin.return_distribution(), 20000, 25, np.random.default_rng(7))
+    deflator = 1.05**25
+    for row, plain in zip(body["savingsByDates"], deterministic["savingsByDates"], strict=True):
+        assert {key: row[key] for key in plain} == plain
+        profits = row["amount"] * growth / deflator - row["amount"]
+        bands = row["profitsDistribution"]["percentiles"]
+        assert list(bands) == ["p2.5", "p50", "p90"]
+        assert list(bands.values()) == pytest.approx(np.percentile(profits, [2.5, 50, 90]).tolist(), abs=0.011)
+        assert row["profitsDistribution"]["mean"] == pytest.approx(profits.mean(), abs=0.011)
+        # The mean of the simulated growth is the deterministic growth.
+        assert row["profitsDistribution"]["mean"] == pytest.approx(plain["profits"], rel=0.05, abs=0.02)
+
+
+def test_zero_volatility_reproduces_deterministic_profits(client, monkeypatch):
+    monkeypatch.setattr(IndexPlugin, "annual_volatility", Decimal("0"))
+    payload = _payload(paths=10)
+    body = client.post(f"{BASE}/returns:index", json=payload).json()
+    deterministic = client.post(f"{BASE}/returns:index", json={**payload, "simulation": None}).json()
+    for row, plain in zip(body["savingsByDates"], deterministic["savingsByDates"], strict=True):
+        distribution = row["profitsDistribution"]
+        for value in (distribution["mean"], *distribution["percentiles"].values()):
+            assert value == pytest.approx(plain["profits"], abs=0.011)
+
+
+def test_compact_msgpack_distribution_is_in_cents(client):
+    payload = _payload(paths=500, seed=3)
+    expected = client.post(f"{BASE}/returns:nps", json=payload).json()
+    media_type = "application/msgpack; profile=compact"
+    response = client.post(
+        f"{BASE}/returns:nps",
+        content=msgpack.packb(to_compact(payload)),
+        headers={"Content-Type": media_type, "Accept": media_type},
+    )
+    body = msgpack.unpackb(response.content)
+    for row, plain in zip(body["savingsByDates"], expected["savingsByDates"], strict=True):
+        distribution = plain["profitsDistribution"]
+        assert row["profitsDistribution"]["mean"] == round(distribution["mean"] * 100)
+        assert row["profitsDistribution"]["percentiles"] == {
+            label: round(value * 100) for label, value in distribution["percentiles"].items()
+        }
+    assert body["simulation"] == expected["simulation"]
+    assert from_compact(body) == expected
+
+
+def test_seed_reproduces_results_for_any_chunk_size(client, monkeypatch):
+    payload = _payload(paths=5000, seed=123)
+    first = client.post(f"{BASE}/returns:index", json=payload).json()
+    monkeypatch.setenv("SIMULATION_CHUNK_PATHS", "999")
+    assert client.post(f"{BASE}/returns:index", json=payload).json() == first
+    other = client.post(f"{BASE}/returns:index", json=_payload(paths=5000, seed=124)).json()
+    assert other["savingsByDates"] != first["savingsByDates"]
+
+    unseeded = client.post(f"{BASE}/returns:index", json=_payload(paths=5000)).json()
+    replay = client.post(f"{BASE}/returns:index", json=_payload(paths=5000, seed=unseeded["simulation"]["seed"]))
+    assert replay.json() == unseeded
+
+
+def test_simulation_limits_and_jobs(client):
+    for options in ({"paths": 0}, {"paths": 1_000_001}, {"percentiles": [101]}, {"percentiles": []}):
+        assert client.post(f"{BASE}/returns:nps", json=_payload(**options)).status_code == 422
+
+    payload = ReturnsRequest.model_validate(_payload(paths=100, seed=1))
+    job = json.loads(JOB_OPERATIONS["returns:nps"](app.state.engine, payload, CancellationToken()))
+    api = client.post(f"{BASE}/returns:nps", json=_payload(paths=100, seed=1)).json()
+    assert job == api
@@ -0,0 +1,53 @@
+# Test type: API integration test
+# Validation: start-up warm-up runs each engine route as the API does, startup breakdown, shared engine, lazy imports
+# Command: pytest -q test/test_startup.py
+
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.rows import materialize
+from app.services.warmup import WARMUP_ROUTES, _payloads
+
+
+BASE = "/blackrock/challenge/v1"
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_warmup_requests_match_api_responses(client):
+    engine = app.state.engine
+    for endpoint, payload in _payloads().items():
+        request_model, response_model, operation = WARMUP_ROUTES[endpoint]
+        response = client.post(f"{BASE}/{endpoint}", json=payload)
+        assert response.status_code == 200, endpoint
+        result = materialize(operation(engine, request_model.model_validate(payload)))
+        assert response_model.model_validate(result).model_dump(mode="json", by_alias=True) == response.json()
+
+
+def test_performance_reports_startup_breakdown(client, monkeypatch):
+    startup = client.get(f"{BASE}/performance").json()["startup"]
+    assert {"boot", "repositories", "jobs", "warmup", "openapi"} <= set(startup["stagesMs"])
+    assert set(startup["warmupMs"]) == set(WARMUP_ROUTES)
+    assert startup["readyMs"] >= sum(startup["stagesMs"].values()) - 1
+
+    monkeypatch.setenv("STARTUP_WARMUP", "0")
+    with TestClient(app) as cold:
+        startup = cold.get(f"{BASE}/performance").json()["startup"]
+    assert "warmup" not in startup["stagesMs"] and startup["warmupMs"] == {}
+
+
+def test_engine_is_shared_by_requests_and_jobs(client):
+    engine = app.state.engine
+    assert client.app.state.jobs.engine_factory() is engine
+    assert client.post(f"{BASE}/transactions:parse", json=_payloads()["transactions:parse"]).status_code == 200
+    assert app.state.engine is engine
+
+
+def test_optional_backends_are_not_imported_at_startup():
+    modules = ("pyarrow", "app.repositories.postgres_repo")
+    code = f"import sys, app.main; print(sorted(m for m in {modules!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    assert output.stdout.strip() == "[]"
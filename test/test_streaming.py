@@ -0,0 +1,131 @@
+# Test type: API integration test
+# Validation: streamed bodies equal buffered JSON, chunk boundaries, msgpack fallback, lane/deadline scope, mid-stream aborts
+# Command: pytest -q test/test_streaming.py
+
+import json
+import random
+import threading
+
+import anyio
+import msgpack
+import pytest
+from fastapi import Request
+
+from app.api.streaming import iter_json, respond_rows
+from app.core.cancellation import CancellationToken, OperationCancelled
+from app.main import app
+from app.schemas.common import TemporalFilterRequest, TransactionValidationRequest
+from app.services.engine import SavingsEngine
+from app.services.rows import RowStream
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _filter_payload(rows: int = 300) -> dict:
+    rng = random.Random(44)
+    payload = {**data.rule_set("dense", rows, rng), "kMode": "strict"}
+    payload["transactions"] = data.transactions(rows, rng, shuffle=True)
+    return payload
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 4096])
+def test_iter_json_matches_json_dumps(chunk_rows):
+    rows = [{"date": f"2023-01-01 00:00:{i:02d}", "amount": i / 3, "message": "é"} for i in range(20)]
+    document = {"valid": RowStream.from_list(rows), "empty": RowStream.from_list([]), "count": 20}
+    body = b"".join(iter_json(document, chunk_rows))
+    assert json.loads(body) == {"valid": rows, "empty": [], "count": 20}
+
+
+@pytest.mark.parametrize("min_rows", ["1", "1000000"])
+def test_filter_and_validator_bodies_match_the_engine(client, monkeypatch, min_rows):
+    monkeypatch.setenv("STREAM_MIN_ROWS", min_rows)
+    monkeypatch.setenv("STREAM_CHUNK_ROWS", "64")
+    payload = _filter_payload()
+    response = client.post(f"{BASE}/transactions:filter", json=payload, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert ("content-length" not in response.headers) == (min_rows == "1")
+    expected = SavingsEngine().filter_temporal_constraints(TemporalFilterRequest.model_validate(payload))
+    assert response.json() == expected
+
+    validator_payload = {"wage": 60, "transactions": payload["transactions"]}
+    response = client.post(f"{BASE}/transactions:validator", json=validator_payload)
+    assert response.status_code == 200
+    expected = SavingsEngine().validate_transactions(TransactionValidationRequest.model_validate(validator_payload))
+    assert response.json() == expected
+
+
+def test_msgpack_clients_get_a_buffered_body(client, monkeypatch):
+    monkeypatch.setenv("STREAM_MIN_ROWS", "1")
+    payload = _filter_payload(50)
+    response = client.post(f"{BASE}/transactions:filter", json=payload, headers={"Accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    expected = SavingsEngine().filter_temporal_constraints(TemporalFilterRequest.model_validate(payload))
+    assert msgpack.unpackb(response.content) == expected
+
+
+def test_streamed_errors_are_reported_before_the_body(client, monkeypatch):
+    monkeypatch.setenv("STREAM_MIN_ROWS", "1")
+    payload = _filter_payload(50)
+    payload["k"].append({"start": "2030-01-01 00:00:00", "end": "2030-01-02 00:00:00"})
+    response = client.post(f"{BASE}/transactions:filter", json=payload)
+    assert response.status_code == 422
+    assert response.json()["detail"].endswith("is outside transaction date bounds")
+
+
+def _stream(rows: RowStream, work=None) -> tuple[list[dict], Exception | None]:
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}, "app": app, "headers": [], "state": {}}
+    if work is not None:
+        scope["state"]["work"] = work
+    response = respond_rows(Request(scope), None, {"valid": rows}, validate=False)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    try:
+        anyio.run(response, scope, receive, send)
+    except Exception as exc:
+        return messages, exc
+    return messages, None
+
+
+def test_streamed_rows_are_built_on_the_request_lane(client, monkeypatch):
+    monkeypatch.setenv("STREAM_MIN_ROWS", "1")
+    monkeypatch.setenv("STREAM_CHUNK_ROWS", "2")
+    large = app.state.scheduler.classes["large"]
+    seen = []
+
+    def build(start, stop):
+        seen.append((threading.current_thread() is threading.main_thread(), large.active))
+        return [{"index": i} for i in range(start, stop)]
+
+    messages, error = _stream(RowStream(6, build), (large, CancellationToken()))
+    assert error is None and seen == [(False, 1)] * 3
+    assert json.loads(b"".join(message.get("body", b"") for message in messages[1:])) == {
+        "valid": [{"index": i} for i in range(6)]
+    }
+    assert large.active == 0
+
+
+@pytest.mark.parametrize("failure", ["error", "deadline"])
+def test_mid_stream_failures_abort_instead_of_closing_the_document(client, monkeypatch, failure):
+    monkeypatch.setenv("STREAM_MIN_ROWS", "1")
+    monkeypatch.setenv("STREAM_CHUNK_ROWS", "2")
+    cancel = CancellationToken()
+
+    def build(start, stop):
+        if start >= 2:
+            if failure == "error":
+                raise RuntimeError("row build failed")
+            cancel.cancel("deadline")
+        return [{"index": i} for i in range(start, stop)]
+
+    messages, error = _stream(RowStream(6, build), (app.state.scheduler.classes["small"], cancel))
+    assert isinstance(error, RuntimeError if failure == "error" else OperationCancelled)
+    assert messages[0]["type"] == "http.response.start"
+    assert all(message.get("more_body") for message in messages[1:])
@@ -0,0 +1,105 @@
+# Test type: API integration test
+# Validation: every sweep cell equals its returns:* call, large amounts too, compact cents, rate overrides, limits
+# Command: pytest -q test/test_sweep.py
+
+import random
+
+import msgpack
+
+from app.api.negotiation import from_compact, to_compact
+from app.schemas.common import ReturnsRequest
+from app.services.engine import SavingsEngine
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+
+
+def _payload(**overrides):
+    rng = random.Random(21)
+    payload = {
+        "wage": 120000,
+        "ages": [22, 45, 59, 60, 75],
+        "inflations": [0, 0.04, 0.2],
+        "channels": ["nps", "index"],
+        **data.rule_set("dense", 400, rng),
+        "transactions": data.transactions(400, rng, shuffle=True),
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _assert_cube_matches_returns(cube, payload):
+    engine = SavingsEngine()
+    rules = {key: payload[key] for key in ("q", "p", "k", "transactions")}
+    for c, channel in enumerate(payload["channels"]):
+        for a, age in enumerate(payload["ages"]):
+            for i, inflation in enumerate(payload["inflations"]):
+                single = engine.calculate_returns(
+                    ReturnsRequest.model_validate(
+                        {"age": age, "wage": payload["wage"], "inflation": inflation, **rules}
+                    ),
+                    channel=channel,
+                )
+                assert single["transactionsTotalAmount"] == cube["transactionsTotalAmount"]
+                assert [item["amount"] for item in single["savingsByDates"]] == [w["amount"] for w in cube["windows"]]
+                assert [item["profits"] for item in single["savingsByDates"]] == cube["profits"][c][a][i]
+                assert [item["taxBenefit"] for item in single["savingsByDates"]] == cube["taxBenefit"][c]
+
+
+def test_sweep_cube_matches_individual_returns(client):
+    payload = _payload()
+    response = client.post(f"{BASE}/returns:sweep", json=payload)
+    assert response.status_code == 200
+    cube = response.json()
+    assert len(cube["profits"]) == 2 and len(cube["profits"][0]) == 5 and len(cube["profits"][0][0]) == 3
+    _assert_cube_matches_returns(cube, payload)
+
+
+def test_large_window_amounts_round_like_individual_returns(client):
+    # Overlapping p extras push window sums past 1e8, where float64 compounding loses the half-cent.
+    rng = random.Random(40)
+    transactions = data.transactions(60, rng)
+    k = data.periods(40, 60, rng)
+    p = [{**period, "extra": round(rng.uniform(100000, 499999), 2)} for period in data.periods(30, 60, rng)]
+    ages, inflations = list(range(0, 91, 3)), [0, 0.01, 0.031, 0.055, 0.12, 0.2]
+    payload = _payload(ages=ages, inflations=inflations, q=[], p=p, k=k, transactions=transactions)
+    response = client.post(f"{BASE}/returns:sweep", json=payload)
+    assert response.status_code == 200
+    cube = response.json()
+    assert max(window["amount"] for window in cube["windows"]) > 1e8
+    _assert_cube_matches_returns(cube, payload)
+
+
+def test_compact_msgpack_sweep_sends_cents(client):
+    payload = _payload(ages=[30], inflations=[0.05])
+    expected = client.post(f"{BASE}/returns:sweep", json=payload).json()
+    media_type = "application/msgpack; profile=compact"
+    response = client.post(
+        f"{BASE}/returns:sweep",
+        content=msgpack.packb(to_compact(payload)),
+        headers={"Content-Type": media_type, "Accept": media_type},
+    )
+    body = msgpack.unpackb(response.content)
+    assert body["profits"][1][0][0] == [round(value * 100) for value in expected["profits"][1][0][0]]
+    assert body["taxBenefit"][0] == [round(value * 100) for value in expected["taxBenefit"][0]]
+    assert from_compact(body) == expected
+
+
+def test_rate_override_and_limits(client, monkeypatch):
+    base = client.post(f"{BASE}/returns:sweep", json=_payload(channels=["index"])).json()
+    zero = client.post(f"{BASE}/returns:sweep", json=_payload(channels=["index"], rates={"index": 0})).json()
+    assert base["rates"] == {"index": 0.1449}
+    assert all(value <= 0 for value in zero["profits"][0][0][1])
+    assert zero["profits"][0][0][0] == [0.0] * len(zero["windows"])
+
+    too_many = client.post(f"{BASE}/returns:sweep", json=_payload(ages=list(range(1000)), inflations=[0.01] * 101))
+    assert too_many.status_code == 422
+
+    monkeypatch.setenv("SWEEP_MAX_CELLS", "10")
+    over = client.post(f"{BASE}/returns:sweep", json=_payload())
+    assert over.status_code == 422
+    assert "limit is 10" in over.json()["detail"]
+
+    unknown = client.post(f"{BASE}/returns:sweep", json=_payload(channels=["bonds"]))
+    assert unknown.status_code == 422
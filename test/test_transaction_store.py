@@ -0,0 +1,103 @@
+# Test type: Repository and API integration test
+# Validation: running remanent sums under out-of-order batched upserts, indexed window sums, stored-customer returns match /returns:* on the same data, inexact rules too
+# Command: pytest -q test/test_transaction_store.py
+
+import random
+import uuid
+
+import pytest
+
+from app.repositories.sqlite_repo import SqliteTransactionRepository
+from benchmarks import data
+
+
+BASE = "/blackrock/challenge/v1"
+RULES = {
+    "age": 29,
+    "wage": 50000,
+    "inflation": 0.055,
+    "k": [
+        {"start": "2023-01-01 00:00:00", "end": "2023-01-01 02:00:00"},
+        {"start": "2023-01-01 01:00:00", "end": "2023-01-01 03:00:00"},
+        {"start": "2023-01-01 00:30:00", "end": "2023-01-01 00:40:00"},
+    ],
+}
+QP_RULES = {
+    "q": [{"fixed": 0, "start": "2023-01-01 00:10:00", "end": "2023-01-01 00:20:00"}],
+    "p": [{"extra": 25, "start": "2023-01-01 01:30:00", "end": "2023-01-01 02:30:00"}],
+}
+# Rules the integer kernels cannot take exactly.
+INEXACT_RULES = [
+    {"q": [{"fixed": 1.005, "start": "2023-01-01 00:10:00", "end": "2023-01-01 00:20:00"}]},
+    {"p": [{"extra": 0.001, "start": "2023-01-01 01:30:00", "end": "2023-01-01 02:30:00"}]},
+    {"k": [{"start": "2023-1-1 0:10:0", "end": "2023-01-01 02:00:00"}]},
+]
+
+
+def test_window_sums_follow_out_of_order_upserts(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRANSACTION_BATCH_ROWS", "7")
+    store = SqliteTransactionRepository(str(tmp_path / "store.db"))
+    store.initialize()
+    rng = random.Random(4)
+    reference = {}
+    for _ in range(4):
+        rows = {epoch: (epoch, rng.randrange(10000), 10000, rng.randrange(10000)) for epoch in rng.sample(range(500), 60)}
+        store.upsert_transactions("a", list(rows.values()))
+        store.upsert_transactions("b", list(rows.values())[:5])
+        reference.update(rows)
+
+        windows = [tuple(sorted((rng.randrange(-5, 505), rng.randrange(-5, 505)))) for _ in range(25)]
+        expected = [sum(row[3] for epoch, row in reference.items() if start <= epoch <= end) for start, end in windows]
+        assert store.get_window_sums("a", windows) == expected
+
+    summary = store.get_summary("a")
+    assert summary["count"] == len(reference)
+    assert summary["totalRemanent"] == sum(row[3] for row in reference.values())
+    assert store.get_range("a", 100, 120) == sorted(row for epoch, row in reference.items() if 100 <= epoch <= 120)
+    assert store.get_summary("missing") is None
+
+
+@pytest.mark.parametrize("rules", [{}, QP_RULES, {**QP_RULES, "kMode": "strict"}, *INEXACT_RULES])
+def test_stored_returns_match_request_returns(client, rules):
+    customer = f"customer-{uuid.uuid4().hex}"
+    transactions = data.transactions(300, random.Random(9), shuffle=True)
+    half = len(transactions) // 2
+    for part in (transactions[half:], transactions[:half]):
+        response = client.put(f"{BASE}/customers/{customer}/transactions", json={"transactions": part})
+        assert response.status_code == 200
+    assert response.json()["count"] == len(transactions)
+
+    payload = {**RULES, **rules}
+    for channel in ("nps", "index"):
+        expected = client.post(f"{BASE}/returns:{channel}", json={**payload, "transactions": transactions}).json()
+        stored = client.post(f"{BASE}/customers/{customer}/returns:{channel}", json=payload)
+        assert stored.status_code == 200
+        assert stored.json() == expected
+
+    assert client.delete(f"{BASE}/customers/{customer}/transactions").status_code == 204
+
+
+def test_stored_transactions_validation_and_range(client):
+    customer = f"customer-{uuid.uuid4().hex}"
+    bad = {"date": "2023-01-01 00:00:00", "amount": 250, "ceiling": 300, "remanent": 40}
+    response = client.put(f"{BASE}/customers/{customer}/transactions", json={"transactions": [bad]})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "transactions[0]: remanent must equal ceiling - amount"
+
+    assert client.post(f"{BASE}/customers/{customer}/returns:nps", json=RULES).status_code == 404
+
+    transactions = data.transactions(50, random.Random(2))
+    client.put(f"{BASE}/customers/{customer}/transactions", json={"transactions": transactions})
+    listed = client.get(
+        f"{BASE}/customers/{customer}/transactions",
+        params={"start": transactions[10]["date"], "end": transactions[19]["date"], "limit": 5},
+    )
+    assert listed.json()["transactions"] == transactions[10:15]
+
+    outside = client.post(
+        f"{BASE}/customers/{customer}/returns:nps",
+        json={**RULES, "k": [{"start": "2022-01-01 00:00:00", "end": "2023-01-01 00:10:00"}]},
+    )
+    assert outside.status_code == 422
+    assert outside.json()["detail"] == "k[0] is outside transaction date bounds"
+    client.delete(f"{BASE}/customers/{customer}/transactions")